@@ -0,0 +1,339 @@
+# cogs/announcements.py
+import discord
+from discord.ext import commands
+import asyncio
+import heapq
+import json
+import time
+
+from cogs.cog_state import CogState, get_cog_state
+from cogs.event_scheduler import PRIORITY_NORMAL, get_event_scheduler
+from cogs.metrics import metrics
+from cogs.moderation import duration_to_seconds
+from cogs.paginator import PageSource, Paginator, get_page_source, new_page_source_cache
+from cogs.records import Announcement, TriggerRecord
+from cogs.storage import get_db
+from cogs.templates import TEMPLATE_TYPES, parse_template_options, render_template
+
+MIN_INTERVAL = 600 # Seconds; recurring announcements can't repeat more often than every 10 minutes
+MAX_ANNOUNCEMENTS_PER_GUILD = 50
+MAX_CATCHUP_DELAY = 3600 # Seconds; a run missed by more than this (e.g. during downtime) is skipped, not posted late
+MAX_SLEEP = 60 # Seconds; the scheduler re-checks the clock at least this often, so wall-clock jumps are noticed
+RETRY_DELAY = 60 # Seconds before another attempt at a one-off announcement that couldn't be posted
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS announcements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    next_run REAL NOT NULL,
+    interval INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    author_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_announcements_guild ON announcements (guild_id);
+"""
+
+def format_interval(seconds):
+    if not seconds:
+        return "once"
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"every {seconds // size}{unit}"
+    return f"every {seconds}s"
+
+class AnnouncementStore:
+    """
+    Scheduled announcements persisted in SQLite, with every pending run in one min-heap of (next_run, id).
+    A single task sleeps until the top of the heap is due, so tens of thousands of schedules cost one timer,
+    not one sleeping task each. Heap entries are invalidated lazily: an entry whose time no longer matches
+    its announcement (removed or rescheduled) is simply discarded when it reaches the top.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(SCHEMA)
+        self.announcements = {} # {id: Announcement}
+        self.guild_ids = {} # {guild_id: {id, ...}}
+        self.versions = {} # {guild_id: int}, bumped on every change for the list paginator
+        self.heap = [] # [(next_run, id)]
+        for row in self.db.execute("SELECT id, guild_id, channel_id, next_run, interval, data, author_id FROM announcements"):
+            announcement = self._put(Announcement(row["id"], row["guild_id"], row["channel_id"], row["next_run"], row["interval"],
+                                                  TriggerRecord.from_dict(json.loads(row["data"])), row["author_id"]))
+            self.heap.append((announcement.next_run, announcement.id))
+        heapq.heapify(self.heap)
+
+    def _put(self, announcement):
+        self.announcements[announcement.id] = announcement
+        self.guild_ids.setdefault(announcement.guild_id, set()).add(announcement.id)
+        self.versions[announcement.guild_id] = self.versions.get(announcement.guild_id, 0) + 1
+        return announcement
+
+    def version(self, guild_id):
+        return self.versions.get(guild_id, 0)
+
+    def guild(self, guild_id):
+        return [self.announcements[announcement_id] for announcement_id in self.guild_ids.get(guild_id, ())]
+
+    def count(self, guild_id):
+        return len(self.guild_ids.get(guild_id, ()))
+
+    def next_due(self):
+        """Returns the time of the earliest pending run, or None if nothing is scheduled."""
+        while self.heap:
+            next_run, announcement_id = self.heap[0]
+            announcement = self.announcements.get(announcement_id)
+            if announcement is not None and announcement.next_run == next_run:
+                return next_run
+            heapq.heappop(self.heap) # Stale entry
+        return None
+
+    def add(self, guild_id, channel_id, next_run, interval, message, author_id):
+        cursor = self.db.execute(
+            "INSERT INTO announcements (guild_id, channel_id, next_run, interval, data, author_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, channel_id, next_run, interval, json.dumps(message.to_dict()), author_id)
+        )
+        self.db.commit()
+        announcement = self._put(Announcement(cursor.lastrowid, guild_id, channel_id, next_run, interval, message, author_id))
+        heapq.heappush(self.heap, (next_run, announcement.id))
+        return announcement
+
+    def _forget(self, announcement_id):
+        announcement = self.announcements.pop(announcement_id, None)
+        if announcement is None:
+            return None
+        ids = self.guild_ids[announcement.guild_id]
+        ids.discard(announcement_id)
+        if not ids:
+            del self.guild_ids[announcement.guild_id]
+        self.versions[announcement.guild_id] = self.versions.get(announcement.guild_id, 0) + 1
+        return announcement
+
+    def remove(self, announcement_id):
+        """Removes an announcement; its heap entry goes stale. Returns the removed Announcement or None."""
+        announcement = self._forget(announcement_id)
+        if announcement is not None:
+            self.db.execute("DELETE FROM announcements WHERE id = ?", (announcement_id,))
+            self.db.commit()
+        return announcement
+
+    def remove_guild(self, guild_id):
+        for announcement_id in list(self.guild_ids.get(guild_id, ())):
+            self._forget(announcement_id)
+        self.db.execute("DELETE FROM announcements WHERE guild_id = ?", (guild_id,))
+        self.db.commit()
+
+    def retry(self, announcement_id, next_run):
+        """Schedules another attempt at a one-off announcement that couldn't be posted. Does nothing if it was removed meanwhile."""
+        announcement = self.announcements.get(announcement_id)
+        if announcement is None:
+            return
+        announcement.next_run = next_run
+        heapq.heappush(self.heap, (next_run, announcement_id))
+        self.db.execute("UPDATE announcements SET next_run = ? WHERE id = ?", (next_run, announcement_id))
+        self.db.commit()
+        self.versions[announcement.guild_id] = self.versions.get(announcement.guild_id, 0) + 1
+
+    def pop_due(self, now):
+        """
+        Takes every announcement due at `now` and advances recurring ones to their next run.
+        Returns [(announcement, lateness in seconds)]. All the resulting writes go to SQLite in one transaction.
+        One-offs stay stored (with nothing left in the heap) until the caller removes them after posting,
+        or hands them to `retry`, so a failed post or a restart in between doesn't lose them.
+        """
+        due, rescheduled = [], []
+        while self.heap and self.heap[0][0] <= now:
+            next_run, announcement_id = heapq.heappop(self.heap)
+            announcement = self.announcements.get(announcement_id)
+            if announcement is None or announcement.next_run != next_run:
+                continue # Stale entry
+            due.append((announcement, now - next_run))
+            if announcement.interval:
+                # Keep the original cadence: after downtime, skip straight to the first slot in the future
+                missed = int((now - next_run) // announcement.interval)
+                announcement.next_run = next_run + (missed + 1) * announcement.interval
+                heapq.heappush(self.heap, (announcement.next_run, announcement_id))
+                rescheduled.append((announcement.next_run, announcement_id))
+        if rescheduled:
+            self.db.executemany("UPDATE announcements SET next_run = ? WHERE id = ?", rescheduled)
+            self.db.commit()
+        for announcement, _ in due:
+            self.versions[announcement.guild_id] = self.versions.get(announcement.guild_id, 0) + 1
+        return due
+
+class Announcements(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # self.qualified_name is automatically set by discord.py
+        # The store lives in the bot-level registry so reloading this cog keeps the heap
+        self.state = get_cog_state(bot, "Announcements", lambda snapshot: CogState(store=AnnouncementStore(get_db())))
+        self.store = self.state.store
+        self.scheduler = get_event_scheduler(bot)
+        self.page_sources = new_page_source_cache() # Rendered `announce list` pages per guild
+        self.wakeup = asyncio.Event() # Set when a schedule is added that may be due before the current sleep ends
+        self.task = None
+        metrics.register_gauge("announcements_scheduled", lambda: len(self.store.announcements))
+
+    async def cog_load(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def cog_unload(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        """
+        The one scheduler task. Sleeps until the earliest announcement is due (or a new one is added), then
+        hands everything due to the event scheduler. After downtime, the first pass catches up on missed runs:
+        each is posted once if it's less than MAX_CATCHUP_DELAY late, and recurring ones realign to their cadence.
+        A one-off shed by the event scheduler is tried again after RETRY_DELAY instead of being lost.
+        """
+        await self.bot.wait_until_ready()
+        while True:
+            self.wakeup.clear()
+            next_run = self.store.next_due()
+            now = time.time()
+            if next_run is None or next_run > now:
+                timeout = MAX_SLEEP if next_run is None else min(MAX_SLEEP, next_run - now)
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for announcement, lateness in self.store.pop_due(now):
+                if lateness > MAX_CATCHUP_DELAY:
+                    metrics.inc("announcements_skipped_total")
+                    self.finish(announcement)
+                    continue
+                metrics.observe("announcement_lateness_seconds", lateness)
+                if not self.scheduler.submit(announcement.guild_id, PRIORITY_NORMAL, self.post, announcement):
+                    self.retry(announcement)
+
+    def finish(self, announcement):
+        """A run is over (posted, skipped or given up on): one-offs are removed, recurring ones are already advanced."""
+        if not announcement.interval:
+            self.store.remove(announcement.id)
+
+    def retry(self, announcement):
+        """A run couldn't happen right now: one-offs are tried again later, recurring ones just wait for their next run."""
+        if not announcement.interval:
+            self.store.retry(announcement.id, time.time() + RETRY_DELAY)
+
+    async def post(self, announcement):
+        guild = self.bot.get_guild(announcement.guild_id)
+        if guild is None:
+            # Unavailable (outage) or left; on_guild_remove cleans up the latter
+            return self.retry(announcement)
+        channel = guild.get_channel(announcement.channel_id)
+        if channel is None:
+            print(f"Announcement {announcement.id} channel is gone in guild {guild.name}. Removing it.")
+            self.store.remove(announcement.id)
+            return
+        try:
+            await channel.send(**render_template(self.bot, announcement.message, guild))
+            metrics.inc("announcements_posted_total")
+        except discord.Forbidden:
+            print(f"Bot lacks permissions to post announcement {announcement.id} in #{channel.name} ({guild.name}).")
+        except discord.HTTPException as e:
+            print(f"Error posting announcement {announcement.id} in {guild.name}: {e}")
+            if e.status == 429 or e.status >= 500:
+                return self.retry(announcement)
+        self.finish(announcement)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.store.remove_guild(guild.id)
+
+    @commands.group(name="announce", invoke_without_command=True, help="Manages scheduled announcements.")
+    @commands.has_permissions(manage_guild=True)
+    async def announce(self, ctx):
+        """
+        Base command for scheduled and recurring announcements. Messages use the same templates as custom commands.
+        Usage: XTRM announce [subcommand]
+        Example: XTRM announce add #general 1h 1d text "Remember to read {channel:rules}!"
+        """
+        await ctx.send_help(ctx.command)
+
+    @announce.command(name="add", help="Schedules a one-off or recurring announcement.")
+    @commands.has_permissions(manage_guild=True)
+    async def announce_add(self, ctx, channel: discord.TextChannel, start: str, repeat: str, message_type: str, *, content: str):
+        """
+        Schedules an announcement in a channel. The first post goes out after <start> ("now" or a delay like 30m),
+        then every <repeat> (e.g. 12h, 1d), or only once with "once".
+        <type> can be: text, embed, image. Embeds accept --title "Title" and --color #HEX.
+        Variables: {server}, {channel:name}
+        Usage: XTRM announce add <#channel> <start> <repeat|once> <type> <content> [--title "Title"] [--color #HEX]
+        Example: XTRM announce add #events 2h once embed "Game night starts now!" --title "Game Night"
+        """
+        message_type = message_type.lower()
+        if message_type not in TEMPLATE_TYPES:
+            return await ctx.send("❌ Invalid type. Must be `text`, `embed`, or `image`.")
+
+        delay = 0 if start.lower() == "now" else duration_to_seconds(start.lower())
+        if delay is None:
+            return await ctx.send("❌ Invalid start. Use `now` or a delay like `30m`, `2h` or `1d`.")
+        interval = 0 if repeat.lower() == "once" else duration_to_seconds(repeat.lower())
+        if interval is None:
+            return await ctx.send("❌ Invalid repeat. Use `once` or an interval like `12h` or `1d`.")
+        if interval and interval < MIN_INTERVAL:
+            return await ctx.send(f"❌ Recurring announcements can repeat at most every {MIN_INTERVAL // 60} minutes.")
+        if self.store.count(ctx.guild.id) >= MAX_ANNOUNCEMENTS_PER_GUILD:
+            return await ctx.send(f"❌ This server already has {MAX_ANNOUNCEMENTS_PER_GUILD} announcements. Remove one first.")
+        if not channel.permissions_for(ctx.guild.me).send_messages:
+            return await ctx.send(f"❌ I can't send messages in {channel.mention}.")
+
+        text, title, color = parse_template_options(content)
+        if not text:
+            return await ctx.send("❌ Please provide the announcement's content.")
+        message = TriggerRecord(message_type, text, title=title, color=color)
+        announcement = self.store.add(ctx.guild.id, channel.id, time.time() + delay, interval, message, ctx.author.id)
+        self.wakeup.set()
+        await ctx.send(f"✅ Announcement `#{announcement.id}` scheduled in {channel.mention} "
+                       f"(first post <t:{int(announcement.next_run)}:R>, {format_interval(interval)}).")
+
+    @announce.command(name="remove", help="Removes a scheduled announcement.")
+    @commands.has_permissions(manage_guild=True)
+    async def announce_remove(self, ctx, announcement_id: int):
+        """
+        Removes a scheduled announcement by its ID (see `XTRM announce list`).
+        Usage: XTRM announce remove <id>
+        Example: XTRM announce remove 12
+        """
+        announcement = self.store.announcements.get(announcement_id)
+        if announcement is None or announcement.guild_id != ctx.guild.id:
+            return await ctx.send(f"❌ No announcement `#{announcement_id}` in this server.")
+        self.store.remove(announcement_id)
+        await ctx.send(f"✅ Announcement `#{announcement_id}` removed.")
+
+    @announce.command(name="list", help="Lists the scheduled announcements in this server.")
+    @commands.has_permissions(manage_guild=True)
+    async def announce_list(self, ctx):
+        """
+        Lists this server's scheduled announcements, soonest first.
+        Usage: XTRM announce list
+        """
+        guild = ctx.guild
+        if not self.store.count(guild.id):
+            return await ctx.send("No announcements scheduled for this server.")
+
+        def render(embed, announcement):
+            channel = guild.get_channel(announcement.channel_id)
+            where = channel.mention if channel else f"Unknown Channel (ID: {announcement.channel_id})"
+            preview = announcement.message.content if len(announcement.message.content) <= 80 else announcement.message.content[:77] + "..."
+            embed.add_field(
+                name=f"#{announcement.id} · {announcement.message.type} · {format_interval(announcement.interval)}",
+                value=f"{where} · next <t:{int(announcement.next_run)}:R>\n{preview}", inline=False
+            )
+
+        version_fn = lambda: self.store.version(guild.id)
+        source = get_page_source(self.page_sources, guild.id, version_fn(), lambda: PageSource(
+            "Scheduled Announcements", "Here are the scheduled announcements:", discord.Color.blue(),
+            lambda: self.store.guild(guild.id), render, sort_key=lambda announcement: announcement.next_run
+        ))
+        await Paginator.start(ctx, source, version_fn)
+
+async def setup(bot):
+    """
+    Adds the Announcements cog to the bot.
+    """
+    await bot.add_cog(Announcements(bot))
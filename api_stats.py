@@ -0,0 +1,124 @@
+# cogs/api_stats.py
+import discord
+import aiohttp
+import contextvars
+import sys
+import time
+
+from cogs.metrics import metrics
+
+# The REST call currently in flight in this task, so the aiohttp trace hooks know which route and
+# cog each underlying attempt (including discord.py's internal 429 retries) belongs to.
+_current_call = contextvars.ContextVar("discord_api_call", default=None)
+MAX_CALLER_DEPTH = 60
+SKIPPED_MODULES = (__name__, "cogs.metrics")
+
+class ApiCall:
+    __slots__ = ("route", "source", "attempts")
+
+    def __init__(self, route, source):
+        self.route = route
+        self.source = source
+        self.attempts = 0
+
+def caller_source():
+    """
+    Names the cog responsible for the current REST call by walking up the stack to the nearest frame in
+    a `cogs.*` module, e.g. "moderation" for a fetch_message in Moderation.on_message.
+    Calls made by shared helpers (bulk_executor, modlog, ...) are attributed to the helper.
+    """
+    frame = sys._getframe(2)
+    for _ in range(MAX_CALLER_DEPTH):
+        if frame is None:
+            break
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("cogs.") and module not in SKIPPED_MODULES:
+            return module[len("cogs."):]
+        if module == "__main__":
+            return "main"
+        frame = frame.f_back
+    return "discord" # Made by discord.py itself (e.g. chunking, state fetches)
+
+async def _on_request_end(session, context, params):
+    call = _current_call.get()
+    route = call.route if call else "other"
+    status = params.response.status
+    if call:
+        call.attempts += 1
+    metrics.inc("discord_api_responses_total", route=route, status=str(status))
+    if status == 429:
+        scope = params.response.headers.get("X-RateLimit-Scope", "unknown") # user, global or shared
+        metrics.inc("discord_api_429_total", route=route, source=call.source if call else "discord", scope=scope)
+
+async def _on_request_exception(session, context, params):
+    call = _current_call.get()
+    if call:
+        call.attempts += 1
+    metrics.inc("discord_api_responses_total", route=call.route if call else "other", status=type(params.exception).__name__)
+
+def api_trace_config():
+    """
+    Returns an aiohttp TraceConfig to pass to the bot as `http_trace`, so every HTTP attempt is counted.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+def install_api_stats(bot):
+    """
+    Wraps the bot's HTTP client so every REST call is counted per route and per calling cog, with its
+    latency (including time spent waiting on discord.py's local rate limiter), retries and final status.
+    """
+    http = bot.http
+    if getattr(http, "api_stats_installed", False):
+        return
+    original_request = http.request
+
+    async def request(route, **kwargs):
+        call = ApiCall(f"{route.method} {route.path}", caller_source())
+        token = _current_call.set(call)
+        status = "error"
+        started = time.perf_counter()
+        try:
+            result = await original_request(route, **kwargs)
+            status = "ok"
+            return result
+        except discord.HTTPException as e:
+            status = str(e.status)
+            raise
+        finally:
+            _current_call.reset(token)
+            metrics.inc("discord_api_requests_total", route=call.route, source=call.source, status=status)
+            metrics.observe("discord_api_request_seconds", time.perf_counter() - started, route=call.route, source=call.source)
+            if call.attempts > 1:
+                metrics.inc("discord_api_retries_total", call.attempts - 1, route=call.route, source=call.source)
+
+    http.request = request
+    http.api_stats_installed = True
+
+def summarize(group_by="route"):
+    """
+    Aggregates the REST metrics by "route" or "source".
+    Returns {key: {"requests", "errors", "retries", "ratelimited", "seconds", "max"}}.
+    """
+    rows = {}
+    for name, label_key, value in metrics.items("discord_api_"):
+        labels = dict(label_key)
+        key = labels.get(group_by)
+        if key is None:
+            continue
+        row = rows.setdefault(key, {"requests": 0, "errors": 0, "retries": 0, "ratelimited": 0, "seconds": 0.0, "max": 0.0})
+        if name == "discord_api_requests_total":
+            row["requests"] += value
+            if labels["status"] != "ok":
+                row["errors"] += value
+        elif name == "discord_api_retries_total":
+            row["retries"] += value
+        elif name == "discord_api_429_total":
+            row["ratelimited"] += value
+        elif name == "discord_api_request_seconds_sum":
+            row["seconds"] += value
+        elif name == "discord_api_request_seconds_max":
+            row["max"] = max(row["max"], value)
+    return rows
@@ -2,17 +2,89 @@
 import discord
 from discord.ext import commands
 import re # Import regex for advanced variable parsing
+import os
+import sys
 
-# Import PREFIXES from bot.py (assuming bot.py is in the parent directory)
-# For standalone cog file clarity, we'll keep a local PREFIXES, but on_message will use bot.command_prefix.
-PREFIXES = ("XTRM ", "xtrm ") 
+from cogs.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from cogs.cog_state import CogState, get_cog_state
+from cogs.event_scheduler import PRIORITY_LOW, get_event_scheduler
+from cogs.maintenance import get_maintenance_guilds
+from cogs.matcher_cache import MatcherCache
+from cogs.paginator import PageSource, Paginator, get_page_source, new_page_source_cache
+from cogs.prefixes import get_prefix_resolver
+from cogs.storage import get_db
+from cogs.templates import render_template
+from cogs.trigger_io import ImportFormatError, export_records, format_import_report, import_records, validate_autoresponder
+from cogs.trigger_store import TriggerStore
+
+class AutoresponderMatcher:
+    """
+    One guild's autoresponders compiled for matching: exact triggers in a dict, and every `contains`
+    trigger folded into a single regex scanned once per message. When several triggers match,
+    the one created first wins, as before.
+    """
+    __slots__ = ("exact", "contains", "contains_pattern", "shorter_prefixes", "order", "size")
+
+    def __init__(self, triggers):
+        self.order = {trigger: position for position, trigger in enumerate(triggers)}
+        self.exact = {trigger: data for trigger, data in triggers.items() if data.match_type == "exact"}
+        self.contains = {trigger: data for trigger, data in triggers.items() if data.match_type == "contains"}
+        self.contains_pattern = None
+        if self.contains:
+            # Longest first so a trigger that extends another is still found; the lookahead lets matches overlap
+            alternatives = "|".join(re.escape(trigger) for trigger in sorted(self.contains, key=len, reverse=True))
+            self.contains_pattern = re.compile(f"(?=({alternatives}))")
+        # The regex reports the longest trigger at each position; any shorter trigger matching at the same
+        # position is a prefix of it, so remember those to keep "created first wins" exact
+        self.shorter_prefixes = {}
+        for trigger in self.contains:
+            prefixes = [trigger[:end] for end in range(1, len(trigger)) if trigger[:end] in self.contains]
+            if prefixes:
+                self.shorter_prefixes[trigger] = prefixes
+        self.size = (sys.getsizeof(self.order) + sys.getsizeof(self.exact) + sys.getsizeof(self.contains)
+                     + sum(len(trigger) for trigger in triggers) * 4 + 64 * len(triggers))
+
+    def match(self, content):
+        """Returns (trigger, data) for the first-created trigger matching the lowercased message, or None."""
+        best = None
+        data = self.exact.get(content)
+        if data is not None:
+            best = (self.order[content], content, data)
+        if self.contains_pattern is not None:
+            for found in self.contains_pattern.finditer(content):
+                longest = found.group(1)
+                for trigger in (longest, *self.shorter_prefixes.get(longest, ())):
+                    position = self.order[trigger]
+                    if best is None or position < best[0]:
+                        best = (position, trigger, self.contains[trigger])
+                if best[0] == 0:
+                    break
+        return best[1:] if best else None
 
 class Autoresponders(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # self.qualified_name is automatically set by discord.py
-        self.autoresponders = {} # In-memory storage for autoresponders (for demonstration)
-                                 # In a real bot, use a database (e.g., Firestore) for persistence.
+        # Per-guild autoresponders, persisted in local SQLite (restored from the snapshot on a warm restart).
+        # The store lives in the bot-level registry, so reloading this cog doesn't reload it.
+        self.state = get_cog_state(bot, "Autoresponders", lambda snapshot: CogState(
+            store=TriggerStore(get_db(), "autoresponder", snapshot.get("db"))
+        ))
+        self.autoresponders = self.state.store
+        # Compiled matchers for recently active guilds; idle guilds are evicted and recompiled on their next message
+        self.matchers = MatcherCache("autoresponders", lambda guild_id: AutoresponderMatcher(self.autoresponders.guild(guild_id)))
+        self.page_sources = new_page_source_cache() # Rendered `autoresponder list` pages per guild
+        self.maintenance_guilds = get_maintenance_guilds(bot)
+        self.prefixes = get_prefix_resolver(bot)
+        self.scheduler = get_event_scheduler(bot)
+        self.breaker = get_circuit_breaker(bot, "autoresponder") # Non-critical: replies are dropped while Discord is failing
+
+    def snapshot_state(self):
+        """
+        State saved on shutdown for a warm restart. Compiled matchers aren't included: a pickled regex is
+        recompiled when it's loaded, so they are rebuilt lazily per guild instead.
+        """
+        return {"db": self.autoresponders.snapshot()}
 
     @commands.group(name="autoresponder", invoke_without_command=True, help="Manages autoresponders.")
     @commands.has_permissions(manage_guild=True)
@@ -40,7 +112,7 @@ class Autoresponders(commands.Cog):
         trigger = trigger.lower()
         response_type = response_type.lower()
 
-        if trigger in self.autoresponders:
+        if self.autoresponders.get(ctx.guild.id, trigger) is not None:
             await ctx.send(f"❌ Autoresponder for trigger `{trigger}` already exists. Use `XTRM autoresponder edit` to modify it.")
             return
 
@@ -78,15 +150,14 @@ class Autoresponders(commands.Cog):
         
         # Add more parsing for --image, --thumbnail, --footer, --field etc. as needed
 
-        self.autoresponders[trigger] = {
+        self.autoresponders.set(ctx.guild.id, trigger, {
             "type": response_type,
             "content": main_content.strip(), # Use the content without options
             "match_type": match_type,
             "title": title,
             "color": color
             # Store other parsed options here
-        }
-        # In a real bot, save this to Firestore here
+        })
         await ctx.send(f"✅ Autoresponder for trigger `{trigger}` created successfully!")
 
     @autoresponder.command(name="edit", help="Edits an existing autoresponder.")
@@ -99,7 +170,8 @@ class Autoresponders(commands.Cog):
         """
         trigger = trigger.lower()
 
-        if trigger not in self.autoresponders:
+        existing = self.autoresponders.get(ctx.guild.id, trigger)
+        if existing is None:
             await ctx.send(f"❌ Autoresponder for trigger `{trigger}` does not exist.")
             return
 
@@ -108,25 +180,26 @@ class Autoresponders(commands.Cog):
         main_content = content_parts[0]
         options_str = ' --' + ' --'.join(content_parts[1:]) if len(content_parts) > 1 else ''
 
-        # Update existing data with new content and potentially new options
-        self.autoresponders[trigger]["content"] = main_content.strip()
+        # Records are shared between guilds and immutable, so edit a dict copy and store that
+        data = existing.to_dict()
+        data["content"] = main_content.strip()
 
         match_match = re.search(r'--match\s+(exact|contains)', options_str, re.IGNORECASE)
         if match_match:
-            self.autoresponders[trigger]["match_type"] = match_match.group(1).lower()
+            data["match_type"] = match_match.group(1).lower()
         
         title_match = re.search(r'--title\s+"([^"]+)"', options_str)
         if title_match:
-            self.autoresponders[trigger]["title"] = title_match.group(1)
+            data["title"] = title_match.group(1)
         
         color_match = re.search(r'--color\s+(#[0-9a-fA-F]{6})', options_str)
         if color_match:
             try:
-                self.autoresponders[trigger]["color"] = int(color_match.group(1)[1:], 16)
+                data["color"] = int(color_match.group(1)[1:], 16)
             except ValueError:
                 pass # Ignore invalid color
         
-        # In a real bot, update this in Firestore here
+        self.autoresponders.set(ctx.guild.id, trigger, data)
         await ctx.send(f"✅ Autoresponder for trigger `{trigger}` updated successfully!")
 
     @autoresponder.command(name="delete", help="Deletes an existing autoresponder.")
@@ -138,9 +211,7 @@ class Autoresponders(commands.Cog):
         Example: XTRM autoresponder delete "hello bot"
         """
         trigger = trigger.lower()
-        if trigger in self.autoresponders:
-            del self.autoresponders[trigger]
-            # In a real bot, delete from Firestore here
+        if self.autoresponders.delete(ctx.guild.id, trigger):
             await ctx.send(f"✅ Autoresponder for trigger `{trigger}` deleted successfully.")
         else:
             await ctx.send(f"❌ Autoresponder for trigger `{trigger}` not found.")
@@ -152,82 +223,103 @@ class Autoresponders(commands.Cog):
         Lists all currently configured autoresponders.
         Usage: XTRM autoresponder list
         """
-        if not self.autoresponders:
+        guild_id = ctx.guild.id
+        if not self.autoresponders.guild(guild_id):
             await ctx.send("No autoresponders have been created yet.")
             return
 
-        embed = discord.Embed(
-            title="Autoresponders",
-            description="Here are the autoresponders configured for this server:",
-            color=discord.Color.orange()
-        )
-        for trigger, data in self.autoresponders.items():
-            embed.add_field(name=f"Trigger: `{trigger}`", value=f"Type: `{data['type']}`, Match: `{data['match_type']}`", inline=False)
-        await ctx.send(embed=embed)
+        def render(embed, entry):
+            trigger, data = entry
+            embed.add_field(name=f"Trigger: `{trigger}`", value=f"Type: `{data.type}`, Match: `{data.match_type}`", inline=False)
+
+        source = get_page_source(self.page_sources, guild_id, self.autoresponders.version(guild_id), lambda: PageSource(
+            "Autoresponders", "Here are the autoresponders configured for this server:", discord.Color.orange(),
+            lambda: self.autoresponders.guild(guild_id).items(), render, sort_key=lambda entry: entry[0]
+        ))
+        await Paginator.start(ctx, source, lambda: self.autoresponders.version(guild_id))
+
+    @autoresponder.command(name="import", help="Imports autoresponders from an attached JSON/NDJSON file.")
+    @commands.has_permissions(manage_guild=True)
+    async def import_autoresponders(self, ctx, *, options: str = ""):
+        """
+        Imports autoresponders from an attached .json (array of objects) or .ndjson file (optionally .gz).
+        The file is streamed and parsed incrementally, so large packs are fine.
+        Fields: trigger, type, content, match_type (exact|contains), title, color (integer)
+        --dry-run: only validate and report what would be imported
+        --replace: overwrite existing autoresponders with the same trigger
+        Usage: XTRM autoresponder import [--dry-run] [--replace] (with an attachment)
+        Example: XTRM autoresponder import --dry-run
+        """
+        if not ctx.message.attachments:
+            return await ctx.send("❌ Attach a .json or .ndjson file to import.")
+        dry_run = "--dry-run" in options
+        replace = "--replace" in options
+        async with ctx.typing():
+            try:
+                report = await import_records(self.autoresponders, ctx.guild.id, ctx.message.attachments[0], validate_autoresponder, dry_run, replace)
+            except ImportFormatError as e:
+                return await ctx.send(f"❌ Import stopped: {e} " + ("Nothing was written (dry run)." if dry_run else "Records before this point were kept."))
+            except Exception as e:
+                return await ctx.send(f"❌ Could not read the attachment: {e}")
+        await ctx.send(format_import_report(report, "autoresponder", dry_run))
+
+    @autoresponder.command(name="export", help="Exports all autoresponders as an NDJSON file.")
+    @commands.has_permissions(manage_guild=True)
+    async def export_autoresponders(self, ctx):
+        """
+        Exports this server's autoresponders as an NDJSON file that `autoresponder import` accepts.
+        Usage: XTRM autoresponder export
+        """
+        path, filename, count = export_records(self.autoresponders, ctx.guild.id, "trigger", ctx.guild.filesize_limit)
+        try:
+            if not count:
+                return await ctx.send("No autoresponders have been created yet.")
+            await ctx.send(f"📦 Exported {count} autoresponders.", file=discord.File(path, filename=filename))
+        finally:
+            os.remove(path)
 
     @commands.Cog.listener()
     async def on_message(self, message):
         """
         Listens for messages to trigger autoresponders.
         """
-        if message.author.bot:
-            return # Ignore bot messages
+        if message.author.bot or not message.guild:
+            return # Ignore bot messages and DMs
+        if message.guild.id in self.maintenance_guilds:
+            return # Paused while the guild is in maintenance mode
 
-        msg_content = message.content.lower()
+        guild_autoresponders = self.autoresponders.guild(message.guild.id)
+        if not guild_autoresponders:
+            return # No autoresponders in this guild, nothing to match
 
         # Ensure the message is not a bot command
         # This prevents autoresponders from triggering on bot commands
-        is_command = False
-        # Access bot's prefixes directly from the bot instance
-        current_prefixes = self.bot.command_prefix
-        if not isinstance(current_prefixes, tuple): # Ensure it's iterable
-            current_prefixes = (current_prefixes,)
-
-        for prefix in current_prefixes:
-            if msg_content.startswith(prefix.lower()):
-                is_command = True
-                break
-        
-        if is_command:
+        if self.prefixes.match(message) is not None:
             return # Do not trigger autoresponder if it's a bot command
+        if self.breaker.is_open():
+            return # Sends keep failing; drop replies instead of queueing them
+
+        # Matching and replying are low priority: under load they're shed before moderation work
+        self.scheduler.submit(message.guild.id, PRIORITY_LOW, self.respond, message)
+
+    async def respond(self, message):
+        """
+        Sends the response for the first autoresponder matching a message. Runs on the event scheduler.
+        """
+        msg_content = message.content.lower()
+
+        matcher = self.matchers.get(message.guild.id, self.autoresponders.version(message.guild.id))
+        found = matcher.match(msg_content)
+        if not found:
+            return
+        trigger, data = found
 
-        for trigger, data in self.autoresponders.items():
-            should_respond = False
-            if data['match_type'] == "exact":
-                if msg_content == trigger:
-                    should_respond = True
-            elif data['match_type'] == "contains":
-                if trigger in msg_content:
-                    should_respond = True
-            
-            if should_respond:
-                # Process variables like {user}, {channel:name}, {server}, etc.
-                processed_content = data['content'].replace("{user}", message.author.mention)
-                processed_content = processed_content.replace("{server}", message.guild.name if message.guild else "Unknown Server")
-                
-                # Handle {channel:name} variable
-                if "{channel:" in processed_content and "}" in processed_content:
-                    channel_matches = re.findall(r"\{channel:([^}]+)\}", processed_content)
-                    for channel_name in channel_matches:
-                        target_channel = discord.utils.get(message.guild.channels, name=channel_name)
-                        if target_channel:
-                            processed_content = processed_content.replace(f"{{channel:{channel_name}}}", target_channel.mention)
-                        else:
-                            processed_content = processed_content.replace(f"{{channel:{channel_name}}}", f"#{channel_name} (not found)")
-
-                if data['type'] == "text":
-                    await message.channel.send(processed_content)
-                elif data['type'] == "embed":
-                    # Basic embed. Full implementation would parse more options.
-                    embed_color = data.get("color", discord.Color.blue()) # Use stored color or default
-                    embed = discord.Embed(description=processed_content, color=embed_color)
-                    if data.get("title"):
-                        embed.title = data["title"]
-                    # Add more embed fields/options as parsed in create/edit
-                    await message.channel.send(embed=embed)
-                elif data['type'] == "image":
-                    await message.channel.send(processed_content) # Assuming content is a direct image URL
-                return # Respond only once per message
+        # Variables like {user}, {channel:name} and {server} are filled in by the shared template renderer
+        try:
+            async with self.breaker:
+                await message.channel.send(**render_template(self.bot, data, message.guild, message.author))
+        except CircuitOpenError:
+            pass # Discord is failing; degrade by dropping this reply
 
 async def setup(bot):
     """
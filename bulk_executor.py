@@ -0,0 +1,121 @@
+# cogs/bulk_executor.py
+import aiohttp
+import asyncio
+import random
+import time
+from collections import Counter
+
+class BulkResult:
+    """
+    Outcome of a bulk run: which items succeeded and why the others failed.
+    """
+    __slots__ = ("total", "succeeded", "failed", "retries", "started")
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = []
+        self.failed = {} # {item: error message}
+        self.retries = 0
+        self.started = time.monotonic()
+
+    @property
+    def processed(self):
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def failure_summary(self, limit=5):
+        """Groups failures by error message, most common first."""
+        return Counter(self.failed.values()).most_common(limit)
+
+def _retry_delay(error, attempt, base_delay):
+    """
+    Returns how long to wait before retrying `error`, or None if it shouldn't be retried.
+    discord.py already waits out 429s and retries 5xx responses itself, so any HTTPException reaching here
+    is final. Only the network errors it gives up on (timeouts, dropped connections) are retried,
+    backing off exponentially with jitter.
+    """
+    if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+    return None
+
+class BulkExecutor:
+    """
+    Runs one coroutine per item through a pool of workers.
+    All jobs share one semaphore, so the bot never has more than `concurrency` bulk requests in flight
+    no matter how many mass actions run at once. Rate limits are left to discord.py, which shares
+    per-route buckets across every request the bot makes.
+    `on_progress(result)` is awaited at most every `progress_interval` seconds and once at the end.
+    """
+
+    def __init__(self, concurrency=5, progress_interval=3.0, max_retries=3, base_delay=1.0):
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run_item(self, item, action, result):
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    await action(item)
+                return
+            except Exception as e:
+                delay = _retry_delay(e, attempt, self.base_delay)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                result.retries += 1
+                await asyncio.sleep(delay)
+
+    async def run(self, items, action, on_progress=None):
+        """
+        Runs `action(item)` for every item and returns a BulkResult.
+        """
+        items = list(items)
+        result = BulkResult(len(items))
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async def worker():
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._run_item(item, action, result)
+                    result.succeeded.append(item)
+                except Exception as e:
+                    result.failed[item] = str(e) or type(e).__name__
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(items)) or 1)]
+        try:
+            if on_progress is None:
+                await asyncio.gather(*workers)
+            else:
+                pending = set(workers)
+                while pending:
+                    _, pending = await asyncio.wait(pending, timeout=self.progress_interval)
+                    if pending:
+                        await on_progress(result)
+                await on_progress(result)
+        finally:
+            for task in workers:
+                task.cancel()
+        return result
+
+def get_bulk_executor(bot):
+    """
+    Returns the bot-wide BulkExecutor, creating it on first use.
+    """
+    executor = getattr(bot, "bulk_executor", None)
+    if executor is None:
+        executor = BulkExecutor()
+        bot.bulk_executor = executor
+    return executor
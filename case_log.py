@@ -0,0 +1,107 @@
+# cogs/case_log.py
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    case_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    moderator_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    reason TEXT,
+    duration TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cases_guild_user ON cases (guild_id, user_id, case_id);
+DROP INDEX IF EXISTS idx_cases_guild_moderator;
+CREATE INDEX IF NOT EXISTS idx_cases_guild_moderator_case ON cases (guild_id, moderator_id, case_id);
+CREATE TABLE IF NOT EXISTS warn_counts (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+"""
+
+class CaseLog:
+    """
+    Append-only moderation case log in SQLite.
+    History queries use keyset pagination on case_id through the (guild_id, user_id, case_id) and
+    (guild_id, moderator_id, case_id) indexes, so fetching a page costs O(page) no matter how deep it is.
+    Case IDs are unique even when a mass action logs many cases with the same timestamp, so no page skips any.
+    Warn counts are precomputed: they live in a dict loaded once at startup and are written through
+    to the warn_counts table, so escalation checks on the warn path are a single dict lookup.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(SCHEMA)
+        self.warn_counts = {(row["guild_id"], row["user_id"]): row["count"]
+                            for row in self.db.execute("SELECT guild_id, user_id, count FROM warn_counts")}
+
+    def log(self, guild_id, user_id, moderator_id, action, reason=None, duration=None):
+        """
+        Appends a case and returns its case ID. Warns also bump the user's warn counter.
+        """
+        cursor = self.db.execute(
+            "INSERT INTO cases (guild_id, user_id, moderator_id, action, reason, duration, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (guild_id, user_id, moderator_id, action, reason, duration, time.time())
+        )
+        if action == "warn":
+            key = (guild_id, user_id)
+            self.warn_counts[key] = self.warn_counts.get(key, 0) + 1
+            self.db.execute(
+                "INSERT INTO warn_counts (guild_id, user_id, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET count = count + 1",
+                key
+            )
+        self.db.commit()
+        return cursor.lastrowid
+
+    def log_many(self, guild_id, user_ids, moderator_id, action, reason=None):
+        """
+        Appends one case per user in a single transaction (used by mass actions).
+        Returns the case IDs in the same order as `user_ids`. AUTOINCREMENT hands out IDs from sqlite_sequence,
+        so they aren't guaranteed to follow MAX(case_id); each row's ID is read back instead.
+        """
+        now = time.time()
+        case_ids = [
+            self.db.execute(
+                "INSERT INTO cases (guild_id, user_id, moderator_id, action, reason, duration, created_at) VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (guild_id, user_id, moderator_id, action, reason, now)
+            ).lastrowid
+            for user_id in user_ids
+        ]
+        self.db.commit()
+        return case_ids
+
+    def warn_count(self, guild_id, user_id):
+        return self.warn_counts.get((guild_id, user_id), 0)
+
+    def user_history(self, guild_id, user_id, limit=10, before_case_id=None):
+        """
+        Returns up to `limit` cases for a user, newest first, older than `before_case_id` if given.
+        """
+        if before_case_id is None:
+            return self.db.execute(
+                "SELECT * FROM cases WHERE guild_id = ? AND user_id = ? ORDER BY case_id DESC LIMIT ?",
+                (guild_id, user_id, limit)
+            ).fetchall()
+        return self.db.execute(
+            "SELECT * FROM cases WHERE guild_id = ? AND user_id = ? AND case_id < ? ORDER BY case_id DESC LIMIT ?",
+            (guild_id, user_id, before_case_id, limit)
+        ).fetchall()
+
+    def moderator_history(self, guild_id, moderator_id, limit=10, before_case_id=None):
+        """
+        Returns up to `limit` cases handled by a moderator, newest first, older than `before_case_id` if given.
+        """
+        if before_case_id is None:
+            return self.db.execute(
+                "SELECT * FROM cases WHERE guild_id = ? AND moderator_id = ? ORDER BY case_id DESC LIMIT ?",
+                (guild_id, moderator_id, limit)
+            ).fetchall()
+        return self.db.execute(
+            "SELECT * FROM cases WHERE guild_id = ? AND moderator_id = ? AND case_id < ? ORDER BY case_id DESC LIMIT ?",
+            (guild_id, moderator_id, before_case_id, limit)
+        ).fetchall()
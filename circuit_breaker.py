@@ -0,0 +1,143 @@
+# cogs/circuit_breaker.py
+import discord
+import aiohttp
+import asyncio
+import random
+import time
+from collections import deque
+
+from cogs.metrics import metrics
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2} # Exported as the circuit_state gauge
+
+class CircuitOpenError(Exception):
+    """Raised by `async with breaker:` instead of running the call while the circuit is open."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuit '{name}' is open; retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+def is_service_failure(error):
+    """
+    Returns True if `error` means Discord (or the network) is struggling: 429s, 5xx, timeouts and connection errors.
+    Forbidden/NotFound and friends are answers about one request, not the service, so they never trip a circuit.
+    """
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, discord.GatewayNotFound))
+
+class CircuitBreaker:
+    """
+    Stops calling a failing route or feature for a while instead of retrying it on every event.
+
+    Closed: calls run; `failure_threshold` service failures within `window` seconds open the circuit.
+    Open: calls fail fast with CircuitOpenError until a jittered cooldown passes. The cooldown doubles
+    each time the circuit re-opens (up to `max_cooldown`), and the jitter keeps every circuit from probing at once.
+    Half-open: one probe call is let through; success closes the circuit, failure opens it again.
+
+    Usage:
+        if breaker.is_open():
+            return # Skip queueing work that would only fail
+        async with breaker:
+            await member.add_roles(role)
+    """
+
+    def __init__(self, name, failure_threshold=5, window=30.0, base_cooldown=5.0, max_cooldown=300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.failures = deque() # monotonic times of recent service failures while closed
+        self.opened_streak = 0 # Times opened since the circuit was last closed; drives the backoff
+        self.reopen_at = 0.0
+        self.probing = False
+        metrics.register_gauge("circuit_state", lambda: STATE_VALUES[self.current_state()], circuit=name)
+
+    def current_state(self):
+        if self.state == OPEN and time.monotonic() >= self.reopen_at:
+            return HALF_OPEN
+        return self.state
+
+    def is_open(self):
+        """True while calls would be rejected. Doesn't claim the half-open probe, so it's safe for cheap pre-checks."""
+        state = self.current_state()
+        return state == OPEN or (state == HALF_OPEN and self.probing)
+
+    def retry_in(self):
+        return max(0.0, self.reopen_at - time.monotonic())
+
+    def allow(self):
+        """Returns True if a call may run now; in half-open state only the first caller (the probe) gets True."""
+        state = self.current_state()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probing:
+            self.state = HALF_OPEN
+            self.probing = True
+            return True
+        metrics.inc("circuit_rejected_total", circuit=self.name)
+        return False
+
+    def record_success(self):
+        self.probing = False
+        if self.state != CLOSED:
+            print(f"Circuit '{self.name}' closed again.")
+            self.state = CLOSED
+            self.opened_streak = 0
+        self.failures.clear()
+
+    def record_failure(self):
+        self.probing = False
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        if len(self.failures) >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now):
+        cooldown = min(self.max_cooldown, self.base_cooldown * (2 ** self.opened_streak))
+        cooldown *= random.uniform(0.5, 1.0) # Jitter so circuits opened together don't all probe together
+        self.state = OPEN
+        self.reopen_at = now + cooldown
+        self.opened_streak += 1
+        self.failures.clear()
+        metrics.inc("circuit_opened_total", circuit=self.name)
+        print(f"Circuit '{self.name}' opened after repeated failures; pausing it for {cooldown:.0f}s.")
+
+    async def __aenter__(self):
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is None or not is_service_failure(exc):
+            if isinstance(exc, asyncio.CancelledError):
+                self.probing = False # No verdict; let the next caller probe
+            else:
+                self.record_success() # Discord answered, even if the answer was Forbidden
+        else:
+            self.record_failure()
+        return False
+
+def get_circuit_breaker(bot, name, **options):
+    """
+    Returns the bot-wide CircuitBreaker for `name` (a feature such as "voice_role"), creating it on first use.
+    Breakers live on the bot so their state survives cog reloads.
+    """
+    breakers = getattr(bot, "circuit_breakers", None)
+    if breakers is None:
+        breakers = {}
+        bot.circuit_breakers = breakers
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name, **options)
+        breakers[name] = breaker
+    return breaker
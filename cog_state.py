@@ -0,0 +1,66 @@
+# cogs/cog_state.py
+from types import SimpleNamespace
+
+from cogs.metrics import metrics
+from cogs.snapshot import restore_snapshot
+
+# Events that are never held back while a cog reloads: connection lifecycle events, and the
+# command events of the `reload` command itself.
+UNBUFFERED_EVENTS = frozenset({
+    "connect", "disconnect", "ready", "resumed", "shard_connect", "shard_disconnect", "shard_ready", "shard_resumed",
+    "command", "command_completion", "command_error"
+})
+MAX_BUFFERED_EVENTS = 10000 # Events beyond this during a single reload are dropped (and counted)
+
+class CogState(SimpleNamespace):
+    """
+    Attribute bag holding a cog's data. It lives on the bot rather than the cog, so it survives
+    `reload_extension`: the new cog instance picks up the same objects. Keep data here and mutate it in place;
+    anything derived from code (compiled matchers, rendered pages, tasks) belongs on the cog and is rebuilt.
+    """
+
+def get_cog_state(bot, name, factory):
+    """
+    Returns the state registered for cog `name`, creating it with `factory(section)` on first use.
+    `section` is the cog's warm-restart snapshot section ({} if there is none; see `cogs.snapshot`).
+    """
+    registry = getattr(bot, "cog_states", None)
+    if registry is None:
+        registry = {}
+        bot.cog_states = registry
+    state = registry.get(name)
+    if state is None:
+        state = factory(restore_snapshot(bot, name))
+        registry[name] = state
+    return state
+
+def buffer_event(bot, event_name, args, kwargs):
+    """
+    Holds an event back if a reload is in progress. Returns True if the event was buffered (or dropped),
+    in which case the caller must not dispatch it. Called from the bot's `dispatch`.
+    """
+    buffer = getattr(bot, "event_buffer", None)
+    if buffer is None or event_name in UNBUFFERED_EVENTS:
+        return False
+    if len(buffer) < MAX_BUFFERED_EVENTS:
+        buffer.append((event_name, args, kwargs))
+    else:
+        metrics.inc("reload_events_dropped_total")
+    return True
+
+async def reload_cog(bot, extension):
+    """
+    Reloads an extension while holding back gateway events, then replays them to the new cog in order,
+    so nothing that arrives mid-swap is missed. If the reload fails, discord.py keeps the old module loaded
+    and the events are replayed to it instead. Returns the number of events replayed.
+    """
+    bot.event_buffer = []
+    try:
+        await bot.reload_extension(extension)
+    finally:
+        buffered = bot.event_buffer
+        bot.event_buffer = None
+        for event_name, args, kwargs in buffered:
+            bot.dispatch(event_name, *args, **kwargs)
+        metrics.inc("reload_events_replayed_total", len(buffered))
+    return len(buffered)
@@ -1,21 +1,35 @@
 # cogs/custom_commands.py
 import discord
 from discord.ext import commands
+import os
 
-# Import PREFIXES from bot.py (assuming bot.py is in the parent directory)
-# This is a common pattern for shared configurations.
-# You might need to adjust this import based on your exact file structure.
-# For this setup, we'll assume it's accessible or passed during cog loading.
-# A more robust solution would be to pass it via bot.py's __init__ or a config file.
-# For now, we'll redefine it for standalone clarity, but be aware of this in a larger project.
-# Alternatively, you can access bot.command_prefix within the cog.
-PREFIXES = ("XTRM ", "xtrm ") # Redefine for standalone cog file clarity
+from cogs.cog_state import CogState, get_cog_state
+from cogs.event_scheduler import PRIORITY_NORMAL, get_event_scheduler
+from cogs.maintenance import get_maintenance_guilds
+from cogs.paginator import PageSource, Paginator, get_page_source, new_page_source_cache
+from cogs.prefixes import get_prefix_resolver
+from cogs.storage import get_db
+from cogs.templates import render_template
+from cogs.trigger_io import ImportFormatError, export_records, format_import_report, import_records, validate_custom_command
+from cogs.trigger_store import TriggerStore
 
 class CustomCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.custom_cmds = {} # In-memory storage for custom commands (for demonstration)
-                              # In a real bot, use a database (e.g., Firestore) for persistence.
+        # Per-guild custom commands, persisted in local SQLite (restored from the snapshot on a warm restart).
+        # The store lives in the bot-level registry, so reloading this cog doesn't reload it.
+        self.state = get_cog_state(bot, "CustomCommands", lambda snapshot: CogState(
+            store=TriggerStore(get_db(), "customcmd", snapshot.get("db"))
+        ))
+        self.custom_cmds = self.state.store
+        self.page_sources = new_page_source_cache() # Rendered `customcmd list` pages per guild
+        self.maintenance_guilds = get_maintenance_guilds(bot)
+        self.prefixes = get_prefix_resolver(bot)
+        self.scheduler = get_event_scheduler(bot)
+
+    def snapshot_state(self):
+        """State saved on shutdown for a warm restart."""
+        return {"db": self.custom_cmds.snapshot()}
 
     @commands.group(name="customcmd", invoke_without_command=True, help="Manages custom commands.")
     @commands.has_permissions(manage_guild=True)
@@ -41,7 +55,7 @@ class CustomCommands(commands.Cog):
         name = name.lower()
         cmd_type = cmd_type.lower()
 
-        if name in self.custom_cmds:
+        if self.custom_cmds.get(ctx.guild.id, name) is not None:
             await ctx.send(f"❌ Custom command `{name}` already exists. Use `XTRM customcmd edit` to modify it.")
             return
 
@@ -51,7 +65,7 @@ class CustomCommands(commands.Cog):
 
         # Parse content and options (simplified for demonstration)
         # In a full implementation, you'd parse --title, --color, etc. for embeds.
-        self.custom_cmds[name] = {"type": cmd_type, "content": content}
+        self.custom_cmds.set(ctx.guild.id, name, {"type": cmd_type, "content": content})
         await ctx.send(f"✅ Custom command `{name}` created successfully!")
 
     @customcmd.command(name="list", help="Lists all custom commands.")
@@ -60,68 +74,95 @@ class CustomCommands(commands.Cog):
         Lists all currently configured custom commands.
         Usage: XTRM customcmd list
         """
-        if not self.custom_cmds:
+        guild_id = ctx.guild.id
+        if not self.custom_cmds.guild(guild_id):
             await ctx.send("No custom commands have been created yet.")
             return
 
-        embed = discord.Embed(
-            title="Custom Commands",
-            description="Here are the custom commands configured for this server:",
-            color=discord.Color.purple()
-        )
-        for name, data in self.custom_cmds.items():
-            embed.add_field(name=f"`{name}`", value=f"Type: `{data['type']}`", inline=True)
-        await ctx.send(embed=embed)
+        def render(embed, entry):
+            name, data = entry
+            embed.add_field(name=f"`{name}`", value=f"Type: `{data.type}`", inline=True)
+
+        source = get_page_source(self.page_sources, guild_id, self.custom_cmds.version(guild_id), lambda: PageSource(
+            "Custom Commands", "Here are the custom commands configured for this server:", discord.Color.purple(),
+            lambda: self.custom_cmds.guild(guild_id).items(), render, sort_key=lambda entry: entry[0], per_page=24
+        ))
+        await Paginator.start(ctx, source, lambda: self.custom_cmds.version(guild_id))
+
+    @customcmd.command(name="import", help="Imports custom commands from an attached JSON/NDJSON file.")
+    @commands.has_permissions(manage_guild=True)
+    async def import_custom_cmds(self, ctx, *, options: str = ""):
+        """
+        Imports custom commands from an attached .json (array of objects) or .ndjson file (optionally .gz).
+        The file is streamed and parsed incrementally, so large packs are fine.
+        Fields: name, type, content
+        --dry-run: only validate and report what would be imported
+        --replace: overwrite existing commands with the same name
+        Usage: XTRM customcmd import [--dry-run] [--replace] (with an attachment)
+        Example: XTRM customcmd import --replace
+        """
+        if not ctx.message.attachments:
+            return await ctx.send("❌ Attach a .json or .ndjson file to import.")
+        dry_run = "--dry-run" in options
+        replace = "--replace" in options
+        async with ctx.typing():
+            try:
+                report = await import_records(self.custom_cmds, ctx.guild.id, ctx.message.attachments[0], validate_custom_command, dry_run, replace)
+            except ImportFormatError as e:
+                return await ctx.send(f"❌ Import stopped: {e} " + ("Nothing was written (dry run)." if dry_run else "Records before this point were kept."))
+            except Exception as e:
+                return await ctx.send(f"❌ Could not read the attachment: {e}")
+        await ctx.send(format_import_report(report, "custom command", dry_run))
+
+    @customcmd.command(name="export", help="Exports all custom commands as an NDJSON file.")
+    @commands.has_permissions(manage_guild=True)
+    async def export_custom_cmds(self, ctx):
+        """
+        Exports this server's custom commands as an NDJSON file that `customcmd import` accepts.
+        Usage: XTRM customcmd export
+        """
+        path, filename, count = export_records(self.custom_cmds, ctx.guild.id, "name", ctx.guild.filesize_limit)
+        try:
+            if not count:
+                return await ctx.send("No custom commands have been created yet.")
+            await ctx.send(f"📦 Exported {count} custom commands.", file=discord.File(path, filename=filename))
+        finally:
+            os.remove(path)
 
     @commands.Cog.listener()
     async def on_message(self, message):
         """
         Listens for messages to trigger custom commands.
         """
-        if message.author.bot:
-            return # Ignore bot messages
-
-        # Check for bot prefixes
-        # Accessing bot.command_prefix directly for robustness
-        current_prefixes = self.bot.command_prefix if isinstance(self.bot.command_prefix, tuple) else (self.bot.command_prefix,)
-
-        for prefix in current_prefixes:
-            if message.content.lower().startswith(prefix.lower()):
-                cmd_name = message.content[len(prefix):].split(' ')[0].lower()
-                
-                if cmd_name in self.custom_cmds:
-                    cmd_data = self.custom_cmds[cmd_name]
-                    
-                    # Process variables like {user}, {channel:name}, {server}, etc.
-                    processed_content = cmd_data['content'].replace("{user}", message.author.mention)
-                    processed_content = processed_content.replace("{server}", message.guild.name if message.guild else "Unknown Server")
-                    
-                    # Handle {channel:name} variable
-                    if "{channel:" in processed_content and "}" in processed_content:
-                        import re
-                        channel_matches = re.findall(r"\{channel:([^}]+)\}", processed_content)
-                        for channel_name in channel_matches:
-                            target_channel = discord.utils.get(message.guild.channels, name=channel_name)
-                            if target_channel:
-                                processed_content = processed_content.replace(f"{{channel:{channel_name}}}", target_channel.mention)
-                            else:
-                                processed_content = processed_content.replace(f"{{channel:{channel_name}}}", f"#{channel_name} (not found)")
-
-                    if cmd_data['type'] == "text":
-                        await message.channel.send(processed_content)
-                    elif cmd_data['type'] == "embed":
-                        # This is a basic embed. Full implementation would parse more options.
-                        embed = discord.Embed(description=processed_content, color=discord.Color.blue())
-                        # Example of parsing a simple title from content (needs more robust parsing)
-                        if "--title " in processed_content:
-                            title_start = processed_content.find("--title ") + len("--title ")
-                            title_end = processed_content.find(" --", title_start)
-                            if title_end == -1: title_end = len(processed_content)
-                            embed.title = processed_content[title_start:title_end].strip().strip('"')
-                        await message.channel.send(embed=embed)
-                    elif cmd_data['type'] == "image":
-                        await message.channel.send(processed_content) # Assuming content is a direct image URL
-                    return # Stop processing after a custom command is triggered
+        if message.author.bot or not message.guild:
+            return # Ignore bot messages and DMs
+        if message.guild.id in self.maintenance_guilds:
+            return # Paused while the guild is in maintenance mode
+
+        guild_cmds = self.custom_cmds.guild(message.guild.id)
+        if not guild_cmds:
+            return # No custom commands in this guild
+
+        # Check for bot prefixes (shared with the command framework, so this is a cached lookup)
+        prefix = self.prefixes.match(message)
+        if prefix is None:
+            return # Not a command
+
+        cmd_name = message.content[len(prefix):].split(' ')[0].lower()
+        
+        cmd_data = guild_cmds.get(cmd_name)
+        if cmd_data is None:
+            return # Not a custom command
+
+        # Custom commands run at normal priority: shed after autoresponders, before moderation work
+        self.scheduler.submit(message.guild.id, PRIORITY_NORMAL, self.run_custom_command, message, cmd_data)
+
+    async def run_custom_command(self, message, cmd_data):
+        """
+        Sends a custom command's response. Runs on the event scheduler.
+        """
+        # Variables like {user}, {channel:name} and {server} are filled in by the shared template renderer
+        await message.channel.send(**render_template(self.bot, cmd_data, message.guild, message.author))
 
 async def setup(bot):
     """
@@ -0,0 +1,213 @@
+# cogs/diagnostics.py
+import discord
+from discord.ext import commands
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import selectors
+import time
+import tracemalloc
+
+from cogs.api_stats import summarize
+from cogs.cog_state import reload_cog
+from cogs.memory_stats import cog_state_sizes
+from cogs.metrics import metrics
+
+MAX_INLINE_METRICS = 1900 # Longer metric dumps are sent as a file instead of a code block
+MAX_PROFILE_SECONDS = 120
+PROFILE_TOP_FUNCTIONS = 15
+API_STATS_ROWS = 15
+MEMSTATS_ROWS = 10
+COGS_DIR = os.path.dirname(os.path.abspath(__file__)) # Allocation sites are only reported for our own code
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+# Event loop machinery wraps every callback, so it would otherwise fill the top of the table
+LOOP_INTERNALS = (os.path.dirname(asyncio.__file__), selectors.__file__)
+LOOP_BUILTINS = ("select.", "_contextvars.Context")
+
+def is_loop_internal(filename, function):
+    if filename == "~":
+        return any(name in function for name in LOOP_BUILTINS)
+    return filename.startswith(LOOP_INTERNALS)
+
+def format_profile(stats, limit=PROFILE_TOP_FUNCTIONS):
+    """
+    Formats cProfile stats ({(file, line, function): (primitive calls, calls, own time, cumulative time, callers)})
+    as a table of the functions with the most cumulative time, leaving out the event loop itself.
+    """
+    idle = max((entry[3] for (filename, _, function), entry in stats.items()
+                if filename == selectors.__file__ and function == "select"), default=0.0)
+    rows = sorted(
+        ((key, entry) for key, entry in stats.items() if not is_loop_internal(key[0], key[2])),
+        key=lambda item: item[1][3], reverse=True
+    )[:limit]
+    lines = [f"Idle (waiting for events): {idle:.3f}s", f"{'cumulative':>10} {'own':>8} {'calls':>7}  function"]
+    for (filename, line, function), (_, calls, own_time, cumulative, _) in rows:
+        location = function if filename == "~" else f"{function} ({os.path.basename(filename)}:{line})"
+        lines.append(f"{cumulative:>9.3f}s {own_time:>7.3f}s {calls:>7}  {location}")
+    return "\n".join(lines)
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # self.qualified_name is automatically set by discord.py
+        self.profiling = False # Only one profile can run at a time
+
+    @commands.command(name="metrics", help="Shows the bot's internal metrics.")
+    @commands.is_owner()
+    async def show_metrics(self, ctx, prefix: str = ""):
+        """
+        Shows the bot's internal metrics (cache hit rates, compile times, ...), optionally only those starting with a prefix.
+        The same metrics are served at /metrics by the keep-alive web server.
+        Usage: XTRM metrics [prefix]
+        Example: XTRM metrics matcher_cache
+        """
+        text = metrics.render(prefix)
+        if not text.strip():
+            return await ctx.send(f"No metrics found{f' starting with `{prefix}`' if prefix else ''}.")
+        if len(text) <= MAX_INLINE_METRICS:
+            return await ctx.send(f"```\n{text}```")
+        await ctx.send("📊 Metrics attached.", file=discord.File(io.BytesIO(text.encode("utf-8")), filename="metrics.txt"))
+
+    @commands.command(name="apistats", help="Shows REST API usage per route or per cog.")
+    @commands.is_owner()
+    async def apistats(self, ctx, group_by: str = "route"):
+        """
+        Shows REST calls since startup grouped by route or by the cog that made them, busiest first:
+        requests, failed requests, retries, 429s, and average/maximum latency (including rate limiter waits).
+        The raw numbers are in `XTRM metrics discord_api`.
+        Usage: XTRM apistats [route|source]
+        Example: XTRM apistats source
+        """
+        group_by = group_by.lower()
+        if group_by not in ("route", "source"):
+            return await ctx.send("❌ Group by `route` or `source`.")
+        rows = summarize(group_by)
+        if not rows:
+            return await ctx.send("No REST calls recorded yet.")
+
+        lines = [f"{'calls':>7} {'err':>5} {'retry':>5} {'429':>4} {'avg ms':>7} {'max ms':>7}  {group_by}"]
+        for key, row in sorted(rows.items(), key=lambda item: item[1]["requests"], reverse=True)[:API_STATS_ROWS]:
+            average = row["seconds"] / row["requests"] * 1000 if row["requests"] else 0.0
+            lines.append(f"{row['requests']:>7} {row['errors']:>5} {row['retries']:>5} {row['ratelimited']:>4} "
+                         f"{average:>7.1f} {row['max'] * 1000:>7.1f}  {key}")
+        text = "\n".join(lines)
+        if len(text) <= MAX_INLINE_METRICS:
+            return await ctx.send(f"```\n{text}```")
+        await ctx.send("📡 API stats attached.", file=discord.File(io.BytesIO(text.encode("utf-8")), filename="apistats.txt"))
+
+    @commands.command(name="memstats", help="Shows memory used by each cog's state.")
+    @commands.is_owner()
+    async def memstats(self, ctx, *, trace: str = None):
+        """
+        Shows the size of every cog store (AFK users, triggers, reply autoroles, ...) and the guilds using the most
+        memory, measured by walking the objects. Walking very large stores pauses the bot briefly.
+        `memstats trace on` starts tracemalloc; while it runs, memstats also lists the lines in the cogs that
+        hold the most memory. Tracing slows the bot down, so turn it off again with `memstats trace off`.
+        Usage: XTRM memstats [trace on|off]
+        Example: XTRM memstats trace on
+        """
+        if trace is not None:
+            setting = trace.lower().removeprefix("trace").strip()
+            if setting == "on":
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(10)
+                return await ctx.send("🧠 tracemalloc started. Run `XTRM memstats` for allocation sites.")
+            if setting == "off":
+                tracemalloc.stop()
+                return await ctx.send("🧠 tracemalloc stopped.")
+            return await ctx.send("❌ Use `XTRM memstats` or `XTRM memstats trace on|off`.")
+
+        stores, guilds = cog_state_sizes(self.bot, {guild.id for guild in self.bot.guilds})
+        lines = [f"{'bytes':>10} {'keys':>8}  store"]
+        for name, (entries, size) in sorted(stores.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"{format_bytes(size):>10} {entries:>8}  {name}")
+        if guilds:
+            lines.append("")
+            lines.append(f"{'bytes':>10}  guild")
+            for guild_id, size in sorted(guilds.items(), key=lambda item: item[1], reverse=True)[:MEMSTATS_ROWS]:
+                guild = self.bot.get_guild(guild_id)
+                lines.append(f"{format_bytes(size):>10}  {guild.name if guild else guild_id}")
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, os.path.join(COGS_DIR, "*"))])
+            lines.append("")
+            lines.append(f"Traced: {format_bytes(current)} (peak {format_bytes(peak)}); top allocation sites in the cogs:")
+            for stat in snapshot.statistics("lineno")[:MEMSTATS_ROWS]:
+                frame = stat.traceback[0]
+                lines.append(f"{format_bytes(stat.size):>10}  {os.path.basename(frame.filename)}:{frame.lineno} ({stat.count} blocks)")
+
+        text = "\n".join(lines)
+        if len(text) <= MAX_INLINE_METRICS:
+            return await ctx.send(f"```\n{text}```")
+        await ctx.send("🧠 Memory stats attached.", file=discord.File(io.BytesIO(text.encode("utf-8")), filename="memstats.txt"))
+
+    @commands.command(name="profile", help="Profiles the bot's event loop for a number of seconds.")
+    @commands.is_owner()
+    async def profile(self, ctx, seconds: int = 10):
+        """
+        Runs cProfile over the live event loop for a window and replies with the functions that took the most
+        cumulative time (listeners, commands, embed building, ...). The full profile is attached as a .prof
+        file; open it with `python -m pstats` or snakeviz.
+        Usage: XTRM profile [seconds]
+        Example: XTRM profile 30
+        """
+        if not 1 <= seconds <= MAX_PROFILE_SECONDS:
+            return await ctx.send(f"❌ Profile for between 1 and {MAX_PROFILE_SECONDS} seconds.")
+        if self.profiling:
+            return await ctx.send("❌ A profile is already running.")
+
+        self.profiling = True
+        await ctx.send(f"⏱️ Profiling the event loop for {seconds}s...")
+        # Everything the loop runs while we sleep (every other task and callback) is recorded
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            self.profiling = False
+
+        profiler.create_stats()
+        summary = format_profile(profiler.stats)
+        filename = f"profile-{int(time.time())}.prof"
+        profile_file = discord.File(io.BytesIO(marshal.dumps(profiler.stats)), filename=filename)
+        if len(summary) <= MAX_INLINE_METRICS:
+            return await ctx.send(f"```\n{summary}```", file=profile_file)
+        await ctx.send("⏱️ Profile attached.", files=[
+            discord.File(io.BytesIO(summary.encode("utf-8")), filename="profile-summary.txt"), profile_file
+        ])
+
+    @commands.command(name="reload", help="Reloads a cog without restarting the bot.")
+    @commands.is_owner()
+    async def reload(self, ctx, extension: str):
+        """
+        Reloads a cog's code in place. Cog data and pending mute/ban expiries are kept, and events that
+        arrive during the swap are replayed to the new version. If the new code fails to load, the old version stays.
+        Usage: XTRM reload <cog>
+        Example: XTRM reload moderation
+        """
+        extension = extension.lower()
+        if not extension.startswith("cogs."):
+            extension = f"cogs.{extension}"
+        if extension not in self.bot.extensions:
+            loaded = ", ".join(f"`{name[len('cogs.'):]}`" for name in sorted(self.bot.extensions))
+            return await ctx.send(f"❌ `{extension}` is not loaded. Loaded cogs: {loaded}")
+        try:
+            replayed = await reload_cog(self.bot, extension)
+        except commands.ExtensionError as e:
+            return await ctx.send(f"❌ Failed to reload `{extension}`; the previous version is still running: {e}")
+        await ctx.send(f"♻️ Reloaded `{extension}` ({replayed} buffered event(s) replayed).")
+
+async def setup(bot):
+    """
+    Adds the Diagnostics cog to the bot.
+    """
+    await bot.add_cog(Diagnostics(bot))
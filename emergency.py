@@ -1,6 +1,18 @@
 # cogs/emergency.py
 import discord
 from discord.ext import commands
+import asyncio
+import datetime
+import re
+
+from cogs.bulk_executor import get_bulk_executor
+from cogs.moderation import duration_to_seconds
+
+BULK_DELETE_BATCH = 100 # Discord's bulk delete limit per request
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14, minutes=-5) # Bulk delete rejects messages older than 14 days; keep a safety margin
+PURGE_SCAN_MULTIPLIER = 10 # purge <amount> scans at most amount * this many messages looking for matches
+PURGE_MAX_SCAN = 10000
+PURGE_USER_CHANNEL_CONCURRENCY = 4 # Channels scanned at once by `purge user`
 
 class Emergency(commands.Cog):
     def __init__(self, bot):
@@ -32,7 +44,164 @@ class Emergency(commands.Cog):
         await ctx.send("✅ Server unlocked! (Placeholder)")
         print(f"Server unlocked by {ctx.author.name}")
 
-    # Placeholder for other Emergency commands like massdelete, panic, etc.
+    async def purge_channel(self, channel, predicate, amount=None, scan_limit=PURGE_MAX_SCAN, before=None, after=None):
+        """
+        Streams a channel's history newest-first and deletes messages matching `predicate`, never holding more
+        than one 100-message batch of each kind in memory. Recent messages go through bulk delete; once history
+        reaches messages older than 14 days (everything after them is old too) they are deleted one by one
+        through the shared bulk executor, a batch at a time.
+        Returns (deleted, failed).
+        """
+        bulk_cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        batch = []
+        old_messages = []
+        deleted = 0
+        failed = 0
+        matched = 0
+
+        async def flush_batch():
+            nonlocal deleted, failed
+            if not batch:
+                return
+            try:
+                if len(batch) == 1:
+                    await batch[0].delete()
+                else:
+                    await channel.delete_messages(batch)
+                deleted += len(batch)
+            except discord.HTTPException as e:
+                failed += len(batch)
+                print(f"Bulk delete failed in #{channel.name}: {e}")
+            batch.clear()
+
+        async def delete_one(message):
+            await message.delete()
+
+        async def flush_old_messages():
+            nonlocal deleted, failed
+            if not old_messages:
+                return
+            result = await get_bulk_executor(self.bot).run(old_messages, delete_one)
+            deleted += len(result.succeeded)
+            failed += len(result.failed)
+            old_messages.clear()
+
+        # history() defaults to oldest-first when `after` is given; purge always wants the newest matches
+        async for message in channel.history(limit=scan_limit, before=before, after=after, oldest_first=False):
+            if message.pinned or not predicate(message):
+                continue
+            matched += 1
+            if message.created_at > bulk_cutoff:
+                batch.append(message)
+                if len(batch) >= BULK_DELETE_BATCH:
+                    await flush_batch()
+            else:
+                old_messages.append(message)
+                if len(old_messages) >= BULK_DELETE_BATCH:
+                    await flush_old_messages()
+            if amount is not None and matched >= amount:
+                break
+        await flush_batch()
+        await flush_old_messages()
+
+        return deleted, failed
+
+    @commands.group(name="purge", invoke_without_command=True, help="Deletes messages matching filters in this channel.")
+    @commands.has_permissions(manage_messages=True)
+    async def purge(self, ctx, amount: int, *, options: str = ""):
+        """
+        Deletes up to <amount> messages in this channel that match all given filters.
+        Usage: XTRM purge <amount> [--user <@member>] [--regex "<pattern>"] [--attachments] [--older <duration>] [--newer <duration>]
+        --older/--newer take durations like 30m, 2h, 7d.
+        Example: XTRM purge 200 --user @Spammer --newer 1h
+        Example: XTRM purge 50 --regex "discord.gg/" --attachments
+        """
+        if amount <= 0:
+            return await ctx.send("❌ Amount must be positive.")
+
+        checks = []
+        user_ids = {int(user_id) for user_id in re.findall(r"--user\s+<?@?!?(\d{15,20})>?", options)}
+        if user_ids:
+            checks.append(lambda m: m.author.id in user_ids)
+
+        regex_match = re.search(r'--regex\s+"([^"]+)"', options)
+        if regex_match:
+            try:
+                pattern = re.compile(regex_match.group(1), re.IGNORECASE)
+            except re.error as e:
+                return await ctx.send(f"❌ Invalid regex: {e}")
+            checks.append(lambda m: bool(pattern.search(m.content)))
+
+        if "--attachments" in options:
+            checks.append(lambda m: bool(m.attachments))
+
+        # Age filters become history() bounds, so Discord only returns messages in range
+        before = ctx.message
+        after = None
+        older_match = re.search(r"--older\s+(\S+)", options)
+        newer_match = re.search(r"--newer\s+(\S+)", options)
+        for match in (older_match, newer_match):
+            if match and duration_to_seconds(match.group(1)) is None:
+                return await ctx.send(f"❌ Invalid duration `{match.group(1)}`. Use s, m, h or d (e.g. `2h`).")
+        if older_match:
+            before = discord.utils.utcnow() - datetime.timedelta(seconds=duration_to_seconds(older_match.group(1)))
+        if newer_match:
+            after = discord.utils.utcnow() - datetime.timedelta(seconds=duration_to_seconds(newer_match.group(1)))
+
+        predicate = lambda m: all(check(m) for check in checks)
+        scan_limit = amount if not checks else min(amount * PURGE_SCAN_MULTIPLIER, PURGE_MAX_SCAN)
+
+        status = await ctx.send(f"🧹 Purging up to {amount} messages...")
+        deleted, failed = await self.purge_channel(ctx.channel, predicate, amount=amount, scan_limit=scan_limit, before=before, after=after)
+        summary = f"✅ Purged {deleted} messages."
+        if failed:
+            summary += f" {failed} could not be deleted."
+        try:
+            await status.edit(content=summary)
+        except discord.HTTPException:
+            await ctx.send(summary)
+        print(f"Purge by {ctx.author.name} in #{ctx.channel.name}: {deleted} deleted, {failed} failed")
+
+    @purge.command(name="user", help="Deletes a member's recent messages in every channel.")
+    @commands.has_permissions(manage_messages=True)
+    async def purge_user(self, ctx, member: discord.User, per_channel: int = 500):
+        """
+        Deletes a user's messages across all text channels, scanning several channels at once.
+        <per_channel> caps how many recent messages are scanned in each channel.
+        Usage: XTRM purge user <@member/ID> [per_channel]
+        Example: XTRM purge user @Spammer 1000
+        """
+        if per_channel <= 0:
+            return await ctx.send("❌ Messages per channel must be positive.")
+
+        channels = [channel for channel in ctx.guild.text_channels
+                    if channel.permissions_for(ctx.guild.me).manage_messages and channel.permissions_for(ctx.guild.me).read_message_history]
+        status = await ctx.send(f"🧹 Purging messages from {member} in {len(channels)} channels...")
+        semaphore = asyncio.Semaphore(PURGE_USER_CHANNEL_CONCURRENCY)
+        predicate = lambda m: m.author.id == member.id
+
+        async def purge_one(channel):
+            async with semaphore:
+                try:
+                    return await self.purge_channel(channel, predicate, scan_limit=min(per_channel, PURGE_MAX_SCAN),
+                                                    before=ctx.message if channel == ctx.channel else None)
+                except discord.HTTPException as e:
+                    print(f"Failed to purge #{channel.name}: {e}")
+                    return 0, 0
+
+        results = await asyncio.gather(*(purge_one(channel) for channel in channels))
+        deleted = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        summary = f"✅ Purged {deleted} messages from {member} across {len(channels)} channels."
+        if failed:
+            summary += f" {failed} could not be deleted."
+        try:
+            await status.edit(content=summary)
+        except discord.HTTPException:
+            await ctx.send(summary)
+        print(f"User purge of {member} by {ctx.author.name}: {deleted} deleted, {failed} failed")
+
+    # Placeholder for other Emergency commands like panic, etc.
 
 async def setup(bot):
     """
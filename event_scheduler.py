@@ -0,0 +1,176 @@
+# cogs/event_scheduler.py
+import asyncio
+import os
+import time
+from collections import deque
+
+from cogs.metrics import metrics
+
+# Priorities, most important first. Moderation/security work can also run on reserved workers,
+# so it keeps making progress even when every other worker is busy.
+PRIORITY_HIGH = 0 # Moderation and security handlers
+PRIORITY_NORMAL = 1 # Custom commands
+PRIORITY_LOW = 2 # Autoresponders, AFK notices: shed first under load
+PRIORITY_NAMES = ("high", "normal", "low")
+
+# Tunables; override with environment variables.
+DEFAULT_WORKERS = int(os.getenv("XTRM_EVENT_WORKERS", 16))
+DEFAULT_RESERVED_WORKERS = int(os.getenv("XTRM_EVENT_RESERVED_WORKERS", 4)) # Only ever run high priority work
+DEFAULT_PER_GUILD_CONCURRENCY = int(os.getenv("XTRM_GUILD_CONCURRENCY", 4)) # Handlers running at once for one guild
+DEFAULT_GUILD_QUEUE_LIMIT = int(os.getenv("XTRM_GUILD_QUEUE_LIMIT", 100)) # Queued handlers per guild
+DEFAULT_GLOBAL_QUEUE_LIMIT = int(os.getenv("XTRM_GLOBAL_QUEUE_LIMIT", 5000)) # Above this, new low priority work is shed
+LOW_PRIORITY_MAX_AGE = 10.0 # Seconds; an autoresponse or AFK notice later than this isn't worth sending
+HIGH_PRIORITY_OVERFLOW = 4 # High priority work is admitted up to this multiple of the guild queue limit
+
+class GuildScheduler:
+    """
+    Runs event handlers through per-guild bounded queues and a fixed pool of workers.
+    Guilds with pending work are served round-robin within each priority, and no guild runs more than
+    `per_guild_concurrency` handlers at once, so one flooding guild can't starve the others.
+
+    Backpressure: when a guild's queue is full, its oldest lower-priority item is shed to make room;
+    low priority work is also shed when the whole scheduler is over `global_queue_limit`, and when it
+    has waited longer than LOW_PRIORITY_MAX_AGE. High priority work is only refused far past the limit.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, reserved_workers=DEFAULT_RESERVED_WORKERS,
+                 per_guild_concurrency=DEFAULT_PER_GUILD_CONCURRENCY, guild_queue_limit=DEFAULT_GUILD_QUEUE_LIMIT,
+                 global_queue_limit=DEFAULT_GLOBAL_QUEUE_LIMIT):
+        self.workers = workers
+        self.reserved_workers = min(reserved_workers, workers - 1)
+        self.per_guild_concurrency = per_guild_concurrency
+        self.guild_queue_limit = guild_queue_limit
+        self.global_queue_limit = global_queue_limit
+        self.queues = [{} for _ in PRIORITY_NAMES] # [priority] -> {guild_id: deque of (enqueued, fn, args)}
+        self.ready = [deque() for _ in PRIORITY_NAMES] # [priority] -> guild IDs with queued work, in round-robin order
+        self.queued = {} # {guild_id: items queued across all priorities}
+        self.running = {} # {guild_id: handlers currently running}
+        self.total_queued = 0
+        self.tasks = []
+        self.work_ready = None # asyncio.Event, created with the workers
+        self.high_ready = None
+        for priority, name in enumerate(PRIORITY_NAMES):
+            metrics.register_gauge("event_queue_depth", lambda p=priority: sum(len(q) for q in self.queues[p].values()), priority=name)
+        metrics.register_gauge("event_handlers_running", lambda: sum(self.running.values()))
+
+    def start(self):
+        if self.tasks:
+            return
+        self.work_ready = asyncio.Event()
+        self.high_ready = asyncio.Event()
+        self.tasks = [asyncio.create_task(self.worker(reserved=index < self.reserved_workers)) for index in range(self.workers)]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def submit(self, guild_id, priority, fn, *args):
+        """
+        Queues `fn(*args)` (a coroutine function) to run for a guild. Returns False if it was shed instead.
+        """
+        self.start()
+        queued = self.queued.get(guild_id, 0)
+        if queued >= self.guild_queue_limit and not self.shed_lower(guild_id, priority):
+            if priority != PRIORITY_HIGH or queued >= self.guild_queue_limit * HIGH_PRIORITY_OVERFLOW:
+                metrics.inc("events_shed_total", priority=PRIORITY_NAMES[priority], reason="guild_queue_full")
+                return False
+        if priority == PRIORITY_LOW and self.total_queued >= self.global_queue_limit:
+            metrics.inc("events_shed_total", priority="low", reason="overloaded")
+            return False
+
+        queue = self.queues[priority].get(guild_id)
+        if queue is None:
+            queue = self.queues[priority][guild_id] = deque()
+        if not queue:
+            self.ready[priority].append(guild_id)
+        queue.append((time.monotonic(), fn, args))
+        self.queued[guild_id] = self.queued.get(guild_id, 0) + 1
+        self.total_queued += 1
+        metrics.inc("events_scheduled_total", priority=PRIORITY_NAMES[priority])
+        self.work_ready.set()
+        if priority == PRIORITY_HIGH:
+            self.high_ready.set()
+        return True
+
+    def shed_lower(self, guild_id, priority):
+        """Drops the guild's oldest queued item with a lower priority than `priority`. Returns True if one was dropped."""
+        for lower in range(len(PRIORITY_NAMES) - 1, priority, -1):
+            queue = self.queues[lower].get(guild_id)
+            if queue:
+                queue.popleft()
+                self._dequeued(guild_id, lower, queue)
+                metrics.inc("events_shed_total", priority=PRIORITY_NAMES[lower], reason="displaced")
+                return True
+        return False
+
+    def _dequeued(self, guild_id, priority, queue):
+        self.queued[guild_id] -= 1
+        if not self.queued[guild_id]:
+            del self.queued[guild_id]
+        self.total_queued -= 1
+        if not queue:
+            del self.queues[priority][guild_id]
+            try:
+                self.ready[priority].remove(guild_id)
+            except ValueError:
+                pass # Already taken off the ready list by take()
+
+    def take(self, high_only):
+        """
+        Returns the next (guild_id, priority, enqueued, fn, args) to run, or None if nothing is eligible.
+        """
+        now = time.monotonic()
+        for priority in range(PRIORITY_HIGH + 1 if high_only else len(PRIORITY_NAMES)):
+            ready = self.ready[priority]
+            for _ in range(len(ready)):
+                guild_id = ready.popleft()
+                queue = self.queues[priority][guild_id]
+                if self.running.get(guild_id, 0) >= self.per_guild_concurrency:
+                    ready.append(guild_id) # Busy; try it again on a later turn
+                    continue
+                enqueued, fn, args = queue.popleft()
+                if queue:
+                    ready.append(guild_id) # Back of the line: round-robin between guilds
+                self._dequeued(guild_id, priority, queue)
+                if priority == PRIORITY_LOW and now - enqueued > LOW_PRIORITY_MAX_AGE:
+                    metrics.inc("events_shed_total", priority="low", reason="stale")
+                    continue
+                return guild_id, priority, enqueued, fn, args
+        return None
+
+    async def worker(self, reserved):
+        event = self.high_ready if reserved else self.work_ready
+        while True:
+            item = self.take(high_only=reserved)
+            if item is None:
+                event.clear()
+                await event.wait()
+                continue
+            guild_id, priority, enqueued, fn, args = item
+            metrics.observe("event_queue_wait_seconds", time.monotonic() - enqueued, priority=PRIORITY_NAMES[priority])
+            self.running[guild_id] = self.running.get(guild_id, 0) + 1
+            try:
+                await fn(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in {getattr(fn, '__qualname__', fn)} for guild {guild_id}: {e}")
+            finally:
+                self.running[guild_id] -= 1
+                if not self.running[guild_id]:
+                    del self.running[guild_id]
+                # A guild held back by its concurrency limit may be eligible again
+                if self.queued.get(guild_id):
+                    self.work_ready.set()
+                    self.high_ready.set()
+
+def get_event_scheduler(bot):
+    """
+    Returns the bot-wide GuildScheduler, creating it on first use. Workers start on the first submit.
+    """
+    scheduler = getattr(bot, "event_scheduler", None)
+    if scheduler is None:
+        scheduler = GuildScheduler()
+        bot.event_scheduler = scheduler
+    return scheduler
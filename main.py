@@ -1,14 +1,23 @@
 # bot.py
 import discord
 from discord.ext import commands
+import asyncio
+import hmac
 import os
-from flask import Flask
+import signal
+from flask import Flask, Response, request
 from threading import Thread
 
-# Define the bot's prefixes
-# The bot will respond to commands starting with 'XTRM ' or 'xtrm '
-# Note the space after the prefix is crucial for proper parsing.
-PREFIXES = ("XTRM ", "xtrm ")
+from cogs.api_stats import api_trace_config, install_api_stats
+from cogs.cog_state import buffer_event
+from cogs.metrics import metrics
+from cogs.prefixes import PrefixResolver
+from cogs.snapshot import load_snapshot, write_snapshot
+
+# Resolve the bot's prefixes
+# The bot responds to 'XTRM ' in any letter case, plus any extra prefixes a server adds with `prefix add`.
+# The resolver is shared with the on_message listeners, so each message is matched against the prefixes once.
+prefix_resolver = PrefixResolver()
 
 # --- Bot Initialization ---
 # We use intents to specify which events our bot needs to listen to.
@@ -21,19 +30,65 @@ intents.message_content = True # Explicitly required for accessing message.conte
 intents.guilds = True  # Required for guild-related events (channel/role creation/deletion)
 intents.voice_states = True # Required for voice role feature (on_voice_state_update)
 
-# Create the bot instance with defined prefixes and intents
-bot = commands.Bot(command_prefix=PREFIXES, intents=intents)
+class XTRMBot(commands.Bot):
+    """
+    The bot, with warm restarts: cog state is snapshotted on graceful shutdown and restored on the next start.
+    """
+
+    async def setup_hook(self):
+        """
+        Runs once before connecting to Discord (unlike on_ready, which fires again after every reconnect).
+        Loads the snapshot left by the last graceful shutdown, then the cogs, which pick up their sections.
+        """
+        install_api_stats(self) # Count REST calls per route and cog (see `XTRM apistats`)
+        self.snapshot_sections = load_snapshot() # Must happen before anything opens the database
+        if self.snapshot_sections:
+            print(f"Restoring state for {len(self.snapshot_sections)} cog(s) from the shutdown snapshot.")
+        await load_cogs()
+        self.snapshot_sections = {} # Drop sections for cogs that failed to load
+        try:
+            # SIGTERM (e.g. from a deploy) otherwise kills the process without running close()
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass # Signal handlers aren't supported on this platform (Windows)
+
+    def dispatch(self, event_name, /, *args, **kwargs):
+        # While a cog is being hot-reloaded, events are held back and replayed once it's swapped in
+        if buffer_event(self, event_name, args, kwargs):
+            return
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def close(self):
+        """
+        Writes the warm-restart snapshot while the cogs are still loaded, then shuts down.
+        """
+        ledger = getattr(self, "voice_ledger", None)
+        if ledger is not None:
+            ledger.stop() # Write pending sessions before the snapshot records the database's state
+        if not self.is_closed() and self.cogs:
+            try:
+                written = write_snapshot(self)
+                print(f"Wrote shutdown snapshot for {written} cog(s).")
+            except Exception as e:
+                print(f"Failed to write shutdown snapshot: {e}")
+        scheduler = getattr(self, "event_scheduler", None)
+        if scheduler is not None:
+            scheduler.stop() # Queued handlers are dropped; they'd only fail once the connection is gone
+        await super().close()
+
+# Create the bot instance with the prefix resolver and intents
+# http_trace lets api_stats see every HTTP attempt, including discord.py's internal 429 retries
+bot = XTRMBot(command_prefix=prefix_resolver, intents=intents, http_trace=api_trace_config())
 
 # --- Bot Events ---
 @bot.event
 async def on_ready():
     """
     Event that fires when the bot successfully connects to Discord.
-    Prints a confirmation message and loads all cogs.
+    Prints a confirmation message. Cogs are loaded once in setup_hook.
     """
     print(f'Logged in as {bot.user.name} ({bot.user.id})')
     print('Bot is ready!')
-    await load_cogs() # Load all cogs when the bot is ready
 
 async def load_cogs():
     """
@@ -49,7 +104,11 @@ async def load_cogs():
         'cogs.emergency',
         'cogs.utility',
         'cogs.custom_commands',
-        'cogs.autoresponders'
+        'cogs.autoresponders',
+        'cogs.raid',
+        'cogs.reaction_roles',
+        'cogs.announcements',
+        'cogs.diagnostics'
     ]
     for cog in cogs_to_load:
         try:
@@ -105,6 +164,46 @@ def get_command_examples(prefix, command_name):
             f"**Give a role:** `{prefix}manageroles give @User#1234 @Member Role`",
             f"**Remove a role:** `{prefix}manageroles remove @User#1234 Old Role`"
         ]
+    elif command_name == "cases":
+        examples = [
+            f"**Show a member's history:** `{prefix}cases @User#1234`",
+            f"**Show the next page:** `{prefix}cases @User#1234 120` (case number from the footer)",
+            f"**Show a moderator's cases:** `{prefix}cases mod @Moderator`"
+        ]
+    elif command_name == "escalation":
+        examples = [
+            f"**Show warn escalations:** `{prefix}escalation`",
+            f"**Mute for 1 hour at 3 warnings:** `{prefix}escalation set 3 mute 1h`",
+            f"**Stop kicking at 5 warnings:** `{prefix}escalation remove 5`"
+        ]
+    elif command_name == "modlog":
+        examples = [
+            f"**Set the log channel:** `{prefix}modlog set #mod-logs`",
+            f"**Flush every 10 seconds:** `{prefix}modlog interval 10`",
+            f"**Disable logging:** `{prefix}modlog disable`"
+        ]
+    elif command_name == "massban":
+        examples = [
+            f"**Ban a list of IDs:** `{prefix}massban 123456789012345678 234567890123456789 --confirm`",
+            f"**Ban recent raid accounts:** `{prefix}massban --filter \"joined<30m age<2d\" --reason \"Raid\" --confirm`",
+            f"**Preview a ban from an attached ID list:** `{prefix}massban` (with a .txt attachment)"
+        ]
+    elif command_name == "masskick":
+        examples = [
+            f"**Kick members matching a name:** `{prefix}masskick --filter \"name~spam\" --confirm`"
+        ]
+    elif command_name == "massrole":
+        examples = [
+            f"**Give a role to filtered members:** `{prefix}massrole give @Verified --filter \"age>30d\" --confirm`",
+            f"**Remove a role from listed members:** `{prefix}massrole remove @Trial 123456789012345678 --confirm`"
+        ]
+    elif command_name == "find":
+        examples = [
+            f"**Find staff impersonators:** `{prefix}find Admin`",
+            f"**Names starting with a word:** `{prefix}find prefix mod`",
+            f"**Allow a typo or two:** `{prefix}find fuzzy ModTeam --joined 7d`",
+            f"**Regex on raw names (bot owner only):** `{prefix}find regex ^raider\\d+$`"
+        ]
     elif command_name == "autorole": # This is a group, its examples will be for subcommands
         examples = [] # This function is for direct commands, not groups.
     elif command_name == "reply": # Subcommand of autorole
@@ -133,6 +232,48 @@ def get_command_examples(prefix, command_name):
             f"**Lock server during raid:** `{prefix}serverlock Raid detected`",
             f"**Unlock server:** `{prefix}serverunlock`"
         ]
+    elif command_name == "raidmode":
+        examples = [
+            f"**Show raid mode status:** `{prefix}raidmode`",
+            f"**Enable raid mode for 30 minutes:** `{prefix}raidmode on 30`",
+            f"**Tune the join threshold:** `{prefix}raidmode config threshold 20`",
+            f"**Hold joiners with a role:** `{prefix}raidmode quarantine @Quarantine`",
+            f"**Preview a raid cleanup:** `{prefix}raidmode cleanup 15 ban --age 3`",
+            f"**Run a raid cleanup:** `{prefix}raidmode cleanup 15 ban --name \"raider\" --confirm`"
+        ]
+    elif command_name == "purge":
+        examples = [
+            f"**Delete the last 50 messages:** `{prefix}purge 50`",
+            f"**Delete a spammer's recent messages:** `{prefix}purge 200 --user @Spammer --newer 1h`",
+            f"**Delete invite links:** `{prefix}purge 100 --regex \"discord\\.gg/\"`",
+            f"**Purge a user everywhere:** `{prefix}purge user @Spammer`"
+        ]
+    elif command_name == "apistats":
+        examples = [
+            f"**Busiest routes:** `{prefix}apistats`",
+            f"**REST calls per cog:** `{prefix}apistats source`"
+        ]
+    elif command_name == "memstats":
+        examples = [
+            f"**Memory per cog store and guild:** `{prefix}memstats`",
+            f"**Also show allocation sites:** `{prefix}memstats trace on`",
+            f"**Stop tracing:** `{prefix}memstats trace off`"
+        ]
+    elif command_name == "profile":
+        examples = [
+            f"**Profile for 10 seconds:** `{prefix}profile`",
+            f"**Profile for 30 seconds:** `{prefix}profile 30`"
+        ]
+    elif command_name == "reload":
+        examples = [
+            f"**Reload the moderation cog:** `{prefix}reload moderation`",
+            f"**Reload autoresponders:** `{prefix}reload cogs.autoresponders`"
+        ]
+    elif command_name == "metrics":
+        examples = [
+            f"**Show all metrics:** `{prefix}metrics`",
+            f"**Show matcher cache metrics:** `{prefix}metrics matcher_cache`"
+        ]
     elif command_name == "afk":
         examples = [
             f"**Set AFK status with reason:** `{prefix}afk Taking a quick break`",
@@ -143,6 +284,17 @@ def get_command_examples(prefix, command_name):
         examples = [
             f"**Toggle maintenance mode:** `{prefix}maintenance` (toggles mode)"
         ]
+    elif command_name == "prefix":
+        examples = [
+            f"**Add a prefix:** `{prefix}prefix add \"! \"`",
+            f"**Remove a prefix:** `{prefix}prefix remove \"! \"`",
+            f"**List prefixes:** `{prefix}prefix list`"
+        ]
+    elif command_name == "voicetop":
+        examples = [
+            f"**All-time voice leaderboard:** `{prefix}voicetop`",
+            f"**Most active this week:** `{prefix}voicetop 7d`"
+        ]
     elif command_name == "voicerole":
         examples = [
             f"**Setup voice role:** `{prefix}voicerole setup @VoiceUserRole`",
@@ -155,7 +307,9 @@ def get_command_examples(prefix, command_name):
             f"**Create embed command:** `{prefix}customcmd create rules embed \"Check #rules!\" --title \"Server Rules\" --color #FF0000`",
             f"**Edit existing command:** `{prefix}customcmd edit welcome \"Updated: Welcome to the server!\"`",
             f"**Delete a command:** `{prefix}customcmd delete welcome`",
-            f"**List all commands:** `{prefix}customcmd list`"
+            f"**List all commands:** `{prefix}customcmd list`",
+            f"**Validate a command pack:** `{prefix}customcmd import --dry-run` (with a .json/.ndjson attachment)",
+            f"**Export all commands:** `{prefix}customcmd export`"
         ]
     elif command_name == "autoresponder":
         examples = [
@@ -163,7 +317,23 @@ def get_command_examples(prefix, command_name):
             f"**Create embed autoresponder:** `{prefix}autoresponder create \"rules?\" embed \"Check #rules!\" --title \"Rules\" --color #FF0000`",
             f"**Edit autoresponder:** `{prefix}autoresponder edit \"hello\" \"Hello, {{user}}! How can I help?\"`",
             f"**Delete autoresponder:** `{prefix}autoresponder delete \"rules?\"`",
-            f"**List all autoresponders:** `{prefix}autoresponder list`"
+            f"**List all autoresponders:** `{prefix}autoresponder list`",
+            f"**Import a starter pack:** `{prefix}autoresponder import` (with a .json/.ndjson attachment)",
+            f"**Export all autoresponders:** `{prefix}autoresponder export`"
+        ]
+    elif command_name == "reactionrole":
+        examples = [
+            f"**Bind an emoji to a role:** `{prefix}reactionrole add 123456789012345678 🎮 @Gamer`",
+            f"**Use a message link:** `{prefix}reactionrole add https://discord.com/channels/1/2/3 🔔 @Announcements`",
+            f"**Remove one binding:** `{prefix}reactionrole remove 123456789012345678 🎮`",
+            f"**List reaction roles:** `{prefix}reactionrole list`"
+        ]
+    elif command_name == "announce":
+        examples = [
+            f"**Daily rules reminder:** `{prefix}announce add #general now 1d text \"Please read {{channel:rules}}!\"`",
+            f"**One-off event post:** `{prefix}announce add #events 2h once embed \"Game night starts now!\" --title \"Game Night\"`",
+            f"**List announcements:** `{prefix}announce list`",
+            f"**Remove an announcement:** `{prefix}announce remove 12`"
         ]
     return examples
 
@@ -329,9 +499,13 @@ async def advhelp(ctx, *, query: str = None):
             "Security": "🛡️ Protect your server with advanced anti-nuke, raid mode, and access controls.",
             "Moderation": "🛠️ Tools for effective community management, warnings, mutes, and role handling.",
             "Emergency": "🚨 Critical commands for immediate server lockdown and mass actions.",
-            "Utility": "⚙️ General purpose commands including AFK, server info, and voice roles.",
+            "Utility": "⚙️ General purpose commands including AFK, server info, voice roles and voice leaderboards.",
             "CustomCommands": "✍️ Create personalized, dynamic commands for your server.",
-            "Autoresponders": "💬 Set up advanced automatic replies based on keywords and phrases."
+            "Autoresponders": "💬 Set up advanced automatic replies based on keywords and phrases.",
+            "RaidProtection": "🚧 Join-rate raid detection with automatic raid mode for new joiners.",
+            "ReactionRoles": "🎭 Self-assignable roles: members react to a message to get or drop a role.",
+            "Announcements": "📣 Scheduled and recurring announcements using custom command templates.",
+            "Diagnostics": "📊 Owner-only tools for inspecting the bot's performance in production."
         }
 
         module_list_str = []
@@ -356,6 +530,19 @@ app = Flask('')
 def home():
     return "Bot is alive!"
 
+# The keep-alive server is public, so /metrics needs `Authorization: Bearer <XTRM_METRICS_TOKEN>`.
+# Without a token configured it only answers requests from the machine itself.
+METRICS_TOKEN = os.getenv("XTRM_METRICS_TOKEN")
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain", headers={"WWW-Authenticate": "Bearer"})
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return Response("Forbidden: set XTRM_METRICS_TOKEN to scrape metrics remotely\n", status=403, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain")
+
 def run_flask():
     app.run(host='0.0.0.0', port=os.environ.get('PORT', 8080)) # Use PORT from environment or default
 
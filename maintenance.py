@@ -0,0 +1,18 @@
+# cogs/maintenance.py
+from discord.ext import commands
+
+from cogs.storage import get_settings
+
+class MaintenanceModeError(commands.CheckFailure):
+    """Raised by the global check when a guild is in maintenance mode."""
+
+def get_maintenance_guilds(bot):
+    """
+    Returns the bot-wide set of guild IDs currently in maintenance mode, loading it from guild settings on first use.
+    Checking a guild is a set lookup, so message listeners can bail out for almost nothing.
+    """
+    guilds = getattr(bot, "maintenance_guilds", None)
+    if guilds is None:
+        guilds = {guild_id for guild_id, enabled in get_settings().guilds_with("maintenance").items() if enabled}
+        bot.maintenance_guilds = guilds
+    return guilds
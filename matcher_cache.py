@@ -0,0 +1,60 @@
+# cogs/matcher_cache.py
+import os
+import time
+from collections import OrderedDict
+
+from cogs.metrics import metrics
+
+# Memory budget for each matcher cache; override with XTRM_MATCHER_CACHE_BYTES.
+DEFAULT_BUDGET_BYTES = int(os.getenv("XTRM_MATCHER_CACHE_BYTES", 32 * 1024 * 1024))
+
+class MatcherCache:
+    """
+    Bounded LRU of compiled per-guild matchers keyed on guild ID.
+    Each entry remembers the store version it was compiled from, so edits invalidate it automatically.
+    When the estimated size of all entries exceeds the budget, the least recently used guilds are
+    evicted; they are recompiled from the store on their next message.
+    `compile_fn(guild_id)` must return an object with a `size` attribute (estimated bytes).
+    """
+
+    def __init__(self, name, compile_fn, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.name = name
+        self.compile_fn = compile_fn
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict() # {guild_id: (version, matcher)}
+        self.total_bytes = 0
+        metrics.register_gauge("matcher_cache_entries", lambda: len(self.entries), cache=name)
+        metrics.register_gauge("matcher_cache_bytes", lambda: self.total_bytes, cache=name)
+
+    def get(self, guild_id, version):
+        entry = self.entries.get(guild_id)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(guild_id)
+            metrics.inc("matcher_cache_hits_total", cache=self.name)
+            return entry[1]
+
+        metrics.inc("matcher_cache_misses_total", cache=self.name, reason="stale" if entry else "cold")
+        if entry is not None:
+            self.total_bytes -= entry[1].size
+            del self.entries[guild_id]
+
+        started = time.perf_counter()
+        matcher = self.compile_fn(guild_id)
+        metrics.observe("matcher_compile_seconds", time.perf_counter() - started, cache=self.name)
+
+        self.entries[guild_id] = (version, matcher)
+        self.total_bytes += matcher.size
+        while self.total_bytes > self.budget_bytes and len(self.entries) > 1:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            metrics.inc("matcher_cache_evictions_total", cache=self.name)
+        return matcher
+
+    def invalidate(self, guild_id):
+        entry = self.entries.pop(guild_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[1].size
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,351 @@
+# cogs/member_index.py
+import asyncio
+import bisect
+import re
+import unicodedata
+
+from cogs.singleflight import get_single_flight
+
+BUILD_CHUNK = 5000 # Members indexed between yields to the event loop
+
+class JoinIndex:
+    """
+    Members of one guild sorted by join time, so "everyone who joined since X" is a bisect
+    plus a slice: O(log n + k) instead of a scan over every member.
+    Entries are (joined_at_timestamp, member_id) tuples kept in ascending order.
+    """
+    __slots__ = ("entries", "joined_at")
+
+    def __init__(self):
+        self.entries = [] # [(joined_at_timestamp, member_id)], sorted
+        self.joined_at = {} # {member_id: joined_at_timestamp}, for O(log n) removal
+
+    @classmethod
+    def from_members(cls, members):
+        """Builds the index from a guild's cached members in one sort."""
+        index = cls()
+        for member in members:
+            if member.joined_at:
+                index.joined_at[member.id] = member.joined_at.timestamp()
+        index.entries = sorted((ts, member_id) for member_id, ts in index.joined_at.items())
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, member_id, timestamp):
+        if member_id in self.joined_at:
+            self.remove(member_id)
+        self.joined_at[member_id] = timestamp
+        bisect.insort(self.entries, (timestamp, member_id))
+
+    def remove(self, member_id):
+        timestamp = self.joined_at.pop(member_id, None)
+        if timestamp is None:
+            return
+        position = bisect.bisect_left(self.entries, (timestamp, member_id))
+        if position < len(self.entries) and self.entries[position] == (timestamp, member_id):
+            del self.entries[position]
+
+    def joined_since(self, timestamp):
+        """
+        Yields member IDs that joined at or after `timestamp`, oldest first.
+        """
+        start = bisect.bisect_left(self.entries, (timestamp, 0))
+        for position in range(start, len(self.entries)):
+            yield self.entries[position][1]
+
+# Characters that look like (or are commonly used for) Latin letters, mapped to the letter they imitate.
+# Applied after NFKD + dropping combining marks, which already folds accents and fullwidth/stylised letters.
+CONFUSABLES = str.maketrans({
+    # Cyrillic
+    "а": "a", "в": "b", "с": "c", "е": "e", "ё": "e", "һ": "h", "і": "i", "ї": "i", "ј": "j", "к": "k",
+    "м": "m", "н": "h", "о": "o", "р": "p", "ԛ": "q", "ѕ": "s", "т": "t", "у": "y", "х": "x", "ԝ": "w",
+    # Greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ω": "w",
+    # Lookalike digits and symbols
+    "0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s", "|": "l", "!": "i",
+    # Letters that are confused with each other in most fonts
+    "ı": "i", "ł": "l", "ø": "o", "đ": "d", "ħ": "h",
+})
+
+_NON_ALNUM_RE = re.compile(r"[\W_]+")
+
+def fold_name(name):
+    """
+    Reduces a name to a lowercase Latin skeleton for impersonation searches: accents, fullwidth/stylised
+    letters, Cyrillic/Greek lookalikes, leetspeak digits and punctuation are all folded away, so 'Ádmin',
+    'ＡＤＭＩＮ', 'аdmin' (Cyrillic а), '4dm1n' and 'a.d.m.i.n' get the same key. Queries are folded the same way.
+    """
+    folded = name.casefold()
+    if not folded.isascii(): # Most names are plain ASCII and skip the Unicode work
+        folded = "".join(char for char in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(char))
+    folded = _NON_ALNUM_RE.sub("", folded.translate(CONFUSABLES))
+    # "i" and "l" are interchangeable in most fonts (and after the digit folding above), so they share a key
+    return folded.replace("i", "l")
+
+def _levenshtein_row(previous, query, char):
+    """Returns the next edit-distance row for appending `char` to the candidate, given the row before it."""
+    row = [previous[0] + 1]
+    for position, query_char in enumerate(query, 1):
+        row.append(min(row[position - 1] + 1, previous[position] + 1, previous[position - 1] + (query_char != char)))
+    return row
+
+def _prefix_successor(prefix):
+    """Returns the smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class GuildMemberIndex:
+    """
+    Searchable index of one guild's member names (username, global name and nickname) plus their join times.
+
+    Names are folded with `fold_name` and kept as (key, member_id) tuples in one sorted list. That list
+    doubles as a trie: prefix queries are a bisect plus a slice, and fuzzy queries walk it in order, sharing
+    edit-distance rows between neighbouring keys and skipping whole prefixes that are already too far off.
+    Substring and regex queries search one joined string per guild with C-level `str.find`/`re`, rebuilt
+    lazily after changes. All queries cost milliseconds even for 500k members, and updates are O(log n) + memmove.
+    """
+    __slots__ = ("keys", "member_keys", "joins", "names", "_folded_text", "_raw_text")
+
+    def __init__(self):
+        self.keys = [] # [(folded_name, member_id)], sorted
+        self.member_keys = {} # {member_id: (folded_name, ...)}, for removal
+        self.names = {} # {member_id: "username\nglobal name\nnickname"}, searched by regex queries
+        self.joins = JoinIndex()
+        self._folded_text = None # (text, line_starts, line_ids), built on first substring query after a change
+        self._raw_text = None
+
+    @classmethod
+    async def build(cls, members):
+        """
+        Builds the index from a guild's cached members, yielding to the event loop every BUILD_CHUNK members
+        so indexing a huge guild (a few seconds for 500k members) doesn't stall the bot.
+        """
+        index = cls()
+        members = list(members)
+        for start in range(0, len(members), BUILD_CHUNK):
+            for member in members[start:start + BUILD_CHUNK]:
+                index._store(member)
+            await asyncio.sleep(0)
+        index.keys = sorted((key, member_id) for member_id, keys in index.member_keys.items() for key in keys)
+        index.joins = JoinIndex.from_members(members)
+        return index
+
+    def __len__(self):
+        return len(self.member_keys)
+
+    @staticmethod
+    def member_names(member):
+        names = [member.name]
+        for name in (member.global_name, member.nick):
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def _store(self, member):
+        names = self.member_names(member)
+        keys = tuple({fold_name(name) for name in names} - {""})
+        self.member_keys[member.id] = keys
+        self.names[member.id] = "\n".join(names)
+        self._folded_text = self._raw_text = None
+        return keys
+
+    def add(self, member):
+        """Adds or refreshes a member, e.g. after a join or a name/nickname change."""
+        self.remove(member.id, keep_join=True)
+        for key in self._store(member):
+            bisect.insort(self.keys, (key, member.id))
+        if member.joined_at and member.id not in self.joins.joined_at:
+            self.joins.add(member.id, member.joined_at.timestamp())
+
+    def remove(self, member_id, keep_join=False):
+        for key in self.member_keys.pop(member_id, ()):
+            position = bisect.bisect_left(self.keys, (key, member_id))
+            if position < len(self.keys) and self.keys[position] == (key, member_id):
+                del self.keys[position]
+        self.names.pop(member_id, None)
+        self._folded_text = self._raw_text = None
+        if not keep_join:
+            self.joins.remove(member_id)
+
+    def prefix(self, query):
+        """Yields IDs of members with a name whose folded form starts with `query`'s, in name order."""
+        query = fold_name(query)
+        if not query:
+            return
+        seen = set()
+        for position in range(bisect.bisect_left(self.keys, (query,)), len(self.keys)):
+            key, member_id = self.keys[position]
+            if not key.startswith(query):
+                return
+            if member_id not in seen:
+                seen.add(member_id)
+                yield member_id
+
+    @staticmethod
+    def _search_text(lines):
+        """Joins (member_id, text) lines into one string, with line start offsets for mapping matches back."""
+        starts, ids, parts, offset = [], [], [], 0
+        for member_id, text in lines:
+            starts.append(offset)
+            ids.append(member_id)
+            parts.append(text)
+            offset += len(text) + 1
+        return "\n".join(parts), starts, ids
+
+    @staticmethod
+    def _matches(search_text, positions):
+        """Yields the member ID owning each match offset, once per member."""
+        text, starts, ids = search_text
+        last = None
+        for position in positions:
+            member_id = ids[bisect.bisect_right(starts, position) - 1]
+            if member_id != last:
+                last = member_id
+                yield member_id
+
+    def contains(self, query):
+        """Yields IDs of members with a name whose folded form contains `query`'s."""
+        query = fold_name(query)
+        if not query:
+            return
+        if self._folded_text is None:
+            # Keys never contain "\n", so a match can't span two members
+            self._folded_text = self._search_text((member_id, "\n".join(keys)) for member_id, keys in self.member_keys.items())
+        text = self._folded_text[0]
+
+        def positions():
+            position = text.find(query)
+            while position != -1:
+                yield position
+                # Skip to the next member's line; one match per member is enough
+                line_end = text.find("\n", position + len(query))
+                position = -1 if line_end == -1 else text.find(query, line_end)
+
+        yield from dict.fromkeys(self._matches(self._folded_text, positions()))
+
+    def regex(self, pattern):
+        """Yields IDs of members with a raw username, global name or nickname matched by `pattern` (compiled, re.M applies per name)."""
+        if self._raw_text is None:
+            self._raw_text = self._search_text(self.names.items())
+        yield from dict.fromkeys(self._matches(self._raw_text, (match.start() for match in pattern.finditer(self._raw_text[0]))))
+
+    def fuzzy(self, query, max_distance=1):
+        """
+        Returns [(distance, member_id)] for members with a name within `max_distance` edits of `query`
+        (after folding), closest first.
+        """
+        query = fold_name(query)
+        if not query:
+            return []
+        keys = self.keys
+        rows = [list(range(len(query) + 1))] # rows[depth] = edit distances after the first `depth` chars of the current key
+        previous = ""
+        best = {}
+        position = 0
+        while position < len(keys):
+            key, member_id = keys[position]
+            # Reuse the rows for the prefix shared with the previous key, like walking down a trie
+            common = 0
+            limit = min(len(previous), len(key), len(rows) - 1)
+            while common < limit and previous[common] == key[common]:
+                common += 1
+            del rows[common + 1:]
+            previous = key
+            pruned = False
+            for depth in range(common, len(key)):
+                row = _levenshtein_row(rows[-1], query, key[depth])
+                rows.append(row)
+                if min(row) > max_distance:
+                    # No key with this prefix can get back within range: skip all of them
+                    position = bisect.bisect_left(keys, (_prefix_successor(key[:depth + 1]),), position)
+                    pruned = True
+                    break
+            if pruned:
+                continue
+            distance = rows[-1][-1]
+            if distance <= max_distance and distance < best.get(member_id, max_distance + 1):
+                best[member_id] = distance
+            position += 1
+        return sorted((distance, member_id) for member_id, distance in best.items())
+
+class MemberIndex:
+    """
+    Per-guild GuildMemberIndex instances, built on first search and kept in sync from member
+    join/update/leave events and user (username/global name) updates.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.guilds = {} # {guild_id: GuildMemberIndex}
+        self.pending = {} # {guild_id: [(member_id, member or None)]}, changes seen while the guild's index is being built
+        for listener in (self.on_member_join, self.on_member_remove, self.on_member_update, self.on_user_update,
+                         self.on_guild_remove):
+            bot.add_listener(listener)
+
+    async def get(self, guild):
+        """Returns the guild's index, building it on first use. Concurrent first searches share one build."""
+        index = self.guilds.get(guild.id)
+        if index is None:
+            index = await get_single_flight(self.bot).do((guild.id, "member_index"), lambda: self._build(guild))
+        return index
+
+    async def _build(self, guild):
+        self.pending[guild.id] = []
+        try:
+            index = await GuildMemberIndex.build(guild.members)
+            # Apply joins, leaves and renames that arrived while the build was yielding
+            for member_id, member in self.pending[guild.id]:
+                if member is None:
+                    index.remove(member_id)
+                else:
+                    index.add(member)
+        finally:
+            del self.pending[guild.id]
+        self.guilds[guild.id] = index
+        return index
+
+    def _changed(self, guild_id, member_id, member=None):
+        """Adds/refreshes `member`, or removes `member_id` if `member` is None, in a built or building index."""
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            if member is None:
+                index.remove(member_id)
+            else:
+                index.add(member)
+        elif guild_id in self.pending:
+            self.pending[guild_id].append((member_id, member))
+
+    # Listeners only touch guilds whose index has been (or is being) built; others are built fresh on first use.
+    async def on_member_join(self, member):
+        self._changed(member.guild.id, member.id, member)
+
+    async def on_member_remove(self, member):
+        self._changed(member.guild.id, member.id)
+
+    async def on_member_update(self, before, after):
+        if before.nick != after.nick:
+            self._changed(after.guild.id, after.id, after)
+
+    async def on_user_update(self, before, after):
+        if before.name == after.name and before.global_name == after.global_name:
+            return
+        for guild_id in list(self.guilds) + list(self.pending):
+            guild = self.bot.get_guild(guild_id)
+            member = guild.get_member(after.id) if guild else None
+            if member is not None:
+                self._changed(guild_id, member.id, member)
+
+    async def on_guild_remove(self, guild):
+        self.guilds.pop(guild.id, None)
+
+def get_member_index(bot):
+    """
+    Returns the bot-wide MemberIndex, creating it (and registering its listeners) on first use.
+    """
+    index = getattr(bot, "member_index", None)
+    if index is None:
+        index = MemberIndex(bot)
+        bot.member_index = index
+    return index
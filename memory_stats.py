@@ -0,0 +1,67 @@
+# cogs/memory_stats.py
+import sys
+from collections import deque
+
+CONTAINERS = (list, tuple, set, frozenset, deque)
+OPAQUE = (str, bytes, int, float, bool, type(None)) # Leaf values: getsizeof is the whole story
+
+def deep_sizeof(obj, seen=None):
+    """
+    Returns the bytes used by `obj` and everything it references: dict keys and values, container items,
+    and the attributes of plain and slotted objects. Objects already in `seen` (a set of ids) aren't
+    counted again, so interned records shared between guilds are counted once per call.
+    Types, functions and modules are never followed.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, OPAQUE):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, CONTAINERS):
+            stack.extend(current)
+        elif not isinstance(current, type) and not callable(current):
+            attributes = getattr(current, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for cls in type(current).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    value = getattr(current, name, None)
+                    if value is not None:
+                        stack.append(value)
+    return total
+
+def per_guild_mapping(value):
+    """Returns the {guild_id: data} mapping inside a store (a dict, or a TriggerStore's `guilds`), or None."""
+    if isinstance(value, dict):
+        return value
+    guilds = getattr(value, "guilds", None)
+    return guilds if isinstance(guilds, dict) else None
+
+def cog_state_sizes(bot, guild_ids):
+    """
+    Measures every store in the bot-level cog state registry (see `cogs.cog_state`).
+    Returns ({"Cog.store": (entries, bytes)}, {guild_id: bytes}). A store counts toward a guild when it is
+    keyed by that guild's ID; stores keyed by user (afk_users, mutes) only show up in the totals.
+    """
+    stores = {}
+    guilds = {}
+    for cog_name, state in getattr(bot, "cog_states", {}).items():
+        for store_name, value in vars(state).items():
+            mapping = per_guild_mapping(value)
+            stores[f"{cog_name}.{store_name}"] = (len(mapping) if mapping is not None else 0, deep_sizeof(value))
+            if mapping is None:
+                continue
+            for key, data in list(mapping.items()):
+                if key in guild_ids:
+                    guilds[key] = guilds.get(key, 0) + deep_sizeof(data)
+    return stores, guilds
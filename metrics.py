@@ -0,0 +1,86 @@
+# cogs/metrics.py
+import threading
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(label_key):
+    if not label_key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in label_key) + "}"
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: counters, gauges and summaries (count/sum/max), rendered in the
+    Prometheus text format. Served at /metrics by the keep-alive web server and by `XTRM metrics`.
+    Gauge callbacks registered with `register_gauge` are evaluated at render time, so live sizes
+    (cache entries, buffered items, ...) don't need to be pushed on every change.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock() # render() runs on the web server thread
+        self.counters = {} # {(name, label_key): value}
+        self.gauges = {} # {(name, label_key): value}
+        self.summaries = {} # {(name, label_key): [count, total, maximum]}
+        self.gauge_callbacks = {} # {(name, label_key): callable returning a number}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def register_gauge(self, name, callback, **labels):
+        """Registers a callback returning the gauge's current value, evaluated on every render."""
+        self.gauge_callbacks[(name, _label_key(labels))] = callback
+
+    def counter_value(self, name, **labels):
+        return self.counters.get((name, _label_key(labels)), 0)
+
+    def items(self, prefix=""):
+        """Yields (name, label_key, value) for every series whose name starts with `prefix`."""
+        with self.lock:
+            series = list(self.counters.items()) + list(self.gauges.items())
+            summaries = [(key, list(value)) for key, value in self.summaries.items()]
+        for (name, label_key), value in series:
+            if name.startswith(prefix):
+                yield name, label_key, value
+        for (name, label_key), (count, total, maximum) in summaries:
+            if name.startswith(prefix):
+                yield f"{name}_count", label_key, count
+                yield f"{name}_sum", label_key, total
+                yield f"{name}_max", label_key, maximum
+        for (name, label_key), callback in list(self.gauge_callbacks.items()):
+            if not name.startswith(prefix):
+                continue
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed: {e}")
+                continue
+            yield name, label_key, value
+
+    def render(self, prefix=""):
+        lines = []
+        for name, label_key, value in sorted(self.items(prefix), key=lambda item: (item[0], item[1])):
+            if isinstance(value, float):
+                value = round(value, 6)
+            lines.append(f"{name}{_format_labels(label_key)} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
@@ -1,15 +1,253 @@
 # cogs/moderation.py
 import discord
 from discord.ext import commands
-import asyncio # For sleep in tempban/tempmute
+import asyncio # For tempban/tempmute expiry tasks
+import datetime
+import re
+import time
+
+from cogs.bulk_executor import get_bulk_executor
+from cogs.case_log import CaseLog
+from cogs.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from cogs.cog_state import CogState, get_cog_state
+from cogs.event_scheduler import PRIORITY_HIGH, get_event_scheduler
+from cogs.maintenance import get_maintenance_guilds
+from cogs.member_index import get_member_index
+from cogs.modlog import DEFAULT_FLUSH_INTERVAL, FIELD_VALUE_CHARS, get_modlog_sink, shorten
+from cogs.name_index import get_name_index
+from cogs.paginator import PageSource, Paginator, get_page_source, new_page_source_cache
+from cogs.prefixes import get_prefix_resolver
+from cogs.singleflight import get_single_flight
+from cogs.storage import get_db, get_settings
+
+ID_RE = re.compile(r"\b\d{15,20}\b") # Discord snowflakes, also matches the ID inside <@123...> mentions
+MAX_ID_ATTACHMENT_BYTES = 2 * 1024 * 1024 # Largest ID list attachment mass actions will read
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+CASES_PER_PAGE = 10
+CASE_REASON_CHARS = 400 # Per case in `cases` pages, so a full page stays under Discord's 6000 character embed limit
+FIND_MODES = ("contains", "prefix", "fuzzy", "regex")
+MAX_FIND_RESULTS = 500 # Matches shown by `find`; narrow the query (or add --joined) for more specific results
+# Default automatic escalation when a member reaches an exact warn count: {warn_count: (action, duration)}
+# Guilds can replace these with `XTRM escalation set/remove`.
+WARN_ESCALATIONS = {3: ("mute", "1h"), 5: ("kick", None)}
+ESCALATION_PERMISSIONS = {"mute": "manage_roles", "kick": "kick_members"} # What the warning moderator needs for each action
+
+def duration_to_seconds(text):
+    """
+    Parses durations like 30s, 10m, 2h or 7d. Returns None for anything else.
+    """
+    if len(text) < 2 or text[-1] not in DURATION_UNITS or not text[:-1].isdigit():
+        return None
+    return int(text[:-1]) * DURATION_UNITS[text[-1]]
+
+def parse_member_filter(expression):
+    """
+    Turns a filter expression into a member predicate. Terms are separated by spaces and all must match.
+    Supported terms: joined<DUR, joined>DUR, age<DUR, age>DUR, name~REGEX, role=ROLE_NAME, noroles, noavatar
+    Example: "joined<30m age<7d name~raid"
+    Raises ValueError for unknown or malformed terms.
+    """
+    checks = []
+    now = discord.utils.utcnow()
+    for term in expression.split():
+        lowered = term.lower()
+        if lowered == "noroles":
+            checks.append(lambda m: len(m.roles) <= 1) # Only @everyone
+        elif lowered == "noavatar":
+            checks.append(lambda m: m.avatar is None)
+        elif lowered.startswith("name~"):
+            pattern = re.compile(term[5:], re.IGNORECASE)
+            checks.append(lambda m, p=pattern: bool(p.search(m.name) or p.search(m.display_name)))
+        elif lowered.startswith("role="):
+            role_name = term[5:].lower()
+            checks.append(lambda m, r=role_name: any(role.name.lower() == r for role in m.roles))
+        elif lowered.startswith(("joined", "age")):
+            field = "joined" if lowered.startswith("joined") else "age"
+            operator_value = lowered[len(field):]
+            seconds = duration_to_seconds(operator_value[1:]) if operator_value[:1] in ("<", ">") else None
+            if seconds is None:
+                raise ValueError(f"Invalid term `{term}`. Use e.g. `{field}<30m`.")
+            cutoff = now - datetime.timedelta(seconds=seconds)
+            newer = operator_value[0] == "<" # joined<30m means joined less than 30 minutes ago
+            if field == "joined":
+                checks.append(lambda m, c=cutoff, n=newer: m.joined_at is not None and ((m.joined_at > c) if n else (m.joined_at <= c)))
+            else:
+                checks.append(lambda m, c=cutoff, n=newer: (m.created_at > c) if n else (m.created_at <= c))
+        else:
+            raise ValueError(f"Unknown filter term `{term}`.")
+    if not checks:
+        raise ValueError("Empty filter expression.")
+    return lambda member: all(check(member) for check in checks)
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # self.qualified_name is automatically set by discord.py
-        self.mutes = {} # In-memory storage for active mutes (for demonstration)
+        # Data lives in the bot-level registry so it survives reloads (and in the snapshot across restarts)
+        self.state = get_cog_state(bot, "Moderation", self.new_state)
+        self.mutes = self.state.mutes # In-memory storage for active mutes (for demonstration)
                         # In a real bot, use a database (e.g., Firestore) for persistence.
-        self.reply_autoroles = {} # {guild_id: {trigger_word: role_id}} for reply-triggered autoroles
+        self.reply_autoroles = self.state.reply_autoroles # {guild_id: {trigger_word: role_id}} for reply-triggered autoroles
+        self.reply_autorole_versions = self.state.reply_autorole_versions # {guild_id: int}, bumped on every change so cached list pages are refreshed
+        # Pending temporary mutes/bans: {(action, guild_id, user_id): {"expires_at": unix time, "channel_id": int, "role_id": int or None}}
+        self.expiries = self.state.expiries
+        self.expiry_tasks = {} # {expiry key: asyncio.Task}, owned by this cog instance and rescheduled on load
+        self.page_sources = new_page_source_cache() # Rendered `autorole reply list` pages per guild
+        self.case_log = CaseLog(get_db()) # Append-only moderation case log (local SQLite)
+        self.settings = get_settings()
+        self.maintenance_guilds = get_maintenance_guilds(bot)
+        self.prefixes = get_prefix_resolver(bot)
+        self.scheduler = get_event_scheduler(bot)
+        self.reply_autorole_breaker = get_circuit_breaker(bot, "reply_autorole") # Non-critical: skipped while Discord is failing
+
+    @staticmethod
+    def new_state(snapshot):
+        memory = snapshot.get("memory") or {} # Warm restart state, if any
+        return CogState(
+            mutes=memory.get("mutes", {}),
+            reply_autoroles=memory.get("reply_autoroles", {}),
+            reply_autorole_versions={},
+            expiries=memory.get("expiries", {})
+        )
+
+    def snapshot_state(self):
+        """State saved on shutdown for a warm restart."""
+        return {"memory": {"mutes": self.mutes, "reply_autoroles": self.reply_autoroles, "expiries": self.expiries}}
+
+    async def cog_load(self):
+        # Pick up expiries scheduled by the previous instance (after a reload) or before a restart
+        for key in list(self.expiries):
+            self.expiry_tasks[key] = asyncio.create_task(self.run_expiry(key))
+
+    async def cog_unload(self):
+        # Expiries stay in the registry; the next instance reschedules them
+        for task in self.expiry_tasks.values():
+            task.cancel()
+        # Spill anything not yet posted so it is replayed after the reload
+        get_modlog_sink(self.bot).close()
+
+    def schedule_expiry(self, action, guild, user_id, seconds, channel, role=None):
+        """
+        Schedules the end of a temporary mute or ban. Expiries are data, not sleeping commands,
+        so they survive cog reloads and restarts.
+        """
+        key = (action, guild.id, user_id)
+        self.cancel_expiry(key)
+        self.expiries[key] = {"expires_at": time.time() + seconds, "channel_id": channel.id, "role_id": role.id if role else None}
+        self.expiry_tasks[key] = asyncio.create_task(self.run_expiry(key))
+
+    def cancel_expiry(self, key):
+        self.expiries.pop(key, None)
+        task = self.expiry_tasks.pop(key, None)
+        if task:
+            task.cancel()
+
+    async def run_expiry(self, key):
+        action, guild_id, user_id = key
+        entry = self.expiries[key]
+        await self.bot.wait_until_ready()
+        await asyncio.sleep(max(0.0, entry["expires_at"] - time.time()))
+        if self.expiries.get(key) is not entry:
+            return # Replaced by a newer mute/ban
+        del self.expiries[key]
+        self.expiry_tasks.pop(key, None)
+
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        channel = guild.get_channel(entry["channel_id"])
+        try:
+            if action == "mute":
+                if user_id not in self.mutes:
+                    return # Manually unmuted already
+                del self.mutes[user_id]
+                member = guild.get_member(user_id)
+                role = guild.get_role(entry["role_id"])
+                if member is None or role is None:
+                    return
+                await member.remove_roles(role, reason="Temporary mute expired.")
+                message = f"✅ Unmuted {member.display_name} (temporary mute expired)."
+            else:
+                await guild.unban(discord.Object(id=user_id), reason="Temporary ban expired.")
+                message = f"✅ Unbanned <@{user_id}> (temporary ban expired)."
+            if channel:
+                await channel.send(message)
+        except discord.HTTPException as e:
+            print(f"Failed to expire {action} for {user_id} in guild {guild_id}: {e}")
+
+    def emit_modlog(self, guild, case_id, user_id, moderator, action, reason, duration=None):
+        """
+        Queues a case embed for the guild's moderation log channel, if one is configured.
+        Posting is batched by the bot-wide ModLogSink.
+        """
+        channel_id = self.settings.get(guild.id, "modlog_channel_id")
+        if not channel_id:
+            return
+        embed = discord.Embed(
+            title=f"Case #{case_id} · {action.upper()}",
+            color=discord.Color.dark_red(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="User", value=f"<@{user_id}> (`{user_id}`)", inline=True)
+        embed.add_field(name="Moderator", value=moderator.mention, inline=True)
+        if duration:
+            embed.add_field(name="Duration", value=duration, inline=True)
+        embed.add_field(name="Reason", value=shorten(reason or "No reason provided.", FIELD_VALUE_CHARS), inline=False)
+        get_modlog_sink(self.bot).emit(channel_id, embed, self.settings.get(guild.id, "modlog_interval"))
+
+    def bump_reply_autoroles(self, guild_id):
+        self.reply_autorole_versions[guild_id] = self.reply_autorole_versions.get(guild_id, 0) + 1
+
+    def get_special_role(self, guild, setting_key, default_name):
+        """
+        Resolves a role the bot manages (e.g. "Muted") by the ID stored in guild settings, so it survives renames.
+        Falls back to the name index once and remembers the ID it finds.
+        """
+        role_id = self.settings.get(guild.id, setting_key)
+        role = guild.get_role(role_id) if role_id else None
+        if role is None:
+            role = get_name_index(self.bot).role(guild, default_name)
+            if role is not None:
+                self.settings.set(guild.id, setting_key, role.id)
+        return role
+
+    async def ensure_special_role(self, ctx, setting_key, default_name, reason, setup=None):
+        """
+        Returns the guild's special role, creating it if it doesn't exist yet.
+        Concurrent callers in the same guild share a single creation (and `setup(role)`, e.g. the channel
+        permission fan-out), so two moderators muting at once don't create two "Muted" roles.
+        Raises discord.Forbidden if the role can't be created.
+        """
+        flights = get_single_flight(self.bot)
+        key = (ctx.guild.id, setting_key)
+        # While a creation is in flight the role already exists but isn't set up yet, so wait for it
+        if not flights.running(key):
+            role = self.get_special_role(ctx.guild, setting_key, default_name)
+            if role is not None:
+                return role
+
+        async def create():
+            # Another flight may have finished between our lookup and this one starting
+            existing = self.get_special_role(ctx.guild, setting_key, default_name)
+            if existing is not None:
+                return existing
+            created = await ctx.guild.create_role(name=default_name, reason=reason)
+            if setup is not None:
+                await setup(created)
+            else:
+                await ctx.send(f"Created '{default_name}' role.")
+            self.settings.set(ctx.guild.id, setting_key, created.id)
+            return created
+
+        return await flights.do(key, create)
+
+    def log_case(self, guild, member, moderator, action, reason=None, duration=None):
+        """
+        Records a case in the case log and queues it for the moderation log channel. Returns the case ID.
+        """
+        case_id = self.case_log.log(guild.id, member.id, moderator.id, action, reason, duration)
+        self.emit_modlog(guild, case_id, member.id, moderator, action, reason, duration)
+        return case_id
 
     @commands.command(name="kick", help="Kicks a member from the server.")
     @commands.has_permissions(kick_members=True)
@@ -28,8 +266,8 @@ class Moderation(commands.Cog):
 
         try:
             await member.kick(reason=reason)
-            await ctx.send(f"✅ Kicked {member.display_name} for: {reason}")
-            # Log the action (e.g., to a moderation log channel)
+            case_id = self.log_case(ctx.guild, member, ctx.author, "kick", reason)
+            await ctx.send(f"✅ Kicked {member.display_name} for: {reason} (Case #{case_id})")
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to kick that member. Make sure my role is above theirs.")
         except discord.HTTPException as e:
@@ -52,7 +290,8 @@ class Moderation(commands.Cog):
 
         try:
             await member.ban(reason=reason)
-            await ctx.send(f"✅ Banned {member.display_name} for: {reason}")
+            case_id = self.log_case(ctx.guild, member, ctx.author, "ban", reason)
+            await ctx.send(f"✅ Banned {member.display_name} for: {reason} (Case #{case_id})")
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to ban that member. Make sure my role is above theirs.")
         except discord.HTTPException as e:
@@ -66,12 +305,29 @@ class Moderation(commands.Cog):
         Usage: XTRM warn <@member> [reason]
         Example: XTRM warn @User#1234 Minor infraction
         """
-        # --- Placeholder for Warning System ---
-        # In a real bot, you'd store warnings in a database (e.g., Firestore)
-        # and implement logic for automatic actions based on warning count.
-        await ctx.send(f"⚠️ Warned {member.display_name} for: {reason} (Warning system placeholder)")
+        if member.bot:
+            return await ctx.send("❌ You cannot warn a bot.")
+
+        case_id = self.log_case(ctx.guild, member, ctx.author, "warn", reason)
+        warn_count = self.case_log.warn_count(ctx.guild.id, member.id)
+        await ctx.send(f"⚠️ Warned {member.display_name} for: {reason} (Case #{case_id}, warning {warn_count})")
         print(f"Warned {member.name} by {ctx.author.name} for: {reason}")
 
+        escalation = self.get_warn_escalations(ctx.guild.id).get(warn_count)
+        if escalation:
+            action, duration = escalation
+            # ctx.invoke skips the mute/kick command checks, so check the moderator's own permissions here;
+            # `warn` only needs manage_messages
+            permission = ESCALATION_PERMISSIONS[action]
+            if not getattr(ctx.author.guild_permissions, permission):
+                return await ctx.send(f"⚠️ {member.display_name} has reached {warn_count} warnings, but you need the `{permission}` permission to escalate to {action}. Skipping the escalation.")
+            escalation_reason = f"Automatic escalation: reached {warn_count} warnings."
+            await ctx.send(f"⚠️ {member.display_name} has reached {warn_count} warnings; escalating to {action}.")
+            if action == "mute":
+                await ctx.invoke(self.mute, member, duration, reason=escalation_reason)
+            elif action == "kick":
+                await ctx.invoke(self.kick, member, reason=escalation_reason)
+
     @commands.command(name="mute", help="Mutes a member in the server.")
     @commands.has_permissions(manage_roles=True)
     async def mute(self, ctx, member: discord.Member, duration: str = None, *, reason: str = "No reason provided."):
@@ -88,20 +344,26 @@ class Moderation(commands.Cog):
             return await ctx.send("❌ You cannot mute someone with an equal or higher role than yourself.")
 
         # Find or create a 'Muted' role
-        muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
-        if not muted_role:
-            try:
-                muted_role = await ctx.guild.create_role(name="Muted", reason="Muted role for moderation")
-                # Set permissions for the muted role in all channels
-                for channel in ctx.guild.channels:
-                    await channel.set_permissions(muted_role, send_messages=False, speak=False)
+        async def setup_muted_role(role):
+            # Set permissions for the muted role in all channels, through the shared bulk executor
+            result = await get_bulk_executor(self.bot).run(
+                ctx.guild.channels,
+                lambda channel: channel.set_permissions(role, send_messages=False, speak=False)
+            )
+            if result.failed:
+                await ctx.send(f"⚠️ Created 'Muted' role, but couldn't set permissions in {len(result.failed)} channel(s). Please grant me 'Manage Channels'.")
+            else:
                 await ctx.send("Created 'Muted' role and set channel permissions.")
-            except discord.Forbidden:
-                return await ctx.send("❌ I don't have permission to create roles or set channel permissions. Please grant me 'Manage Roles' and 'Manage Channels'.")
+
+        try:
+            muted_role = await self.ensure_special_role(ctx, "muted_role_id", "Muted", "Muted role for moderation", setup_muted_role)
+        except discord.Forbidden:
+            return await ctx.send("❌ I don't have permission to create roles or set channel permissions. Please grant me 'Manage Roles' and 'Manage Channels'.")
 
         try:
             await member.add_roles(muted_role, reason=reason)
             self.mutes[member.id] = True # Store mute status (in-memory)
+            self.log_case(ctx.guild, member, ctx.author, "mute", reason, duration)
 
             response_message = f"✅ Muted {member.display_name} for: {reason}"
 
@@ -117,13 +379,9 @@ class Moderation(commands.Cog):
 
                 if seconds > 0:
                     response_message += f" (for {duration})"
+                    # Unmuted by run_expiry unless they're manually unmuted first
+                    self.schedule_expiry("mute", ctx.guild, member.id, seconds, ctx.channel, muted_role)
                     await ctx.send(response_message)
-                    await asyncio.sleep(seconds)
-                    # Attempt to unmute after duration
-                    if member.id in self.mutes: # Check if still muted (not manually unmuted)
-                        await member.remove_roles(muted_role, reason="Temporary mute expired.")
-                        del self.mutes[member.id]
-                        await ctx.send(f"✅ Unmuted {member.display_name} (temporary mute expired).")
                 else:
                     await ctx.send(response_message)
             else:
@@ -142,7 +400,7 @@ class Moderation(commands.Cog):
         Usage: XTRM unmute <@member> [reason]
         Example: XTRM unmute @User#1234 Behavior improved
         """
-        muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
+        muted_role = self.get_special_role(ctx.guild, "muted_role_id", "Muted")
         if not muted_role:
             return await ctx.send("❌ No 'Muted' role found. The member might not be muted or the role was deleted.")
 
@@ -153,6 +411,8 @@ class Moderation(commands.Cog):
             await member.remove_roles(muted_role, reason=reason)
             if member.id in self.mutes:
                 del self.mutes[member.id] # Remove from in-memory mute tracker
+            self.cancel_expiry(("mute", ctx.guild.id, member.id))
+            self.log_case(ctx.guild, member, ctx.author, "unmute", reason)
             await ctx.send(f"✅ Unmuted {member.display_name} for: {reason}")
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to remove the 'Muted' role.")
@@ -187,10 +447,9 @@ class Moderation(commands.Cog):
 
         try:
             await member.ban(reason=reason)
-            await ctx.send(f"✅ Temporarily banned {member.display_name} for {duration} for: {reason}")
-            await asyncio.sleep(seconds)
-            await ctx.guild.unban(member, reason="Temporary ban expired.")
-            await ctx.send(f"✅ Unbanned {member.display_name} (temporary ban expired).")
+            case_id = self.log_case(ctx.guild, member, ctx.author, "tempban", reason, duration)
+            self.schedule_expiry("tempban", ctx.guild, member.id, seconds, ctx.channel)
+            await ctx.send(f"✅ Temporarily banned {member.display_name} for {duration} for: {reason} (Case #{case_id})")
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to ban or unban that member.")
         except discord.HTTPException as e:
@@ -205,14 +464,10 @@ class Moderation(commands.Cog):
         Example: XTRM trial add @NewMember Starting trial period
         """
         action = action.lower()
-        trial_role = discord.utils.get(ctx.guild.roles, name="Trial Member")
-
-        if not trial_role:
-            try:
-                trial_role = await ctx.guild.create_role(name="Trial Member", reason="Role for trial members")
-                await ctx.send("Created 'Trial Member' role.")
-            except discord.Forbidden:
-                return await ctx.send("❌ I don't have permission to create roles.")
+        try:
+            trial_role = await self.ensure_special_role(ctx, "trial_role_id", "Trial Member", "Role for trial members")
+        except discord.Forbidden:
+            return await ctx.send("❌ I don't have permission to create roles.")
 
         if action == "add":
             if trial_role in member.roles:
@@ -301,6 +556,406 @@ class Moderation(commands.Cog):
         except discord.HTTPException as e:
             await ctx.send(f"❌ An error occurred: {e}")
 
+    async def collect_mass_targets(self, ctx, args):
+        """
+        Collects target IDs for a mass action from the command text, any attached ID lists and an
+        optional --filter expression. Returns (ids, reason, confirm) or raises ValueError.
+        """
+        reason = f"Mass action by {ctx.author.name}"
+        reason_match = re.search(r'--reason\s+"([^"]+)"', args)
+        if reason_match:
+            reason = reason_match.group(1)
+            args = args.replace(reason_match.group(0), "")
+
+        member_filter = None
+        filter_match = re.search(r'--filter\s+"([^"]+)"', args)
+        if filter_match:
+            try:
+                member_filter = parse_member_filter(filter_match.group(1))
+            except re.error as e:
+                raise ValueError(f"Invalid regex in filter: {e}")
+            args = args.replace(filter_match.group(0), "")
+
+        confirm = "--confirm" in args
+        args = args.replace("--confirm", "")
+
+        ids = dict.fromkeys(int(match) for match in ID_RE.findall(args)) # Ordered, de-duplicated
+
+        for attachment in ctx.message.attachments:
+            if attachment.size > MAX_ID_ATTACHMENT_BYTES:
+                raise ValueError(f"Attachment `{attachment.filename}` is too large (max {MAX_ID_ATTACHMENT_BYTES // 1024} KB).")
+            data = await attachment.read()
+            for match in ID_RE.findall(data.decode("utf-8", errors="ignore")):
+                ids.setdefault(int(match))
+
+        if member_filter:
+            for member in ctx.guild.members:
+                if not member.bot and member_filter(member):
+                    ids.setdefault(member.id)
+
+        return list(ids), reason, confirm
+
+    def can_act_on(self, ctx, user_id):
+        """
+        Hierarchy check for a mass action target. Users who aren't cached members (e.g. already left)
+        have no roles to compare and are allowed.
+        """
+        if user_id in (ctx.author.id, self.bot.user.id, ctx.guild.owner_id):
+            return False
+        member = ctx.guild.get_member(user_id)
+        if member is None:
+            return True
+        if member.top_role >= ctx.guild.me.top_role:
+            return False
+        return ctx.author.id == ctx.guild.owner_id or member.top_role < ctx.author.top_role
+
+    async def run_mass_action(self, ctx, verb, route, args, act, members_only=False, case_action=None, check_hierarchy=True):
+        """
+        Shared flow for mass actions: collect targets, dry run unless --confirm, run everything through
+        the bot-wide bulk executor, and post one summary at the end instead of a message per target.
+        Actions that don't touch the target's own standing (like role changes, where only the role's
+        position matters) pass check_hierarchy=False to skip the per-member hierarchy check.
+        """
+        try:
+            ids, reason, confirm = await self.collect_mass_targets(ctx, args)
+        except ValueError as e:
+            return await ctx.send(f"❌ {e}")
+
+        targets = [user_id for user_id in ids if not check_hierarchy or self.can_act_on(ctx, user_id)]
+        if members_only:
+            targets = [user_id for user_id in targets if ctx.guild.get_member(user_id) is not None]
+        skipped = len(ids) - len(targets)
+
+        if not targets:
+            return await ctx.send(f"❌ No valid targets found ({skipped} skipped by role hierarchy or membership).")
+
+        if not confirm:
+            return await ctx.send(f"🔎 Dry run: {len(targets)} users would be {verb} ({skipped} skipped). Add `--confirm` to run it.")
+
+        progress_message = await ctx.send(f"⏳ Mass action: 0/{len(targets)} {verb}...")
+
+        async def on_progress(result):
+            try:
+                await progress_message.edit(content=f"⏳ Mass action: {result.processed}/{result.total} processed, {len(result.failed)} failed...")
+            except discord.HTTPException:
+                pass
+
+        result = await get_bulk_executor(self.bot).run(targets, lambda user_id: act(user_id, reason), on_progress=on_progress)
+        if case_action and result.succeeded:
+            case_ids = self.case_log.log_many(ctx.guild.id, result.succeeded, ctx.author.id, case_action, reason)
+            for case_id, user_id in zip(case_ids, result.succeeded):
+                self.emit_modlog(ctx.guild, case_id, user_id, ctx.author, case_action, reason)
+
+        embed = discord.Embed(
+            title="Mass Action Report",
+            description=f"{len(result.succeeded)}/{result.total} users {verb} in {result.elapsed:.1f}s.",
+            color=discord.Color.green() if not result.failed else discord.Color.orange()
+        )
+        embed.add_field(name="Succeeded", value=str(len(result.succeeded)), inline=True)
+        embed.add_field(name="Failed", value=str(len(result.failed)), inline=True)
+        embed.add_field(name="Skipped", value=str(skipped), inline=True)
+        if result.retries:
+            embed.add_field(name="Retries", value=str(result.retries), inline=True)
+        if result.failed:
+            failures = "\n".join(f"`{count}x` {error[:100]}" for error, count in result.failure_summary())
+            embed.add_field(name="Top Failure Reasons", value=failures, inline=False)
+        embed.set_footer(text=f"Reason: {reason}")
+        await ctx.send(embed=embed)
+        print(f"Mass action ({route}) by {ctx.author.name} in {ctx.guild.name}: {len(result.succeeded)} ok, {len(result.failed)} failed.")
+
+    @commands.command(name="massban", help="Bans many users at once by ID, attachment or filter.")
+    @commands.has_permissions(ban_members=True)
+    async def massban(self, ctx, *, args: str = ""):
+        """
+        Bans many users at once. Targets can be IDs or mentions, .txt attachments containing IDs,
+        or a filter expression. Runs as a dry run unless --confirm is given.
+        Usage: XTRM massban [IDs/mentions] [--filter "<expression>"] [--reason "<reason>"] [--confirm]
+        Filter terms: joined<DUR, joined>DUR, age<DUR, age>DUR, name~REGEX, role=NAME, noroles, noavatar
+        Example: XTRM massban --filter "joined<30m age<2d" --reason "Raid" --confirm
+        """
+        async def act(user_id, reason):
+            await ctx.guild.ban(discord.Object(id=user_id), reason=reason, delete_message_seconds=0)
+
+        await self.run_mass_action(ctx, "banned", "ban", args, act, case_action="ban")
+
+    @commands.command(name="masskick", help="Kicks many members at once by ID, attachment or filter.")
+    @commands.has_permissions(kick_members=True)
+    async def masskick(self, ctx, *, args: str = ""):
+        """
+        Kicks many members at once. Targets can be IDs or mentions, .txt attachments containing IDs,
+        or a filter expression. Runs as a dry run unless --confirm is given.
+        Usage: XTRM masskick [IDs/mentions] [--filter "<expression>"] [--reason "<reason>"] [--confirm]
+        Example: XTRM masskick 123456789012345678 234567890123456789 --confirm
+        """
+        async def act(user_id, reason):
+            await ctx.guild.kick(discord.Object(id=user_id), reason=reason)
+
+        await self.run_mass_action(ctx, "kicked", "kick", args, act, members_only=True, case_action="kick")
+
+    @commands.command(name="massrole", help="Gives or removes a role for many members at once.")
+    @commands.has_permissions(manage_roles=True)
+    async def massrole(self, ctx, action: str, role: discord.Role, *, args: str = ""):
+        """
+        Gives or removes a role for many members at once. Targets can be IDs or mentions,
+        .txt attachments containing IDs, or a filter expression. Runs as a dry run unless --confirm is given.
+        Usage: XTRM massrole <give|remove> <@role/"Role Name"> [IDs/mentions] [--filter "<expression>"] [--confirm]
+        Example: XTRM massrole give @Verified --filter "role=Member age>30d" --confirm
+        """
+        action = action.lower()
+        if action not in ("give", "remove"):
+            return await ctx.send("❌ Invalid action. Use `give` or `remove`.")
+        if role >= ctx.author.top_role and ctx.author.id != ctx.guild.owner_id:
+            return await ctx.send("❌ You cannot manage roles that are equal to or higher than your top role.")
+        if role >= ctx.guild.me.top_role:
+            return await ctx.send("❌ I cannot manage roles that are equal to or higher than my top role.")
+
+        # Raw role endpoints take IDs directly, so targets don't need to be in the member cache
+        if action == "give":
+            async def act(user_id, reason):
+                await self.bot.http.add_role(ctx.guild.id, user_id, role.id, reason=reason)
+            verb = f"given `{role.name}`"
+        else:
+            async def act(user_id, reason):
+                await self.bot.http.remove_role(ctx.guild.id, user_id, role.id, reason=reason)
+            verb = f"removed from `{role.name}`"
+
+        # The role position checks above are all that matters here, so staff (and the author) can be targets too
+        await self.run_mass_action(ctx, verb, "roles", args, act, members_only=True, check_hierarchy=False)
+
+    @commands.command(name="find", help="Searches members by name, nickname, regex or join date.")
+    @commands.has_permissions(manage_messages=True)
+    async def find(self, ctx, *, args: str):
+        """
+        Searches member usernames, display names and nicknames through the guild's member index.
+        Names are folded before matching, so lookalike letters, accents and leetspeak don't hide impersonators.
+        Modes: contains (default), prefix, fuzzy (1-2 typos) and regex (case-insensitive, on the raw names).
+        Regex mode is limited to the bot owner: a pattern that backtracks badly would stall the whole bot.
+        Usage: XTRM find [contains|prefix|fuzzy|regex] <query> [--joined <duration>]
+        Example: XTRM find fuzzy ModTeam --joined 7d
+        """
+        joined_seconds = None
+        joined_match = re.search(r"\s*--joined\s+(\S+)", args)
+        if joined_match:
+            joined_seconds = duration_to_seconds(joined_match.group(1))
+            if joined_seconds is None:
+                return await ctx.send("❌ Invalid --joined duration. Use s, m, h or d, e.g. `7d`.")
+            args = args[:joined_match.start()] + args[joined_match.end():]
+
+        mode, _, query = args.strip().partition(" ")
+        if mode.lower() in FIND_MODES and query.strip():
+            mode, query = mode.lower(), query.strip()
+        else:
+            mode, query = "contains", args.strip()
+        if not query:
+            return await ctx.send("❌ Please provide something to search for.")
+
+        started = time.perf_counter()
+        index = await get_member_index(self.bot).get(ctx.guild)
+        distances = {}
+        if mode == "regex":
+            if not await self.bot.is_owner(ctx.author):
+                return await ctx.send("❌ Regex search is limited to the bot owner. Try `prefix` or `fuzzy` instead.")
+            try:
+                pattern = re.compile(query, re.IGNORECASE | re.MULTILINE)
+            except re.error as e:
+                return await ctx.send(f"❌ Invalid regex: {e}")
+            matches = index.regex(pattern)
+        elif mode == "fuzzy":
+            max_distance = 2 if len(query) >= 8 else 1
+            distances = {member_id: distance for distance, member_id in index.fuzzy(query, max_distance)}
+            matches = iter(distances)
+        elif mode == "prefix":
+            matches = index.prefix(query)
+        else:
+            matches = index.contains(query)
+
+        joined_ids = None
+        if joined_seconds is not None:
+            joined_ids = set(index.joins.joined_since(time.time() - joined_seconds))
+
+        results = []
+        for member_id in matches:
+            if joined_ids is not None and member_id not in joined_ids:
+                continue
+            member = ctx.guild.get_member(member_id)
+            if member is None:
+                continue
+            results.append(member)
+            if len(results) >= MAX_FIND_RESULTS:
+                break
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if not results:
+            return await ctx.send(f"✅ No members match `{query}` ({mode}, {elapsed_ms:.0f}ms).")
+
+        def render(embed, member):
+            details = f"ID: `{member.id}`"
+            if member.joined_at:
+                details += f" · Joined <t:{int(member.joined_at.timestamp())}:R>"
+            if member.id in distances:
+                details += f" · {distances[member.id]} edit(s) away"
+            embed.add_field(name=f"{member.display_name} (@{member.name})", value=details, inline=False)
+
+        capped = f" (showing the first {MAX_FIND_RESULTS})" if len(results) >= MAX_FIND_RESULTS else ""
+        # Results are already in a meaningful order (closest first for fuzzy), so the source keeps it
+        source = PageSource(f"🔎 Members matching `{shorten(query, 200)}`", f"Mode: {mode} · {elapsed_ms:.0f}ms{capped}",
+                            discord.Color.blue(), lambda: results, render)
+        await Paginator.start(ctx, source)
+
+    @commands.group(name="modlog", invoke_without_command=True, help="Shows or manages the moderation log channel.")
+    @commands.has_permissions(manage_guild=True)
+    async def modlog(self, ctx):
+        """
+        Shows the moderation log settings. Every case (warn, kick, ban, mute, ...) is posted there,
+        batched up to 10 entries per message.
+        Usage: XTRM modlog [subcommand]
+        Example: XTRM modlog set #mod-logs
+        """
+        channel_id = self.settings.get(ctx.guild.id, "modlog_channel_id")
+        channel = ctx.guild.get_channel(channel_id) if channel_id else None
+        interval = self.settings.get(ctx.guild.id, "modlog_interval", DEFAULT_FLUSH_INTERVAL)
+        if not channel:
+            return await ctx.send("Moderation logging is disabled. Use `XTRM modlog set #channel` to enable it.")
+        await ctx.send(f"📜 Moderation logs are posted in {channel.mention}, flushed every {interval:g}s.")
+
+    @modlog.command(name="set", help="Sets the moderation log channel.")
+    @commands.has_permissions(manage_guild=True)
+    async def modlog_set(self, ctx, channel: discord.TextChannel):
+        """
+        Sets the channel where moderation cases are logged.
+        Usage: XTRM modlog set <#channel>
+        Example: XTRM modlog set #mod-logs
+        """
+        self.settings.set(ctx.guild.id, "modlog_channel_id", channel.id)
+        await ctx.send(f"✅ Moderation logs will be posted in {channel.mention}.")
+
+    @modlog.command(name="interval", help="Sets how often the moderation log is flushed.")
+    @commands.has_permissions(manage_guild=True)
+    async def modlog_interval(self, ctx, seconds: float):
+        """
+        Sets how long log entries are buffered before a partial batch is posted. Full batches of 10 are posted immediately.
+        Usage: XTRM modlog interval <seconds>
+        Example: XTRM modlog interval 10
+        """
+        if not 1 <= seconds <= 300:
+            return await ctx.send("❌ Interval must be between 1 and 300 seconds.")
+        self.settings.set(ctx.guild.id, "modlog_interval", seconds)
+        await ctx.send(f"✅ Moderation log flush interval set to {seconds:g}s.")
+
+    @modlog.command(name="disable", help="Disables moderation logging.")
+    @commands.has_permissions(manage_guild=True)
+    async def modlog_disable(self, ctx):
+        """
+        Stops posting moderation cases to the log channel. Cases are still recorded in the case log.
+        Usage: XTRM modlog disable
+        """
+        self.settings.set(ctx.guild.id, "modlog_channel_id", None)
+        await ctx.send("✅ Moderation logging disabled.")
+
+    def get_warn_escalations(self, guild_id):
+        """Returns the guild's {warn_count: (action, duration)} escalations, or the defaults if it never changed them."""
+        saved = self.settings.get(guild_id, "warn_escalations")
+        if saved is None:
+            return WARN_ESCALATIONS
+        return {int(count): tuple(escalation) for count, escalation in saved.items()} # JSON keys are strings
+
+    def save_warn_escalations(self, guild_id, escalations):
+        self.settings.set(guild_id, "warn_escalations", {str(count): list(escalation) for count, escalation in escalations.items()})
+
+    @commands.group(name="escalation", invoke_without_command=True, help="Shows the automatic warn escalations.")
+    @commands.has_permissions(manage_guild=True)
+    async def escalation(self, ctx):
+        """
+        Shows which warn counts automatically mute or kick a member.
+        Usage: XTRM escalation [subcommand]
+        Example: XTRM escalation set 3 mute 1h
+        """
+        escalations = self.get_warn_escalations(ctx.guild.id)
+        if not escalations:
+            return await ctx.send("Automatic warn escalation is disabled. Use `XTRM escalation set <warns> <mute|kick> [duration]` to add one.")
+        lines = [f"**{count} warnings** → {action}{f' ({duration})' if duration else ''}" for count, (action, duration) in sorted(escalations.items())]
+        await ctx.send("⚠️ Automatic warn escalations:\n" + "\n".join(lines))
+
+    @escalation.command(name="set", help="Sets the action taken at a warn count.")
+    @commands.has_permissions(manage_guild=True)
+    async def escalation_set(self, ctx, warns: int, action: str, duration: str = None):
+        """
+        Mutes or kicks a member automatically when they reach exactly <warns> warnings.
+        Usage: XTRM escalation set <warns> <mute|kick> [duration]
+        Example: XTRM escalation set 3 mute 1h
+        """
+        action = action.lower()
+        if action not in ESCALATION_PERMISSIONS:
+            return await ctx.send("❌ Invalid action. Use `mute` or `kick`.")
+        if warns <= 0:
+            return await ctx.send("❌ Warn count must be positive.")
+        if action == "kick":
+            duration = None
+        elif duration is not None and duration_to_seconds(duration) is None:
+            return await ctx.send(f"❌ Invalid duration `{duration}`. Use s, m, h or d (e.g. `1h`).")
+        escalations = dict(self.get_warn_escalations(ctx.guild.id))
+        escalations[warns] = (action, duration)
+        self.save_warn_escalations(ctx.guild.id, escalations)
+        await ctx.send(f"✅ Members reaching {warns} warnings will be {'kicked' if action == 'kick' else 'muted'}{f' for {duration}' if duration else ''}.")
+
+    @escalation.command(name="remove", help="Removes the action taken at a warn count.")
+    @commands.has_permissions(manage_guild=True)
+    async def escalation_remove(self, ctx, warns: int):
+        """
+        Stops escalating at <warns> warnings.
+        Usage: XTRM escalation remove <warns>
+        Example: XTRM escalation remove 5
+        """
+        escalations = dict(self.get_warn_escalations(ctx.guild.id))
+        if escalations.pop(warns, None) is None:
+            return await ctx.send(f"❌ No escalation is set for {warns} warnings.")
+        self.save_warn_escalations(ctx.guild.id, escalations)
+        await ctx.send(f"✅ Removed the escalation at {warns} warnings.")
+
+    def build_cases_embed(self, title, rows, next_hint):
+        embed = discord.Embed(title=title, color=discord.Color.dark_red())
+        if not rows:
+            embed.description = "No cases found."
+            return embed
+        for row in rows:
+            created = discord.utils.format_dt(datetime.datetime.fromtimestamp(row["created_at"], tz=datetime.timezone.utc), "f")
+            duration = f" ({row['duration']})" if row["duration"] else ""
+            embed.add_field(
+                name=f"Case #{row['case_id']} · {row['action'].upper()}{duration}",
+                value=f"User: <@{row['user_id']}> · Moderator: <@{row['moderator_id']}>\n{created}\nReason: {shorten(row['reason'] or 'No reason provided.', CASE_REASON_CHARS)}",
+                inline=False
+            )
+        if len(rows) == CASES_PER_PAGE:
+            embed.set_footer(text=f"Next page: {next_hint}")
+        return embed
+
+    @commands.group(name="cases", invoke_without_command=True, help="Shows a member's moderation history.")
+    @commands.has_permissions(manage_messages=True)
+    async def cases(self, ctx, user: discord.User, before: int = None):
+        """
+        Shows a user's moderation cases, newest first, 10 per page.
+        Pass the case number from the footer to see the next page.
+        Usage: XTRM cases <@user/ID> [before_case]
+        Example: XTRM cases @User#1234
+        """
+        rows = self.case_log.user_history(ctx.guild.id, user.id, CASES_PER_PAGE, before)
+        title = f"Cases for {user} · {self.case_log.warn_count(ctx.guild.id, user.id)} warnings"
+        next_hint = f"{ctx.prefix}cases {user.id} {rows[-1]['case_id']}" if rows else ""
+        await ctx.send(embed=self.build_cases_embed(title, rows, next_hint))
+
+    @cases.command(name="mod", help="Shows the cases handled by a moderator.")
+    @commands.has_permissions(manage_messages=True)
+    async def cases_mod(self, ctx, moderator: discord.User, before: int = None):
+        """
+        Shows the cases handled by a moderator, newest first, 10 per page.
+        Pass the case number from the footer to see the next page.
+        Usage: XTRM cases mod <@moderator/ID> [before_case]
+        Example: XTRM cases mod @Moderator
+        """
+        rows = self.case_log.moderator_history(ctx.guild.id, moderator.id, CASES_PER_PAGE, before)
+        next_hint = f"{ctx.prefix}cases mod {moderator.id} {rows[-1]['case_id']}" if rows else ""
+        await ctx.send(embed=self.build_cases_embed(f"Cases handled by {moderator}", rows, next_hint))
+
     @commands.group(name="autorole", invoke_without_command=True, help="Manages automatic role assignments.")
     @commands.has_permissions(manage_roles=True)
     async def autorole(self, ctx):
@@ -342,6 +997,7 @@ class Moderation(commands.Cog):
         if ctx.guild.id not in self.reply_autoroles:
             self.reply_autoroles[ctx.guild.id] = {}
         self.reply_autoroles[ctx.guild.id][trigger_word] = role.id
+        self.bump_reply_autoroles(ctx.guild.id)
         # In a real bot, save this to Firestore here
         await ctx.send(f"✅ Reply autorole created: Replying with `{trigger_word}` will give the `{role.name}` role.")
 
@@ -364,6 +1020,7 @@ class Moderation(commands.Cog):
         old_role = ctx.guild.get_role(old_role_id)
         
         self.reply_autoroles[ctx.guild.id][trigger_word] = new_role.id
+        self.bump_reply_autoroles(ctx.guild.id)
         # In a real bot, update this in Firestore here
         await ctx.send(f"✅ Reply autorole for `{trigger_word}` updated from `{old_role.name if old_role else 'Unknown Role'}` to `{new_role.name}`.")
 
@@ -378,6 +1035,7 @@ class Moderation(commands.Cog):
         trigger_word = trigger_word.lower()
         if ctx.guild.id in self.reply_autoroles and trigger_word in self.reply_autoroles[ctx.guild.id]:
             del self.reply_autoroles[ctx.guild.id][trigger_word]
+            self.bump_reply_autoroles(ctx.guild.id)
             # In a real bot, delete from Firestore here
             await ctx.send(f"✅ Reply autorole for `{trigger_word}` deleted.")
         else:
@@ -390,19 +1048,22 @@ class Moderation(commands.Cog):
         Lists all configured reply-triggered autoroles for this server.
         Usage: XTRM autorole reply list
         """
-        if ctx.guild.id not in self.reply_autoroles or not self.reply_autoroles[ctx.guild.id]:
+        guild = ctx.guild
+        if guild.id not in self.reply_autoroles or not self.reply_autoroles[guild.id]:
             return await ctx.send("No reply-triggered autoroles configured for this server.")
-        
-        embed = discord.Embed(
-            title="Reply-Triggered Autoroles",
-            description="Here are the configured reply autoroles:",
-            color=discord.Color.blue()
-        )
-        for trigger, role_id in self.reply_autoroles[ctx.guild.id].items():
-            role = ctx.guild.get_role(role_id)
-            role_name = role.name if role else "Unknown Role (ID: {role_id})"
+
+        def render(embed, entry):
+            trigger, role_id = entry
+            role = guild.get_role(role_id)
+            role_name = role.name if role else f"Unknown Role (ID: {role_id})"
             embed.add_field(name=f"Trigger: `{trigger}`", value=f"Role: `{role_name}`", inline=False)
-        await ctx.send(embed=embed)
+
+        version_fn = lambda: self.reply_autorole_versions.get(guild.id, 0)
+        source = get_page_source(self.page_sources, guild.id, version_fn(), lambda: PageSource(
+            "Reply-Triggered Autoroles", "Here are the configured reply autoroles:", discord.Color.blue(),
+            lambda: self.reply_autoroles.get(guild.id, {}).items(), render, sort_key=lambda entry: entry[0]
+        ))
+        await Paginator.start(ctx, source, version_fn)
 
     @autorole_reply.command(name="test", help="Tests a reply-triggered autorole.")
     @commands.has_permissions(manage_roles=True)
@@ -428,23 +1089,39 @@ class Moderation(commands.Cog):
         """
         if message.author.bot or not message.reference or not message.reference.message_id:
             return # Ignore bots, non-replies, or replies without a valid message ID
+        if not message.guild or message.guild.id in self.maintenance_guilds:
+            return # Reply autoroles are paused during maintenance
 
         # Ensure the message is not a bot command
-        current_prefixes = self.bot.command_prefix
-        if not isinstance(current_prefixes, tuple):
-            current_prefixes = (current_prefixes,)
-        for prefix in current_prefixes:
-            if message.content.lower().startswith(prefix.lower()):
-                return # Do not trigger autorole if it's a bot command
+        if self.prefixes.match(message) is not None:
+            return # Do not trigger autorole if it's a bot command
 
         guild_id = message.guild.id
         if guild_id not in self.reply_autoroles or not self.reply_autoroles[guild_id]:
             return # No reply autoroles configured for this guild
+        if message.content.lower() not in self.reply_autoroles[guild_id]:
+            return # Triggers match exactly, so skip fetching the replied-to message for anything else
+        if self.reply_autorole_breaker.is_open():
+            return # Fetches/role edits keep failing; don't queue more until the circuit half-opens
+
+        # Moderation work is high priority: it keeps reserved capacity on the event scheduler
+        self.scheduler.submit(guild_id, PRIORITY_HIGH, self.apply_reply_autorole, message)
+
+    async def apply_reply_autorole(self, message):
+        """
+        Gives the role for a reply's trigger word to the author of the replied-to message. Runs on the event scheduler.
+        """
+        guild_id = message.guild.id
+        if not self.reply_autoroles.get(guild_id):
+            return # Removed while this was queued
 
         # Fetch the replied-to message to get the author
         try:
-            replied_message = await message.channel.fetch_message(message.reference.message_id)
+            async with self.reply_autorole_breaker:
+                replied_message = await message.channel.fetch_message(message.reference.message_id)
             target_member = replied_message.author
+        except CircuitOpenError:
+            return # Discord is failing; degrade by skipping this reply
         except discord.NotFound:
             return # Replied message not found
         except discord.HTTPException:
@@ -465,8 +1142,11 @@ class Moderation(commands.Cog):
                             await message.channel.send(f"❌ I cannot assign the role `{role.name}` because it is higher than or equal to my top role.")
                             return
 
-                        await target_member.add_roles(role, reason=f"Reply-triggered autorole: '{trigger_word}' by {message.author.display_name}")
+                        async with self.reply_autorole_breaker:
+                            await target_member.add_roles(role, reason=f"Reply-triggered autorole: '{trigger_word}' by {message.author.display_name}")
                         await message.channel.send(f"✅ {target_member.display_name} has been given the `{role.name}` role by {message.author.display_name}'s reply!")
+                    except CircuitOpenError:
+                        pass # Discord is failing; degrade by skipping this reply
                     except discord.Forbidden:
                         await message.channel.send(f"❌ I don't have permission to assign the `{role.name}` role to {target_member.display_name}.")
                     except Exception as e:
@@ -0,0 +1,279 @@
+# cogs/modlog.py
+import discord
+import asyncio
+import bisect
+import gzip
+import json
+import os
+import time
+from collections import deque
+
+from cogs.storage import data_path
+
+EMBEDS_PER_MESSAGE = 10 # Discord allows up to 10 embeds in one message
+CHARS_PER_MESSAGE = 6000 # ...and up to 6000 characters across all of them
+FIELD_VALUE_CHARS = 1024 # Longest embed field value Discord accepts
+DEFAULT_FLUSH_INTERVAL = 5.0 # Seconds between flushes of a log channel's buffer
+MAX_BUFFERED_EMBEDS = 200 # Per channel; anything beyond this spills to disk
+SPILL_SEGMENT_SIZE = 100 # Spilled embeds are written in gzip NDJSON segments of up to this many entries
+SPILL_DIR = "modlog_spill"
+
+class ChannelBuffer:
+    __slots__ = ("embeds", "sending", "overflow", "segments", "writing", "next_seq", "write_lock", "interval", "last_flush")
+
+    def __init__(self, interval):
+        self.embeds = deque() # Oldest entries, ready to post
+        self.sending = [] # The batch currently being posted, saved by `close` if it is cut off mid-send
+        self.overflow = [] # Newest spilled entries (embed dicts) not yet handed to a segment write
+        self.segments = [] # Sorted [(seq, path, count)] of segments on disk, oldest first
+        self.writing = {} # {seq: count} for segment writes still in progress
+        self.next_seq = 0
+        self.write_lock = asyncio.Lock() # Segment writes for a channel run one at a time, in seq order
+        self.interval = interval
+        self.last_flush = time.monotonic()
+
+    @property
+    def spilled(self):
+        """Entries waiting behind the in-memory buffer: on disk, being written, or about to be."""
+        return sum(count for _, _, count in self.segments) + sum(self.writing.values()) + len(self.overflow)
+
+def shorten(text, limit):
+    """Cuts `text` down to `limit` characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def write_segment(path, embed_dicts):
+    """Writes one spill segment. Goes through a temporary file so a crash never leaves half a segment behind."""
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for embed_dict in embed_dicts:
+            f.write(json.dumps(embed_dict) + "\n")
+    os.replace(tmp_path, path)
+
+def read_segment(path):
+    """Reads a spill segment back and deletes it."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        embed_dicts = [json.loads(line) for line in f]
+    os.remove(path)
+    return embed_dicts
+
+class ModLogSink:
+    """
+    Buffers moderation log embeds per log channel and posts them in batches of up to 10 embeds (and 6000
+    characters) per message, either every `interval` seconds or as soon as a full batch is ready. During sustained
+    bursts the log channel is the rate-limit bottleneck, so anything beyond MAX_BUFFERED_EMBEDS spills
+    to disk; nothing is dropped. Spilled entries are collected into segments of SPILL_SEGMENT_SIZE and
+    written off the event loop; once the buffer drains the oldest segment is read back whole and deleted,
+    so no file is ever rewritten.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.buffers = {} # {channel_id: ChannelBuffer}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.load_spilled()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def segment_path(self, channel_id, seq, count):
+        # The entry count is part of the name, so startup doesn't need to decompress anything
+        return data_path(SPILL_DIR, f"{channel_id}.{seq}.{count}.ndjson.gz")
+
+    def load_spilled(self):
+        """Registers spill segments left over from a previous run so they get replayed."""
+        spill_dir = os.path.dirname(data_path(SPILL_DIR, "placeholder"))
+        for filename in os.listdir(spill_dir):
+            path = os.path.join(spill_dir, filename)
+            parts = filename.split(".")
+            if filename.endswith(".tmp"):
+                os.remove(path) # Interrupted segment write
+                continue
+            if len(parts) != 5 or not filename.endswith(".ndjson.gz") or not parts[0].isdigit():
+                continue
+            buffer = self.get_buffer(int(parts[0]))
+            seq, count = int(parts[1]), int(parts[2])
+            bisect.insort(buffer.segments, (seq, path, count))
+            buffer.next_seq = max(buffer.next_seq, seq + 1)
+
+    def get_buffer(self, channel_id, interval=None):
+        buffer = self.buffers.get(channel_id)
+        if buffer is None:
+            buffer = ChannelBuffer(interval or DEFAULT_FLUSH_INTERVAL)
+            self.buffers[channel_id] = buffer
+        elif interval:
+            buffer.interval = interval
+        return buffer
+
+    def emit(self, channel_id, embed, interval=None):
+        """
+        Queues an embed for a log channel. Never blocks and never sends directly.
+        """
+        buffer = self.get_buffer(channel_id, interval)
+        if buffer.spilled or len(buffer.embeds) >= MAX_BUFFERED_EMBEDS:
+            # Once anything has spilled, keep spilling so entries stay in order
+            buffer.overflow.append(embed.to_dict())
+            if len(buffer.overflow) >= SPILL_SEGMENT_SIZE:
+                self.spill(channel_id, buffer)
+        else:
+            buffer.embeds.append(embed)
+        if len(buffer.embeds) >= EMBEDS_PER_MESSAGE:
+            self.wakeup.set()
+        self.start()
+
+    def spill(self, channel_id, buffer):
+        """Hands the channel's overflow to a background segment write."""
+        embed_dicts, buffer.overflow = buffer.overflow, []
+        seq = buffer.next_seq
+        buffer.next_seq += 1
+        buffer.writing[seq] = len(embed_dicts)
+        asyncio.create_task(self.write_spill_segment(channel_id, buffer, seq, embed_dicts))
+
+    async def write_spill_segment(self, channel_id, buffer, seq, embed_dicts):
+        path = self.segment_path(channel_id, seq, len(embed_dicts))
+        async with buffer.write_lock:
+            try:
+                await asyncio.to_thread(write_segment, path, embed_dicts)
+            except OSError as e:
+                # Keep the entries in memory rather than lose them, even if they end up posted a little out of order
+                print(f"Failed to spill moderation log entries for channel {channel_id}: {e}")
+                buffer.overflow[:0] = embed_dicts
+                return
+            finally:
+                del buffer.writing[seq]
+            bisect.insort(buffer.segments, (seq, path, len(embed_dicts)))
+
+    async def refill(self, buffer):
+        """
+        Moves the oldest spilled entries back into the (empty) in-memory buffer: the first segment on disk,
+        or the overflow once everything older has been posted.
+        """
+        if buffer.segments:
+            seq, path, _ = buffer.segments[0]
+            if buffer.writing and min(buffer.writing) < seq:
+                return # An older segment is still being written
+            buffer.segments.pop(0)
+            embed_dicts = await asyncio.to_thread(read_segment, path)
+        elif buffer.writing:
+            return
+        else:
+            embed_dicts, buffer.overflow = buffer.overflow, []
+        buffer.embeds.extend(discord.Embed.from_dict(embed_dict) for embed_dict in embed_dicts)
+
+    def take_batch(self, buffer):
+        """Pops the next batch off the buffer: up to 10 embeds, stopping early at Discord's 6000 character limit."""
+        batch = [buffer.embeds.popleft()]
+        chars = len(batch[0])
+        while buffer.embeds and len(batch) < EMBEDS_PER_MESSAGE and chars + len(buffer.embeds[0]) <= CHARS_PER_MESSAGE:
+            chars += len(buffer.embeds[0])
+            batch.append(buffer.embeds.popleft())
+        return batch
+
+    async def post_separately(self, channel, buffer, batch):
+        """
+        Posts a rejected batch one embed at a time, so only the entries Discord rejects on their own are dropped.
+        """
+        for index, embed in enumerate(batch):
+            try:
+                await channel.send(embed=embed)
+            except discord.HTTPException as e:
+                if e.status == 429 or e.status >= 500:
+                    print(f"Failed to post moderation log entry in #{channel.name}: {e}")
+                    buffer.embeds.extendleft(reversed(batch[index:]))
+                    return False
+                print(f"Dropping moderation log entry rejected by #{channel.name}: {e}")
+        return True
+
+    async def flush_channel(self, channel_id, buffer, due):
+        """
+        Posts full batches, plus a final partial batch when the channel's interval is due.
+        A batch Discord rejects outright (a 4xx) is never put back, or it would block the channel for good.
+        """
+        buffer.last_flush = time.monotonic()
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            print(f"Moderation log channel {channel_id} no longer exists; dropping {len(buffer.embeds) + buffer.spilled} entries.")
+            buffer.embeds.clear()
+            buffer.overflow.clear()
+            for _, path, _ in buffer.segments:
+                os.remove(path)
+            buffer.segments.clear()
+            return
+        while True:
+            if not buffer.embeds and buffer.spilled:
+                await self.refill(buffer)
+            if not buffer.embeds or (len(buffer.embeds) < EMBEDS_PER_MESSAGE and not due):
+                return
+            batch = buffer.sending = self.take_batch(buffer)
+            try:
+                await channel.send(embeds=batch)
+            except discord.Forbidden:
+                print(f"Bot lacks permissions to post in moderation log channel #{channel.name}; dropping {len(batch)} entries.")
+            except discord.HTTPException as e:
+                if e.status == 429 or e.status >= 500:
+                    # discord.py already retried these; put the batch back in front and try again on the next tick
+                    print(f"Failed to post moderation log batch in #{channel.name}: {e}")
+                    buffer.embeds.extendleft(reversed(batch))
+                    return
+                if len(batch) == 1:
+                    print(f"Dropping moderation log entry rejected by #{channel.name}: {e}")
+                elif not await self.post_separately(channel, buffer, batch):
+                    return
+            finally:
+                buffer.sending = []
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            now = time.monotonic()
+            for channel_id, buffer in list(self.buffers.items()):
+                if not buffer.embeds and not buffer.spilled:
+                    continue
+                due = now - buffer.last_flush >= buffer.interval
+                if due or len(buffer.embeds) >= EMBEDS_PER_MESSAGE:
+                    try:
+                        await self.flush_channel(channel_id, buffer, due)
+                    except Exception as e:
+                        print(f"Error flushing moderation log channel {channel_id}: {e}")
+
+    def close(self):
+        """
+        Stops flushing and writes everything still in memory to disk, so buffered entries survive a
+        shutdown (or reload) and are posted in order on the next start. Runs on the shutdown path,
+        so unlike `spill` it writes synchronously: the buffer becomes a segment in front of all others,
+        the overflow one after them.
+        """
+        if self.task:
+            self.task.cancel()
+        for channel_id, buffer in self.buffers.items():
+            buffer.embeds.extendleft(reversed(buffer.sending)) # Might get posted twice, but is never lost
+            buffer.sending = []
+            if buffer.embeds:
+                first_seq = min([seq for seq, _, _ in buffer.segments] + list(buffer.writing) + [buffer.next_seq]) - 1
+                path = self.segment_path(channel_id, first_seq, len(buffer.embeds))
+                write_segment(path, [embed.to_dict() for embed in buffer.embeds])
+                bisect.insort(buffer.segments, (first_seq, path, len(buffer.embeds)))
+                buffer.embeds.clear()
+            if buffer.overflow:
+                seq = buffer.next_seq
+                buffer.next_seq += 1
+                path = self.segment_path(channel_id, seq, len(buffer.overflow))
+                write_segment(path, buffer.overflow)
+                bisect.insort(buffer.segments, (seq, path, len(buffer.overflow)))
+                buffer.overflow = []
+
+def get_modlog_sink(bot):
+    """
+    Returns the bot-wide ModLogSink, creating it on first use.
+    """
+    sink = getattr(bot, "modlog_sink", None)
+    if sink is None:
+        sink = ModLogSink(bot)
+        bot.modlog_sink = sink
+    return sink
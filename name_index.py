@@ -0,0 +1,111 @@
+# cogs/name_index.py
+
+class NameIndex:
+    """
+    Per-guild name -> ID indexes for channels and roles, so resolving `{channel:name}` placeholders or
+    roles like "Muted" is a dict lookup instead of a scan over every channel or role.
+    A guild's index is built on first use and then kept in sync from the channel/role
+    create/update/delete gateway events. Duplicate names keep every ID; lookups return the oldest,
+    which matches what Discord shows first for same-named channels and roles.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channels = {} # {guild_id: {name: [channel_id, ...]}}
+        self.roles = {} # {guild_id: {name: [role_id, ...]}}
+        for listener in (self.on_guild_channel_create, self.on_guild_channel_delete, self.on_guild_channel_update,
+                         self.on_guild_role_create, self.on_guild_role_delete, self.on_guild_role_update,
+                         self.on_guild_remove):
+            bot.add_listener(listener)
+
+    @staticmethod
+    def _build(items):
+        index = {}
+        for item in items:
+            index.setdefault(item.name, []).append(item.id)
+        return index
+
+    @staticmethod
+    def _add(index, name, item_id):
+        ids = index.setdefault(name, [])
+        if item_id not in ids:
+            ids.append(item_id)
+
+    @staticmethod
+    def _remove(index, name, item_id):
+        ids = index.get(name)
+        if ids and item_id in ids:
+            ids.remove(item_id)
+            if not ids:
+                del index[name]
+
+    def _channel_index(self, guild):
+        index = self.channels.get(guild.id)
+        if index is None:
+            index = self._build(guild.channels)
+            self.channels[guild.id] = index
+        return index
+
+    def _role_index(self, guild):
+        index = self.roles.get(guild.id)
+        if index is None:
+            index = self._build(guild.roles)
+            self.roles[guild.id] = index
+        return index
+
+    def channel(self, guild, name):
+        """Returns the guild channel with this exact name, or None."""
+        ids = self._channel_index(guild).get(name)
+        return guild.get_channel(min(ids)) if ids else None
+
+    def role(self, guild, name):
+        """Returns the guild role with this exact name, or None."""
+        ids = self._role_index(guild).get(name)
+        return guild.get_role(min(ids)) if ids else None
+
+    # Listeners only touch guilds whose index has already been built; others are built fresh on first use.
+    async def on_guild_channel_create(self, channel):
+        index = self.channels.get(channel.guild.id)
+        if index is not None:
+            self._add(index, channel.name, channel.id)
+
+    async def on_guild_channel_delete(self, channel):
+        index = self.channels.get(channel.guild.id)
+        if index is not None:
+            self._remove(index, channel.name, channel.id)
+
+    async def on_guild_channel_update(self, before, after):
+        index = self.channels.get(after.guild.id)
+        if index is not None and before.name != after.name:
+            self._remove(index, before.name, before.id)
+            self._add(index, after.name, after.id)
+
+    async def on_guild_role_create(self, role):
+        index = self.roles.get(role.guild.id)
+        if index is not None:
+            self._add(index, role.name, role.id)
+
+    async def on_guild_role_delete(self, role):
+        index = self.roles.get(role.guild.id)
+        if index is not None:
+            self._remove(index, role.name, role.id)
+
+    async def on_guild_role_update(self, before, after):
+        index = self.roles.get(after.guild.id)
+        if index is not None and before.name != after.name:
+            self._remove(index, before.name, before.id)
+            self._add(index, after.name, after.id)
+
+    async def on_guild_remove(self, guild):
+        self.channels.pop(guild.id, None)
+        self.roles.pop(guild.id, None)
+
+def get_name_index(bot):
+    """
+    Returns the bot-wide NameIndex, creating it (and registering its listeners) on first use.
+    """
+    index = getattr(bot, "name_index", None)
+    if index is None:
+        index = NameIndex(bot)
+        bot.name_index = index
+    return index
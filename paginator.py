@@ -0,0 +1,143 @@
+# cogs/paginator.py
+import discord
+from collections import OrderedDict
+
+DEFAULT_PER_PAGE = 10
+DEFAULT_TIMEOUT = 120 # Seconds of inactivity before a paginator's buttons are disabled and the view is dropped
+MAX_CACHED_SOURCES = 256 # Page sources kept per cache; the least recently used are dropped first
+
+class PageSource:
+    """
+    Renders a sorted snapshot of a store into embed pages, one page at a time.
+    The snapshot is taken on the first page request and rendered pages are cached, both until the
+    store's version changes; listing an unchanged store again costs nothing.
+    `entries_fn()` returns the entries, `sort_key` orders them (without one they keep the order given) and
+    `render_fn(embed, entry)` adds one entry to a page.
+    """
+
+    def __init__(self, title, description, color, entries_fn, render_fn, sort_key=None, per_page=DEFAULT_PER_PAGE):
+        self.title = title
+        self.description = description
+        self.color = color
+        self.entries_fn = entries_fn
+        self.render_fn = render_fn
+        self.sort_key = sort_key
+        self.per_page = per_page
+        self.version = None
+        self.snapshot = None
+        self.pages = {} # {page_number: embed}
+
+    def refresh(self, version):
+        if version != self.version:
+            self.version = version
+            self.snapshot = None
+            self.pages = {}
+
+    def entries(self):
+        if self.snapshot is None:
+            entries = self.entries_fn()
+            self.snapshot = sorted(entries, key=self.sort_key) if self.sort_key else list(entries)
+        return self.snapshot
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.entries()) // self.per_page))
+
+    def get_page(self, page):
+        embed = self.pages.get(page)
+        if embed is None:
+            entries = self.entries()
+            embed = discord.Embed(title=self.title, description=self.description, color=self.color)
+            for entry in entries[page * self.per_page:(page + 1) * self.per_page]:
+                self.render_fn(embed, entry)
+            embed.set_footer(text=f"Page {page + 1}/{self.page_count} · {len(entries)} total")
+            self.pages[page] = embed
+        return embed
+
+def get_page_source(cache, key, version, factory):
+    """
+    Returns the cached PageSource for `key` (creating it with `factory()` if needed), refreshed to `version`.
+    `cache` is an OrderedDict owned by the caller and bounded to MAX_CACHED_SOURCES entries.
+    """
+    source = cache.get(key)
+    if source is None:
+        source = factory()
+        cache[key] = source
+        while len(cache) > MAX_CACHED_SOURCES:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    source.refresh(version)
+    return source
+
+def new_page_source_cache():
+    return OrderedDict()
+
+class Paginator(discord.ui.View):
+    """
+    Button-driven pager over a PageSource. Only the user who ran the command can flip pages.
+    The view times out after DEFAULT_TIMEOUT seconds of inactivity, disables its buttons and is
+    released, so idle paginators don't accumulate.
+    """
+
+    def __init__(self, source, author_id, version_fn=None, timeout=DEFAULT_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.source = source
+        self.author_id = author_id
+        self.version_fn = version_fn # Re-checked on every click so edits show up
+        self.page = 0
+        self.message = None
+        self.update_buttons()
+
+    @classmethod
+    async def start(cls, ctx, source, version_fn=None):
+        paginator = cls(source, ctx.author.id, version_fn)
+        if source.page_count == 1:
+            return await ctx.send(embed=source.get_page(0)) # Nothing to page through
+        paginator.message = await ctx.send(embed=source.get_page(0), view=paginator)
+        return paginator.message
+
+    def update_buttons(self):
+        last = self.source.page_count - 1
+        self.first_page.disabled = self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.last_page.disabled = self.page >= last
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Only the person who ran this command can change pages.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction, page):
+        if self.version_fn:
+            self.source.refresh(self.version_fn())
+        self.page = max(0, min(page, self.source.page_count - 1))
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.source.get_page(self.page), view=self)
+
+    @discord.ui.button(label="≪", style=discord.ButtonStyle.secondary)
+    async def first_page(self, interaction, button):
+        await self.show(interaction, 0)
+
+    @discord.ui.button(label="‹", style=discord.ButtonStyle.primary)
+    async def previous_page(self, interaction, button):
+        await self.show(interaction, self.page - 1)
+
+    @discord.ui.button(label="›", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction, button):
+        await self.show(interaction, self.page + 1)
+
+    @discord.ui.button(label="≫", style=discord.ButtonStyle.secondary)
+    async def last_page(self, interaction, button):
+        await self.show(interaction, self.source.page_count - 1)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+        self.message = None
+        self.source = None
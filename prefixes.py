@@ -0,0 +1,106 @@
+# cogs/prefixes.py
+from collections import OrderedDict
+
+from cogs.storage import get_settings
+
+# Prefixes every guild answers to. Matching is case-insensitive, so "XTRM " and "xtrm " are one entry.
+# Note the space after the prefix is crucial for proper parsing.
+DEFAULT_PREFIXES = ("XTRM ", "xtrm ")
+MAX_GUILD_PREFIXES = 10
+MAX_PREFIX_LENGTH = 20
+
+_END = "" # Marks a node where a prefix ends (never a real character)
+
+class PrefixTrie:
+    """
+    Case-folded trie of prefixes. `match` walks the message once, so the cost depends on
+    the length of the longest prefix, not on how many prefixes there are.
+    """
+    __slots__ = ("root",)
+
+    def __init__(self, prefixes=()):
+        self.root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix):
+        node = self.root
+        for char in prefix.casefold():
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    def match(self, text):
+        """
+        Returns the length of the longest prefix at the start of `text`, or 0 if none matches.
+        The length is measured in `text` itself, so text[:length] is the prefix exactly as the user typed it.
+        """
+        node = self.root
+        longest = 0
+        for position, char in enumerate(text):
+            for folded in char.casefold(): # Some characters fold to several ("ß" -> "ss")
+                node = node.get(folded)
+                if node is None:
+                    return longest
+            if _END in node:
+                longest = position + 1
+        return longest
+
+class PrefixResolver:
+    """
+    Resolves command prefixes per guild: the defaults plus whatever the guild added with `prefix add`.
+    An instance is passed as the bot's `command_prefix`, and the on_message listeners call `match`
+    on the same instance, so every message is checked against a trie once and the result is reused.
+    """
+
+    def __init__(self, defaults=DEFAULT_PREFIXES, recent_size=256):
+        self.defaults = tuple(defaults)
+        self.default_trie = PrefixTrie(self.defaults)
+        self.guild_tries = {} # {guild_id: PrefixTrie}, built on first use
+        self.recent = OrderedDict() # {message_id: matched prefix or None}, shared by the framework and listeners
+        self.recent_size = recent_size
+
+    def guild_prefixes(self, guild_id):
+        """Returns the extra prefixes configured for a guild."""
+        return get_settings().get(guild_id, "prefixes", [])
+
+    def set_guild_prefixes(self, guild_id, prefixes):
+        get_settings().set(guild_id, "prefixes", list(prefixes) or None)
+        self.guild_tries.pop(guild_id, None)
+
+    def trie_for(self, guild_id):
+        if guild_id is None:
+            return self.default_trie
+        trie = self.guild_tries.get(guild_id)
+        if trie is None:
+            extra = self.guild_prefixes(guild_id)
+            trie = PrefixTrie(self.defaults + tuple(extra)) if extra else self.default_trie
+            self.guild_tries[guild_id] = trie
+        return trie
+
+    def match(self, message):
+        """
+        Returns the prefix at the start of `message.content` exactly as typed, or None if there isn't one.
+        """
+        if message.id in self.recent:
+            return self.recent[message.id]
+        length = self.trie_for(message.guild.id if message.guild else None).match(message.content)
+        prefix = message.content[:length] if length else None
+        self.recent[message.id] = prefix
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+        return prefix
+
+    def __call__(self, bot, message):
+        # discord.py treats an empty list as "no prefix matched"
+        prefix = self.match(message)
+        return prefix if prefix is not None else []
+
+def get_prefix_resolver(bot):
+    """
+    Returns the bot's PrefixResolver, installing one as `command_prefix` if the bot was created without it.
+    """
+    resolver = bot.command_prefix
+    if not isinstance(resolver, PrefixResolver):
+        resolver = PrefixResolver()
+        bot.command_prefix = resolver
+    return resolver
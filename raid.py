@@ -0,0 +1,511 @@
+# cogs/raid.py
+import discord
+from discord.ext import commands
+import asyncio
+import datetime
+import os
+import re
+import time
+from collections import deque
+
+from cogs.bulk_executor import get_bulk_executor
+from cogs.cog_state import CogState, get_cog_state
+from cogs.member_index import JoinIndex
+from cogs.storage import data_path, get_settings, read_json, write_json_atomic
+
+# Default detection settings. Every guild starts with a copy of these and can tune them
+# with `XTRM raidmode config <setting> <value>`.
+DEFAULT_RAID_CONFIG = {
+    "window": 60,         # Sliding window length in seconds
+    "threshold": 15,      # Joins inside the window that count as a raid on their own
+    "burst": 8,           # Token bucket capacity (joins allowed back-to-back)
+    "rate": 0.2,          # Token bucket refill rate (joins per second)
+    "suspicious": 5,      # Suspicious joins inside the window that count as a raid once the bucket is empty
+    "minage": 7,          # Accounts younger than this many days are suspicious
+    "similar": 3,         # Joiners sharing a name skeleton inside the window before names count as suspicious
+    "duration": 15,       # Minutes raid mode stays active after the last detected raid join
+    "hold": "timeout",    # How joiners are held during raid mode: "timeout" or "role"
+}
+
+HOLD_TIMEOUT = datetime.timedelta(hours=1) # How long joiners are timed out when held during raid mode
+
+CLEANUP_JOB_DIR = "cleanup_jobs" # Pending cleanup jobs are saved here so they resume after a restart
+
+_NAME_SKELETON_RE = re.compile(r"[^a-z]+")
+
+def name_skeleton_hash(name):
+    """
+    Hashes a username down to its letters only, so 'raider_01', 'Raider02' and 'r.a.i.d.e.r'
+    land in the same bucket. Used for cheap name-similarity checks across recent joiners.
+    """
+    skeleton = _NAME_SKELETON_RE.sub("", name.lower())
+    return hash(skeleton) if skeleton else None
+
+class TokenBucket:
+    """
+    Classic token bucket. Each join takes one token; tokens refill at `rate` per second up to `capacity`.
+    An empty bucket means joins are arriving faster than the configured sustained rate.
+    """
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Takes one token. Returns False if the bucket was empty."""
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class GuildJoinTracker:
+    """
+    Per-guild join rate state: a token bucket plus a sliding window of recent joins.
+    Every operation is amortized O(1) per join: expired entries are popped from the left of the
+    deque exactly once, and name skeleton counts are kept in a dict alongside the window.
+    """
+    __slots__ = ("config", "bucket", "window", "suspicious_count", "name_counts")
+
+    def __init__(self, config):
+        self.config = config
+        self.bucket = TokenBucket(config["burst"], config["rate"])
+        self.window = deque() # (timestamp, name_hash, suspicious)
+        self.suspicious_count = 0
+        self.name_counts = {} # {name_hash: joins in window}
+
+    def _expire(self, now):
+        cutoff = now - self.config["window"]
+        window = self.window
+        while window and window[0][0] < cutoff:
+            _, name_hash, suspicious = window.popleft()
+            if suspicious:
+                self.suspicious_count -= 1
+            if name_hash is not None:
+                remaining = self.name_counts[name_hash] - 1
+                if remaining:
+                    self.name_counts[name_hash] = remaining
+                else:
+                    del self.name_counts[name_hash]
+
+    def record(self, now, name_hash, flagged):
+        """
+        Records one join and returns (joins_in_window, bucket_ok, suspicious_in_window, similar_names).
+        `flagged` is the result of the per-join heuristics that don't depend on other joiners.
+        """
+        self._expire(now)
+        similar = 0
+        if name_hash is not None:
+            similar = self.name_counts.get(name_hash, 0) + 1
+            self.name_counts[name_hash] = similar
+        suspicious = flagged or similar >= self.config["similar"]
+        if suspicious:
+            self.suspicious_count += 1
+        self.window.append((now, name_hash, suspicious))
+        bucket_ok = self.bucket.take(now)
+        return len(self.window), bucket_ok, self.suspicious_count, similar
+
+class RaidProtection(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # self.qualified_name is automatically set by discord.py
+        # Data lives in the bot-level registry so reloading this cog keeps join windows and raid mode
+        self.state = get_cog_state(bot, "RaidProtection", lambda snapshot: CogState(
+            raid_config={}, trackers={}, raid_mode={}, join_indexes={}
+        ))
+        self.raid_config = self.state.raid_config # {guild_id: {setting: value, "quarantine_role_id": int, "alert_channel_id": int}}, loaded from guild settings
+        self.trackers = self.state.trackers # {guild_id: GuildJoinTracker}
+        self.raid_mode = self.state.raid_mode # {guild_id: monotonic time when raid mode expires}
+        self.join_indexes = self.state.join_indexes # {guild_id: JoinIndex}, built on first cleanup query and kept up to date by listeners
+        self.cleanup_jobs = {} # {guild_id: asyncio.Task} for running cleanup jobs
+        self.resume_task = None
+
+    async def cog_load(self):
+        self.resume_task = asyncio.create_task(self.resume_cleanup_jobs())
+
+    async def cog_unload(self):
+        # Jobs keep their saved state on disk and resume on the next load (or reload)
+        if self.resume_task:
+            self.resume_task.cancel()
+        for task in self.cleanup_jobs.values():
+            task.cancel()
+
+    def get_config(self, guild_id):
+        config = self.raid_config.get(guild_id)
+        if config is None:
+            # Saved settings on top of the defaults, so settings added later still get a value
+            config = dict(DEFAULT_RAID_CONFIG)
+            config.update(get_settings().get(guild_id, "raid_config", {}))
+            self.raid_config[guild_id] = config
+        return config
+
+    def save_config(self, guild_id):
+        """Persists the guild's raid settings, quarantine role and alert channel so they survive restarts."""
+        get_settings().set(guild_id, "raid_config", self.get_config(guild_id))
+
+    def get_tracker(self, guild_id):
+        tracker = self.trackers.get(guild_id)
+        if tracker is None:
+            tracker = GuildJoinTracker(self.get_config(guild_id))
+            self.trackers[guild_id] = tracker
+        return tracker
+
+    def is_raid_mode(self, guild_id, now=None):
+        expires = self.raid_mode.get(guild_id)
+        if expires is None:
+            return False
+        if (now or time.monotonic()) >= expires:
+            del self.raid_mode[guild_id]
+            print(f"Raid mode expired for guild {guild_id}.")
+            return False
+        return True
+
+    def activate_raid_mode(self, guild_id, minutes, now=None):
+        self.raid_mode[guild_id] = (now or time.monotonic()) + minutes * 60
+
+    async def send_alert(self, guild, text):
+        config = self.get_config(guild.id)
+        channel_id = config.get("alert_channel_id")
+        channel = guild.get_channel(channel_id) if channel_id else None
+        print(f"[{guild.name}] {text}")
+        if channel:
+            try:
+                await channel.send(text)
+            except discord.HTTPException as e:
+                print(f"Failed to send raid alert in {guild.name}: {e}")
+
+    async def hold_member(self, member, config):
+        """
+        Holds a new joiner while raid mode is active, either with the quarantine role or a timeout.
+        """
+        try:
+            if config["hold"] == "role" and config.get("quarantine_role_id"):
+                role = member.guild.get_role(config["quarantine_role_id"])
+                if role:
+                    await member.add_roles(role, reason="Raid mode: holding new joiner.")
+                    return
+            await member.timeout(HOLD_TIMEOUT, reason="Raid mode: holding new joiner.")
+        except discord.Forbidden:
+            print(f"Bot lacks permissions to hold {member} during raid mode in {member.guild.name}.")
+        except discord.HTTPException as e:
+            print(f"Error holding {member} during raid mode: {e}")
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        """
+        Scores every join against the guild's join rate and per-join heuristics, switching the
+        guild into raid mode when a raid is detected and holding joiners while raid mode is active.
+        """
+        join_index = self.join_indexes.get(member.guild.id)
+        if join_index is not None and member.joined_at:
+            join_index.add(member.id, member.joined_at.timestamp())
+
+        if member.bot:
+            return
+
+        guild = member.guild
+        config = self.get_config(guild.id)
+        now = time.monotonic()
+
+        # Cheap per-join heuristics
+        account_age = discord.utils.utcnow() - member.created_at
+        flagged = account_age < datetime.timedelta(days=config["minage"]) or member.avatar is None
+
+        joins, bucket_ok, suspicious, similar = self.get_tracker(guild.id).record(now, name_skeleton_hash(member.name), flagged)
+
+        already_active = self.is_raid_mode(guild.id, now)
+        detected = joins >= config["threshold"] or (not bucket_ok and suspicious >= config["suspicious"])
+
+        if detected:
+            # Every raid join pushes the expiry out again
+            self.activate_raid_mode(guild.id, config["duration"], now)
+            if not already_active:
+                await self.send_alert(guild, f"🚨 Raid detected: {joins} joins in the last {config['window']}s ({suspicious} suspicious). Raid mode enabled; new joiners will be held.")
+
+        if detected or already_active:
+            await self.hold_member(member, config)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        join_index = self.join_indexes.get(member.guild.id)
+        if join_index is not None:
+            join_index.remove(member.id)
+
+    def get_join_index(self, guild):
+        join_index = self.join_indexes.get(guild.id)
+        if join_index is None:
+            join_index = JoinIndex.from_members(guild.members)
+            self.join_indexes[guild.id] = join_index
+        return join_index
+
+    def select_recent_joiners(self, guild, minutes, name_pattern=None, max_age_days=None):
+        """
+        Returns members who joined in the last `minutes`, optionally filtered by a name regex
+        and by account age. Bisects the join index, so cost is O(log n + k) for k recent joiners.
+        """
+        since = (discord.utils.utcnow() - datetime.timedelta(minutes=minutes)).timestamp()
+        created_after = None
+        if max_age_days is not None:
+            created_after = discord.utils.utcnow() - datetime.timedelta(days=max_age_days)
+
+        selected = []
+        for member_id in self.get_join_index(guild).joined_since(since):
+            member = guild.get_member(member_id)
+            if member is None or member.bot or member.id == guild.owner_id:
+                continue
+            if created_after and member.created_at < created_after:
+                continue
+            if name_pattern and not (name_pattern.search(member.name) or name_pattern.search(member.display_name)):
+                continue
+            selected.append(member)
+        return selected
+
+    def cleanup_job_path(self, guild_id):
+        return data_path(CLEANUP_JOB_DIR, f"{guild_id}.json")
+
+    async def run_cleanup_job(self, guild, job, progress_message=None):
+        """
+        Runs (or resumes) a saved cleanup job through the bounded worker pool. The remaining IDs are
+        saved on every progress tick, so a restart picks up where the job left off.
+        """
+        path = self.cleanup_job_path(guild.id)
+        reason = job["reason"]
+        action = job["action"]
+        remaining = list(job["remaining"])
+        write_json_atomic(path, job)
+
+        async def act(member_id):
+            target = discord.Object(id=member_id)
+            if action == "ban":
+                await guild.ban(target, reason=reason, delete_message_seconds=0)
+            else:
+                await guild.kick(target, reason=reason)
+
+        async def on_progress(result):
+            done = set(result.succeeded)
+            done.update(result.failed)
+            job["remaining"] = [member_id for member_id in remaining if member_id not in done]
+            job["succeeded"] = job["succeeded_before"] + len(result.succeeded)
+            job["failed"] = job["failed_before"] + len(result.failed)
+            write_json_atomic(path, job)
+            if progress_message:
+                processed = job["total"] - len(job["remaining"])
+                try:
+                    await progress_message.edit(content=f"🧹 Raid cleanup ({action}): {processed}/{job['total']} processed, {job['failed']} failed.")
+                except discord.HTTPException:
+                    pass
+
+        job["succeeded_before"] = job.get("succeeded", 0)
+        job["failed_before"] = job.get("failed", 0)
+        result = await get_bulk_executor(self.bot).run(remaining, act, on_progress=on_progress)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def start_cleanup_job(self, guild, job, progress_message=None):
+        async def runner():
+            try:
+                result = await self.run_cleanup_job(guild, job, progress_message)
+                summary = f"✅ Raid cleanup finished: {job['succeeded']} {'banned' if job['action'] == 'ban' else 'kicked'}, {job['failed']} failed ({result.elapsed:.1f}s)."
+                channel = guild.get_channel(job["channel_id"])
+                if channel:
+                    await channel.send(summary)
+                print(f"[{guild.name}] {summary}")
+            finally:
+                self.cleanup_jobs.pop(guild.id, None)
+
+        self.cleanup_jobs[guild.id] = asyncio.create_task(runner())
+
+    async def resume_cleanup_jobs(self):
+        await self.bot.wait_until_ready()
+        job_dir = os.path.dirname(data_path(CLEANUP_JOB_DIR, "placeholder"))
+        for filename in os.listdir(job_dir):
+            if not filename.endswith(".json"):
+                continue
+            job = read_json(os.path.join(job_dir, filename))
+            guild = self.bot.get_guild(job["guild_id"]) if job else None
+            if guild is None or guild.id in self.cleanup_jobs:
+                continue
+            print(f"[{guild.name}] Resuming raid cleanup job with {len(job['remaining'])} members remaining.")
+            self.start_cleanup_job(guild, job)
+
+    @commands.group(name="raidmode", invoke_without_command=True, help="Shows or manages raid mode.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode(self, ctx):
+        """
+        Shows the current raid mode status and detection settings.
+        Usage: XTRM raidmode [subcommand]
+        Example: XTRM raidmode on 30
+        """
+        config = self.get_config(ctx.guild.id)
+        active = self.is_raid_mode(ctx.guild.id)
+        embed = discord.Embed(
+            title="Raid Protection",
+            description=f"Raid mode is currently **{'active' if active else 'inactive'}**.",
+            color=discord.Color.red() if active else discord.Color.green()
+        )
+        if active:
+            remaining = int(self.raid_mode[ctx.guild.id] - time.monotonic())
+            embed.add_field(name="Expires In", value=f"{remaining // 60}m {remaining % 60}s", inline=False)
+        settings = "\n".join(f"`{key}`: {config[key]}" for key in DEFAULT_RAID_CONFIG)
+        embed.add_field(name="Settings", value=settings, inline=False)
+        role = ctx.guild.get_role(config["quarantine_role_id"]) if config.get("quarantine_role_id") else None
+        channel = ctx.guild.get_channel(config["alert_channel_id"]) if config.get("alert_channel_id") else None
+        embed.add_field(name="Quarantine Role", value=role.mention if role else "Not set", inline=True)
+        embed.add_field(name="Alert Channel", value=channel.mention if channel else "Not set", inline=True)
+        await ctx.send(embed=embed)
+
+    @raidmode.command(name="on", help="Manually enables raid mode.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_on(self, ctx, minutes: int = None):
+        """
+        Manually enables raid mode. New joiners are held until it expires or is disabled.
+        Usage: XTRM raidmode on [minutes]
+        Example: XTRM raidmode on 30
+        """
+        config = self.get_config(ctx.guild.id)
+        minutes = minutes or config["duration"]
+        if minutes <= 0:
+            return await ctx.send("❌ Duration must be a positive number of minutes.")
+        self.activate_raid_mode(ctx.guild.id, minutes)
+        await ctx.send(f"🚨 Raid mode enabled for {minutes} minutes. New joiners will be held.")
+
+    @raidmode.command(name="off", help="Disables raid mode.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_off(self, ctx):
+        """
+        Disables raid mode immediately. Members that were already held are not released.
+        Usage: XTRM raidmode off
+        """
+        if self.raid_mode.pop(ctx.guild.id, None) is None:
+            return await ctx.send("❌ Raid mode is not active.")
+        await ctx.send("✅ Raid mode disabled.")
+
+    @raidmode.command(name="config", help="Changes a raid detection setting.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_config(self, ctx, setting: str, value: str):
+        """
+        Changes a raid detection setting for this server.
+        Usage: XTRM raidmode config <setting> <value>
+        Settings: window, threshold, burst, rate, suspicious, minage, similar, duration, hold (timeout|role)
+        Example: XTRM raidmode config threshold 20
+        """
+        setting = setting.lower()
+        if setting not in DEFAULT_RAID_CONFIG:
+            return await ctx.send(f"❌ Unknown setting. Valid settings: {', '.join(f'`{key}`' for key in DEFAULT_RAID_CONFIG)}")
+
+        if setting == "hold":
+            value = value.lower()
+            if value not in ("timeout", "role"):
+                return await ctx.send("❌ Hold must be `timeout` or `role`.")
+            parsed = value
+        else:
+            try:
+                parsed = type(DEFAULT_RAID_CONFIG[setting])(value)
+            except ValueError:
+                return await ctx.send(f"❌ `{setting}` must be a number.")
+            if parsed <= 0:
+                return await ctx.send(f"❌ `{setting}` must be positive.")
+
+        self.get_config(ctx.guild.id)[setting] = parsed
+        self.save_config(ctx.guild.id)
+        self.trackers.pop(ctx.guild.id, None) # Rebuild the tracker with the new settings
+        await ctx.send(f"✅ Raid setting `{setting}` set to `{parsed}`.")
+
+    @raidmode.command(name="quarantine", help="Sets the role used to hold joiners during raid mode.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_quarantine(self, ctx, *, role: discord.Role):
+        """
+        Sets the quarantine role given to joiners during raid mode (used when `hold` is `role`).
+        Usage: XTRM raidmode quarantine <@role/Role Name>
+        Example: XTRM raidmode quarantine @Quarantine
+        """
+        if role >= ctx.guild.me.top_role:
+            return await ctx.send("❌ I cannot assign roles that are equal to or higher than my top role.")
+        config = self.get_config(ctx.guild.id)
+        config["quarantine_role_id"] = role.id
+        config["hold"] = "role"
+        self.save_config(ctx.guild.id)
+        await ctx.send(f"✅ Quarantine role set to `{role.name}`. Joiners will receive it during raid mode.")
+
+    @raidmode.command(name="alerts", help="Sets the channel that receives raid alerts.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_alerts(self, ctx, channel: discord.TextChannel):
+        """
+        Sets the channel where raid detection alerts are posted.
+        Usage: XTRM raidmode alerts <#channel>
+        Example: XTRM raidmode alerts #security-logs
+        """
+        self.get_config(ctx.guild.id)["alert_channel_id"] = channel.id
+        self.save_config(ctx.guild.id)
+        await ctx.send(f"✅ Raid alerts will be posted in {channel.mention}.")
+
+    @raidmode.command(name="cleanup", help="Kicks or bans everyone who joined in the last N minutes.")
+    @commands.has_permissions(administrator=True)
+    async def raidmode_cleanup(self, ctx, minutes: int, action: str = "kick", *, options: str = ""):
+        """
+        Selects everyone who joined in the last N minutes and kicks or bans them.
+        Without --confirm this is a dry run that only shows how many members match.
+        Usage: XTRM raidmode cleanup <minutes> [kick|ban] [--name <regex>] [--age <days>] [--confirm]
+        --name: only members whose name or nickname matches the regex
+        --age: only accounts younger than this many days
+        Example: XTRM raidmode cleanup 15 ban --name "raider" --age 3 --confirm
+        """
+        action = action.lower()
+        if action not in ("kick", "ban"):
+            return await ctx.send("❌ Invalid action. Use `kick` or `ban`.")
+        if minutes <= 0:
+            return await ctx.send("❌ Minutes must be positive.")
+        if ctx.guild.id in self.cleanup_jobs:
+            return await ctx.send("❌ A cleanup job is already running for this server.")
+
+        name_pattern = None
+        name_match = re.search(r'--name\s+(?:"([^"]+)"|(\S+))', options)
+        if name_match:
+            try:
+                name_pattern = re.compile(name_match.group(1) or name_match.group(2), re.IGNORECASE)
+            except re.error as e:
+                return await ctx.send(f"❌ Invalid name pattern: {e}")
+
+        max_age_days = None
+        age_match = re.search(r'--age\s+(\d+)', options)
+        if age_match:
+            max_age_days = int(age_match.group(1))
+
+        confirm = "--confirm" in options
+
+        targets = [member for member in self.select_recent_joiners(ctx.guild, minutes, name_pattern, max_age_days)
+                   if member != ctx.author and member.top_role < ctx.guild.me.top_role]
+
+        if not targets:
+            return await ctx.send("✅ No members match those filters.")
+
+        if not confirm:
+            preview = ", ".join(member.display_name for member in targets[:10])
+            more = f" and {len(targets) - 10} more" if len(targets) > 10 else ""
+            return await ctx.send(f"🔎 Dry run: {len(targets)} members would be {'banned' if action == 'ban' else 'kicked'}: {preview}{more}\nAdd `--confirm` to run it.")
+
+        job = {
+            "guild_id": ctx.guild.id,
+            "channel_id": ctx.channel.id,
+            "action": action,
+            "reason": f"Raid cleanup by {ctx.author.name}",
+            "remaining": [member.id for member in targets],
+            "total": len(targets),
+            "succeeded": 0,
+            "failed": 0,
+        }
+        progress_message = await ctx.send(f"🧹 Raid cleanup ({action}): 0/{len(targets)} processed.")
+        self.start_cleanup_job(ctx.guild, job, progress_message)
+
+async def setup(bot):
+    """
+    Adds the RaidProtection cog to the bot.
+    """
+    await bot.add_cog(RaidProtection(bot))
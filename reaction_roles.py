@@ -0,0 +1,339 @@
+# cogs/reaction_roles.py
+import discord
+from discord.ext import commands
+import asyncio
+
+from cogs.cog_state import CogState, get_cog_state
+from cogs.metrics import metrics
+from cogs.paginator import PageSource, Paginator, get_page_source, new_page_source_cache
+from cogs.storage import get_db
+
+COALESCE_DELAY = 1.5 # Seconds a member's role changes are held so quick reaction toggles collapse into their final state
+MAX_REACTIONS_PER_MESSAGE = 20 # Discord's limit on distinct reactions per message
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reaction_roles (
+    message_id INTEGER NOT NULL,
+    emoji TEXT NOT NULL,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    emoji_display TEXT NOT NULL,
+    role_id INTEGER NOT NULL,
+    PRIMARY KEY (message_id, emoji)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_reaction_roles_guild ON reaction_roles (guild_id);
+"""
+
+def emoji_key(emoji):
+    """
+    Returns the index key for a PartialEmoji: the ID for custom emoji (which survives renames), the
+    character itself for Unicode emoji. Raw gateway payloads and command arguments map to the same key.
+    """
+    return str(emoji.id) if emoji.id else emoji.name
+
+class ReactionRoleStore:
+    """
+    Reaction role bindings persisted in SQLite and mirrored in memory as a nested index
+    {message_id: {emoji_key: role_id}}, so a raw reaction event is resolved with two dict lookups and
+    no message cache or fetch. Every change writes straight through to the table.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(SCHEMA)
+        self.index = {} # {message_id: {emoji_key: role_id}}
+        self.messages = {} # {message_id: (guild_id, channel_id)}
+        self.guild_messages = {} # {guild_id: {message_id, ...}}, so per-guild listing doesn't scan every guild
+        self.displays = {} # {(message_id, emoji_key): emoji as typed, e.g. "<:party:123>"}
+        self.versions = {} # {guild_id: int}, bumped on every change for the list paginator
+        for row in self.db.execute("SELECT message_id, emoji, guild_id, channel_id, emoji_display, role_id FROM reaction_roles"):
+            self._put(row["guild_id"], row["channel_id"], row["message_id"], row["emoji"], row["emoji_display"], row["role_id"])
+
+    def _put(self, guild_id, channel_id, message_id, key, display, role_id):
+        self.index.setdefault(message_id, {})[key] = role_id
+        self.messages[message_id] = (guild_id, channel_id)
+        self.guild_messages.setdefault(guild_id, set()).add(message_id)
+        self.displays[(message_id, key)] = display
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+
+    def role_for(self, message_id, key):
+        """Returns the role ID bound to an emoji on a message, or None. The hot path for every raw reaction."""
+        emojis = self.index.get(message_id)
+        return emojis.get(key) if emojis else None
+
+    def guild_of(self, message_id):
+        entry = self.messages.get(message_id)
+        return entry[0] if entry else None
+
+    def version(self, guild_id):
+        return self.versions.get(guild_id, 0)
+
+    def bindings(self, message_id):
+        return self.index.get(message_id, {})
+
+    def add(self, guild_id, channel_id, message_id, key, display, role_id):
+        self._put(guild_id, channel_id, message_id, key, display, role_id)
+        self.db.execute(
+            "INSERT INTO reaction_roles (message_id, emoji, guild_id, channel_id, emoji_display, role_id) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (message_id, emoji) DO UPDATE SET emoji_display = excluded.emoji_display, role_id = excluded.role_id",
+            (message_id, key, guild_id, channel_id, display, role_id)
+        )
+        self.db.commit()
+
+    def _forget(self, message_id, key):
+        emojis = self.index.get(message_id)
+        if not emojis or key not in emojis:
+            return False
+        del emojis[key]
+        del self.displays[(message_id, key)]
+        guild_id = self.messages[message_id][0]
+        if not emojis:
+            del self.index[message_id]
+            del self.messages[message_id]
+            self.guild_messages[guild_id].discard(message_id)
+            if not self.guild_messages[guild_id]:
+                del self.guild_messages[guild_id]
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+        return True
+
+    def remove(self, message_id, key):
+        """Removes one binding. Returns False if it didn't exist."""
+        if not self._forget(message_id, key):
+            return False
+        self.db.execute("DELETE FROM reaction_roles WHERE message_id = ? AND emoji = ?", (message_id, key))
+        self.db.commit()
+        return True
+
+    def remove_messages(self, message_ids):
+        """Removes every binding on the given messages (e.g. after they were deleted). Returns the number removed."""
+        removed = 0
+        for message_id in message_ids:
+            for key in list(self.index.get(message_id, ())):
+                self._forget(message_id, key)
+                removed += 1
+        if removed:
+            self.db.executemany("DELETE FROM reaction_roles WHERE message_id = ?", [(message_id,) for message_id in message_ids])
+            self.db.commit()
+        return removed
+
+    def remove_role(self, guild_id, role_id):
+        """Removes every binding to a role (e.g. after it was deleted). Returns the number removed."""
+        doomed = [(message_id, key) for message_id in self.guild_messages.get(guild_id, ())
+                  for key, bound_role_id in self.index[message_id].items() if bound_role_id == role_id]
+        for message_id, key in doomed:
+            self._forget(message_id, key)
+        if doomed:
+            self.db.execute("DELETE FROM reaction_roles WHERE guild_id = ? AND role_id = ?", (guild_id, role_id))
+            self.db.commit()
+        return len(doomed)
+
+    def guild_entries(self, guild_id):
+        """Returns [(channel_id, message_id, emoji display, role_id)] for a guild."""
+        return [(self.messages[message_id][1], message_id, self.displays[(message_id, key)], role_id)
+                for message_id in self.guild_messages.get(guild_id, ())
+                for key, role_id in self.index[message_id].items()]
+
+class ReactionRoles(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # self.qualified_name is automatically set by discord.py
+        # The store lives in the bot-level registry so reloading this cog doesn't re-read the table
+        self.state = get_cog_state(bot, "ReactionRoles", lambda snapshot: CogState(store=ReactionRoleStore(get_db())))
+        self.store = self.state.store
+        self.pending = {} # {(guild_id, member_id): {role_id: True to add / False to remove}}, waiting to be applied
+        self.flush_tasks = {} # {(guild_id, member_id): asyncio.Task} sleeping out the coalescing delay
+        self.page_sources = new_page_source_cache() # Rendered `reactionrole list` pages per guild
+
+    async def cog_unload(self):
+        # Apply whatever is still waiting rather than dropping it
+        for task in self.flush_tasks.values():
+            task.cancel()
+        self.flush_tasks.clear()
+        for key in list(self.pending):
+            await self.apply_changes(key)
+
+    def queue_change(self, guild_id, member_id, role_id, wanted):
+        """
+        Records that a member should (or shouldn't) have a role. Changes for one member are applied together
+        after COALESCE_DELAY, and only the final state of each role counts: a member toggling a reaction
+        five times costs at most one call for that role, or none if they end where they started.
+        """
+        key = (guild_id, member_id)
+        changes = self.pending.setdefault(key, {})
+        if role_id in changes:
+            metrics.inc("reaction_role_changes_coalesced_total")
+        changes[role_id] = wanted
+        if key not in self.flush_tasks:
+            self.flush_tasks[key] = asyncio.create_task(self.flush_later(key))
+
+    async def flush_later(self, key):
+        await asyncio.sleep(COALESCE_DELAY)
+        # Drop the timer before applying, so changes arriving during the API call start a new one
+        self.flush_tasks.pop(key, None)
+        await self.apply_changes(key)
+
+    async def apply_changes(self, key):
+        guild_id, member_id = key
+        changes = self.pending.pop(key, None)
+        guild = self.bot.get_guild(guild_id)
+        if not changes or guild is None:
+            return
+        me = guild.me
+        member = guild.get_member(member_id)
+        # Only the reaction roles that changed are sent, one call per role, never the full role list:
+        # a PATCH built from the cached roles would revert roles given or taken by REST (mutes, raid
+        # quarantine, voice roles) whose gateway update hasn't arrived yet
+        current = {role.id for role in member.roles} if member is not None else None
+        for role_id, add in changes.items():
+            if current is not None and (role_id in current) == add:
+                continue # Already matches; add/remove are idempotent anyway, this just saves the call
+            role = guild.get_role(role_id)
+            if role is None or role >= me.top_role:
+                continue
+            # One failed role doesn't stop the others
+            try:
+                if add:
+                    await self.bot.http.add_role(guild_id, member_id, role_id, reason="Reaction roles")
+                else:
+                    await self.bot.http.remove_role(guild_id, member_id, role_id, reason="Reaction roles")
+                metrics.inc("reaction_role_edits_total")
+            except discord.Forbidden:
+                print(f"Bot lacks permissions to update reaction role {role.name} for {member_id} in {guild.name}.")
+            except discord.HTTPException as e:
+                print(f"Error updating reaction role {role.name} for {member_id} in {guild.name}: {e}")
+
+    # Raw events carry the message ID and emoji directly, so this works for messages that were never cached
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        if payload.guild_id is None or payload.user_id == self.bot.user.id:
+            return
+        role_id = self.store.role_for(payload.message_id, emoji_key(payload.emoji))
+        if role_id is None:
+            return
+        if payload.member is not None and payload.member.bot:
+            return
+        self.queue_change(payload.guild_id, payload.user_id, role_id, True)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        if payload.guild_id is None or payload.user_id == self.bot.user.id:
+            return
+        role_id = self.store.role_for(payload.message_id, emoji_key(payload.emoji))
+        if role_id is None:
+            return
+        self.queue_change(payload.guild_id, payload.user_id, role_id, False)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.message_id in self.store.messages:
+            self.store.remove_messages([payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        doomed = [message_id for message_id in payload.message_ids if message_id in self.store.messages]
+        if doomed:
+            self.store.remove_messages(doomed)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.store.remove_role(role.guild.id, role.id)
+
+    @commands.group(name="reactionrole", aliases=["rr"], invoke_without_command=True, help="Manages reaction roles.")
+    @commands.has_permissions(manage_roles=True)
+    async def reactionrole(self, ctx):
+        """
+        Base command for reaction roles: members get a role by reacting to a message and lose it by removing the reaction.
+        Usage: XTRM reactionrole [subcommand]
+        Example: XTRM reactionrole add 123456789012345678 🎮 @Gamer
+        """
+        await ctx.send_help(ctx.command)
+
+    @reactionrole.command(name="add", help="Binds an emoji on a message to a role.")
+    @commands.has_permissions(manage_roles=True)
+    async def reactionrole_add(self, ctx, message: discord.Message, emoji: str, *, role: discord.Role):
+        """
+        Binds an emoji on a message to a role and adds the reaction to the message.
+        The message can be an ID (in this channel), channelID-messageID or a message link.
+        Usage: XTRM reactionrole add <message> <emoji> <@role/Role Name>
+        Example: XTRM reactionrole add https://discord.com/channels/1/2/3 🎮 @Gamer
+        """
+        if message.guild != ctx.guild:
+            return await ctx.send("❌ That message isn't in this server.")
+        if role.is_default() or role.managed:
+            return await ctx.send("❌ That role can't be given out.")
+        if role >= ctx.guild.me.top_role:
+            return await ctx.send(f"❌ I cannot assign the role `{role.name}` because it is higher than or equal to my top role.")
+        if role >= ctx.author.top_role and ctx.author.id != ctx.guild.owner_id:
+            return await ctx.send("❌ You cannot manage roles that are equal to or higher than your top role.")
+
+        partial = discord.PartialEmoji.from_str(emoji)
+        key = emoji_key(partial)
+        bindings = self.store.bindings(message.id)
+        if key not in bindings and len(bindings) >= MAX_REACTIONS_PER_MESSAGE:
+            return await ctx.send(f"❌ A message can have at most {MAX_REACTIONS_PER_MESSAGE} reaction roles.")
+
+        try:
+            await message.add_reaction(partial)
+        except discord.HTTPException:
+            return await ctx.send("❌ I couldn't react with that emoji. Use a standard emoji or one from a server I'm in.")
+
+        self.store.add(ctx.guild.id, message.channel.id, message.id, key, str(partial), role.id)
+        await ctx.send(f"✅ Reacting with {partial} on that message now gives the `{role.name}` role.")
+
+    @reactionrole.command(name="remove", help="Removes a reaction role from a message.")
+    @commands.has_permissions(manage_roles=True)
+    async def reactionrole_remove(self, ctx, message_id: int, emoji: str):
+        """
+        Removes the role bound to an emoji on a message. Members keep roles they already have.
+        Usage: XTRM reactionrole remove <message ID> <emoji>
+        Example: XTRM reactionrole remove 123456789012345678 🎮
+        """
+        if self.store.guild_of(message_id) != ctx.guild.id:
+            return await ctx.send("❌ That message has no reaction roles in this server.")
+        if self.store.remove(message_id, emoji_key(discord.PartialEmoji.from_str(emoji))):
+            await ctx.send(f"✅ Reaction role for {emoji} removed.")
+        else:
+            await ctx.send(f"❌ No reaction role found for {emoji} on that message.")
+
+    @reactionrole.command(name="clear", help="Removes every reaction role from a message.")
+    @commands.has_permissions(manage_roles=True)
+    async def reactionrole_clear(self, ctx, message_id: int):
+        """
+        Removes every reaction role bound to a message.
+        Usage: XTRM reactionrole clear <message ID>
+        """
+        if self.store.guild_of(message_id) != ctx.guild.id:
+            return await ctx.send("❌ That message has no reaction roles in this server.")
+        removed = self.store.remove_messages([message_id])
+        await ctx.send(f"✅ Removed {removed} reaction role(s) from that message.")
+
+    @reactionrole.command(name="list", help="Lists the reaction roles in this server.")
+    @commands.has_permissions(manage_roles=True)
+    async def reactionrole_list(self, ctx):
+        """
+        Lists every reaction role in this server, grouped by message.
+        Usage: XTRM reactionrole list
+        """
+        guild = ctx.guild
+        if not self.store.guild_entries(guild.id):
+            return await ctx.send("No reaction roles configured for this server.")
+
+        def render(embed, entry):
+            channel_id, message_id, display, role_id = entry
+            role = guild.get_role(role_id)
+            role_name = role.name if role else f"Unknown Role (ID: {role_id})"
+            link = f"https://discord.com/channels/{guild.id}/{channel_id}/{message_id}"
+            embed.add_field(name=f"{display} → `{role_name}`", value=f"[Message {message_id}]({link})", inline=False)
+
+        version_fn = lambda: self.store.version(guild.id)
+        source = get_page_source(self.page_sources, guild.id, version_fn(), lambda: PageSource(
+            "Reaction Roles", "Here are the configured reaction roles:", discord.Color.blue(),
+            lambda: self.store.guild_entries(guild.id), render, sort_key=lambda entry: (entry[1], entry[2])
+        ))
+        await Paginator.start(ctx, source, version_fn)
+
+async def setup(bot):
+    """
+    Adds the ReactionRoles cog to the bot.
+    """
+    await bot.add_cog(ReactionRoles(bot))
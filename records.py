@@ -0,0 +1,47 @@
+# cogs/records.py
+import datetime
+from dataclasses import dataclass
+
+# Compact record types for per-entry cog state. Slotted dataclasses have no per-instance __dict__,
+# so each entry costs a fixed handful of pointers instead of a hash table (roughly 48-72 bytes vs 184+).
+
+@dataclass(slots=True, frozen=True)
+class TriggerRecord:
+    """
+    One autoresponder or custom command. Frozen (and so hashable), because TriggerStore shares identical
+    records between guilds; build a new one with `to_dict()` + `from_dict()` to change a field.
+    """
+    type: str
+    content: str
+    match_type: str = None # Autoresponders only: "exact" or "contains"
+    title: str = None
+    color: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["type"], data["content"], data.get("match_type"), data.get("title"), data.get("color"))
+
+    def to_dict(self):
+        """Returns the record as stored in SQLite and exported, without unset fields."""
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+@dataclass(slots=True)
+class AfkEntry:
+    reason: str
+    since: datetime.datetime
+
+@dataclass(slots=True)
+class VoiceRoleConfig:
+    role_id: int
+    enabled: bool = False
+
+@dataclass(slots=True)
+class Announcement:
+    """One scheduled announcement. `interval` is in seconds, 0 for a one-off; `next_run` is a unix timestamp."""
+    id: int
+    guild_id: int
+    channel_id: int
+    next_run: float
+    interval: int
+    message: TriggerRecord
+    author_id: int
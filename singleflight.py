@@ -0,0 +1,47 @@
+# cogs/singleflight.py
+import asyncio
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+    The first caller for a key starts the work; everyone who arrives while it is running awaits
+    the same task and gets the same result (or exception). Once it finishes the key is free again,
+    so callers should re-check for an existing result (e.g. the role now exists) before calling `do`.
+
+    The work runs as its own task, so a caller being cancelled (e.g. the command timing out)
+    doesn't cancel it for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self.calls = {} # {key: asyncio.Task}
+
+    def running(self, key):
+        return key in self.calls
+
+    async def do(self, key, factory):
+        """
+        Runs `factory()` (a coroutine function) once for `key` and returns its result to every concurrent caller.
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            task.exception() # Mark it retrieved; waiters (if any) get it re-raised through the shield
+
+def get_single_flight(bot):
+    """
+    Returns the bot-wide SingleFlight used for expensive per-guild bootstrap work, creating it on first use.
+    Keys should start with the guild ID, e.g. (guild.id, "muted_role_id").
+    """
+    flights = getattr(bot, "single_flight", None)
+    if flights is None:
+        flights = SingleFlight()
+        bot.single_flight = flights
+    return flights
@@ -0,0 +1,98 @@
+# cogs/snapshot.py
+import os
+import pickle
+import struct
+import time
+
+from cogs.storage import DB_FILENAME, data_path, get_db
+
+# Snapshot file layout: MAGIC, a fixed header, then one pickle of {cog_name: section}.
+# Bump SNAPSHOT_VERSION whenever a cog changes the shape of what it snapshots; old files are then ignored.
+MAGIC = b"XTRMSNAP"
+SNAPSHOT_VERSION = 2 # 2: slotted record types (cogs.records) instead of dicts
+HEADER = struct.Struct("<Hdqq") # version, created (unix time), db mtime_ns, db size
+SNAPSHOT_FILENAME = "snapshot.bin"
+MAX_SNAPSHOT_AGE = 24 * 3600 # Seconds; older in-memory state (AFK reasons, mutes) is not worth restoring
+
+def _db_stamp():
+    """Returns (mtime_ns, size) of the database file, or (0, 0) if it doesn't exist yet."""
+    try:
+        stat = os.stat(data_path(DB_FILENAME))
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+def write_snapshot(bot):
+    """
+    Writes the state of every loaded cog that defines `snapshot_state()` to the snapshot file.
+    A section is {"memory": ...} for state that only lives in memory and/or {"db": ...} for in-memory
+    copies of database tables, which are only trusted on restore if the database hasn't changed since.
+    Returns the number of sections written.
+    """
+    sections = {}
+    for name, cog in bot.cogs.items():
+        snapshot_state = getattr(cog, "snapshot_state", None)
+        if snapshot_state is None:
+            continue
+        try:
+            sections[name] = snapshot_state()
+        except Exception as e:
+            print(f"Failed to snapshot {name}: {e}")
+
+    # Fold the WAL into the main file first, so its mtime/size identify exactly what the snapshot saw
+    db = get_db()
+    db.commit()
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    mtime_ns, size = _db_stamp()
+
+    path = data_path(SNAPSHOT_FILENAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(SNAPSHOT_VERSION, time.time(), mtime_ns, size))
+        pickle.dump(sections, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return len(sections)
+
+def load_snapshot():
+    """
+    Reads and deletes the snapshot file. Returns {cog_name: section}, or {} if there is no usable snapshot.
+    Must run before anything opens the database, since opening it can touch the file.
+    "db" parts are dropped (set to None) when the database changed after the snapshot was taken.
+    The file is deleted so a crash later on never restores stale state on the next start.
+    """
+    path = data_path(SNAPSHOT_FILENAME)
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return {}
+            version, created, mtime_ns, size = HEADER.unpack(f.read(HEADER.size))
+            if version != SNAPSHOT_VERSION or time.time() - created > MAX_SNAPSHOT_AGE:
+                return {}
+            sections = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, struct.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        print(f"Ignoring unreadable snapshot: {e}")
+        return {}
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if (mtime_ns, size) != _db_stamp():
+        print("Database changed since the snapshot was taken; reloading stored data from the database.")
+        for section in sections.values():
+            section["db"] = None
+    return sections
+
+def restore_snapshot(bot, name):
+    """
+    Returns (and forgets) the snapshot section for cog `name`, or {} if there isn't one.
+    Cogs call this in __init__: `section.get("memory")` and `section.get("db")` may each be None.
+    """
+    sections = getattr(bot, "snapshot_sections", None)
+    if not sections:
+        return {}
+    return sections.pop(name, None) or {}
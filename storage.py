@@ -0,0 +1,104 @@
+# cogs/storage.py
+import json
+import os
+import sqlite3
+
+# Local data directory for anything the bot needs to keep across restarts.
+# Override with the XTRM_DATA_DIR environment variable.
+DATA_DIR = os.getenv("XTRM_DATA_DIR", "data")
+
+def data_path(*parts):
+    """
+    Returns a path inside the data directory, creating parent directories as needed.
+    Example: data_path("cleanup_jobs", "1234.json")
+    """
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+DB_FILENAME = "xtrm.db"
+_db = None
+
+def get_db():
+    """
+    Returns the bot's shared SQLite connection, opening it on first use.
+    WAL mode keeps small writes cheap and lets readers run alongside the writer.
+    """
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(data_path(DB_FILENAME))
+        _db.row_factory = sqlite3.Row
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+    return _db
+
+class GuildSettings:
+    """
+    Per-guild key/value settings stored as JSON in SQLite.
+    Everything is loaded into memory once, so reads on hot paths are a dict lookup; writes go straight through.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS guild_settings ("
+            "guild_id INTEGER NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (guild_id, key)) WITHOUT ROWID"
+        )
+        self.cache = {(row["guild_id"], row["key"]): json.loads(row["value"])
+                      for row in self.db.execute("SELECT guild_id, key, value FROM guild_settings")}
+
+    def get(self, guild_id, key, default=None):
+        return self.cache.get((guild_id, key), default)
+
+    def set(self, guild_id, key, value):
+        """Stores a setting. Setting None removes it."""
+        if value is None:
+            self.cache.pop((guild_id, key), None)
+            self.db.execute("DELETE FROM guild_settings WHERE guild_id = ? AND key = ?", (guild_id, key))
+        else:
+            self.cache[(guild_id, key)] = value
+            self.db.execute(
+                "INSERT INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, key) DO UPDATE SET value = excluded.value",
+                (guild_id, key, json.dumps(value))
+            )
+        self.db.commit()
+
+    def guilds_with(self, key):
+        """Returns {guild_id: value} for every guild that has `key` set."""
+        return {guild_id: value for (guild_id, setting_key), value in self.cache.items() if setting_key == key}
+
+_settings = None
+
+def get_settings():
+    """
+    Returns the shared GuildSettings store, loading it on first use.
+    """
+    global _settings
+    if _settings is None:
+        _settings = GuildSettings(get_db())
+    return _settings
+
+def write_json_atomic(path, data):
+    """
+    Writes JSON to a temporary file and renames it over `path`, so a crash mid-write
+    never leaves a half-written file behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_json(path, default=None):
+    """
+    Reads a JSON file, returning `default` if it doesn't exist or can't be parsed.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"Failed to read {path}: {e}")
+        return default
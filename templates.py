@@ -0,0 +1,62 @@
+# cogs/templates.py
+import discord
+import re
+
+from cogs.name_index import get_name_index
+
+# Message templates shared by custom commands, autoresponders and announcements.
+# A template is a TriggerRecord: type (text, embed or image), content, and optional embed title/color.
+TEMPLATE_TYPES = ("text", "embed", "image")
+CHANNEL_PLACEHOLDER_RE = re.compile(r"\{channel:([^}]+)\}")
+TITLE_OPTION_RE = re.compile(r'--title\s+"([^"]+)"')
+COLOR_OPTION_RE = re.compile(r"--color\s+#([0-9a-fA-F]{6})")
+
+def fill_placeholders(bot, text, guild, user=None):
+    """
+    Replaces {user}, {server} and {channel:name} in a template's text.
+    {user} is left as-is when there is no user (e.g. scheduled announcements).
+    """
+    if user is not None:
+        text = text.replace("{user}", user.mention)
+    text = text.replace("{server}", guild.name if guild else "Unknown Server")
+    if "{channel:" in text:
+        def channel_mention(match):
+            channel = get_name_index(bot).channel(guild, match.group(1)) if guild else None
+            return channel.mention if channel else f"#{match.group(1)} (not found)"
+        text = CHANNEL_PLACEHOLDER_RE.sub(channel_mention, text)
+    return text
+
+def render_template(bot, record, guild, user=None):
+    """
+    Returns the keyword arguments for `channel.send(...)` that post a template, e.g. {"embed": ...}.
+    Embeds without a stored title take one from a `--title "..."` left in the content (older custom commands).
+    """
+    content = fill_placeholders(bot, record.content, guild, user)
+    if record.type != "embed":
+        return {"content": content} # Text, or a direct image URL that Discord previews
+    embed = discord.Embed(description=content, color=record.color if record.color is not None else discord.Color.blue())
+    if record.title:
+        embed.title = record.title
+    elif "--title " in content:
+        title_start = content.find("--title ") + len("--title ")
+        title_end = content.find(" --", title_start)
+        if title_end == -1:
+            title_end = len(content)
+        embed.title = content[title_start:title_end].strip().strip('"')
+    return {"embed": embed}
+
+def parse_template_options(text):
+    """
+    Splits `--title "..."` and `--color #HEX` off a template's content.
+    Returns (content, title, color) with title/color None when not given.
+    """
+    title = color = None
+    title_match = TITLE_OPTION_RE.search(text)
+    if title_match:
+        title = title_match.group(1)
+        text = text.replace(title_match.group(0), "")
+    color_match = COLOR_OPTION_RE.search(text)
+    if color_match:
+        color = int(color_match.group(1), 16)
+        text = text.replace(color_match.group(0), "")
+    return text.strip(), title, color
@@ -0,0 +1,213 @@
+# cogs/trigger_io.py
+import aiohttp
+import codecs
+import gzip
+import json
+import os
+import tempfile
+import zlib
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+MAX_RECORD_CHARS = 16 * 1024 # A single record larger than this is treated as malformed
+MAX_IMPORT_RECORDS = 50000
+MAX_REPORTED_ERRORS = 10
+RESPONSE_TYPES = ("text", "embed", "image")
+
+class ImportFormatError(ValueError):
+    pass
+
+async def iter_attachment_chunks(attachment):
+    """
+    Streams an attachment's text in chunks without downloading it into memory first.
+    Gzipped uploads (.gz) are decompressed on the fly.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    decompressor = None
+    if attachment.filename.endswith(".gz"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                if decompressor:
+                    chunk = decompressor.decompress(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+async def iter_json_records(chunks):
+    """
+    Incrementally parses either NDJSON (one object per line) or a JSON array of objects from an async
+    iterator of text chunks, yielding one record at a time. Only the unparsed tail of the stream is
+    ever buffered, so the size of the pack doesn't matter.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = None # Unknown until the first non-whitespace character
+    finished = False
+
+    def skip_separators(text, index):
+        while index < len(text) and (text[index].isspace() or (in_array and text[index] == ",")):
+            index += 1
+        return index
+
+    chunk_iter = chunks.__aiter__()
+
+    while True:
+        position = skip_separators(buffer, position)
+        if in_array is None and position < len(buffer):
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        if in_array and position < len(buffer) and buffer[position] == "]":
+            finished = True
+            position += 1
+            break
+        if position < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                record = None
+            if record is not None:
+                if not isinstance(record, dict):
+                    raise ImportFormatError("Every entry must be a JSON object.")
+                yield record
+                position = end
+                continue
+            if len(buffer) - position > MAX_RECORD_CHARS:
+                raise ImportFormatError(f"Malformed or oversized record near character {position}.")
+        # Need more data: drop what has been consumed and read the next chunk
+        buffer = buffer[position:]
+        position = 0
+        try:
+            chunk = await chunk_iter.__anext__()
+        except StopAsyncIteration:
+            break
+        buffer += chunk
+
+    rest = buffer[position:].strip()
+    if in_array and not finished:
+        raise ImportFormatError("JSON array is not closed.")
+    if rest:
+        raise ImportFormatError("Unexpected trailing data after the last record.")
+
+def validate_autoresponder(record):
+    """Returns (trigger, data) for a valid autoresponder record, or raises ValueError."""
+    trigger = record.get("trigger")
+    if not isinstance(trigger, str) or not trigger.strip() or len(trigger) > 200:
+        raise ValueError("`trigger` must be a non-empty string of at most 200 characters")
+    response_type = str(record.get("type", "text")).lower()
+    if response_type not in RESPONSE_TYPES:
+        raise ValueError("`type` must be text, embed or image")
+    content = record.get("content")
+    if not isinstance(content, str) or not content.strip() or len(content) > 2000:
+        raise ValueError("`content` must be a non-empty string of at most 2000 characters")
+    match_type = str(record.get("match_type", "contains")).lower()
+    if match_type not in ("exact", "contains"):
+        raise ValueError("`match_type` must be exact or contains")
+    title = record.get("title")
+    if title is not None and (not isinstance(title, str) or len(title) > 256):
+        raise ValueError("`title` must be a string of at most 256 characters")
+    color = record.get("color")
+    if color is not None and (not isinstance(color, int) or not 0 <= color <= 0xFFFFFF):
+        raise ValueError("`color` must be an integer between 0 and 0xFFFFFF")
+    return trigger.lower(), {"type": response_type, "content": content.strip(), "match_type": match_type, "title": title, "color": color}
+
+def validate_custom_command(record):
+    """Returns (name, data) for a valid custom command record, or raises ValueError."""
+    name = record.get("name")
+    if not isinstance(name, str) or not name or " " in name or len(name) > 50:
+        raise ValueError("`name` must be a single word of at most 50 characters")
+    cmd_type = str(record.get("type", "text")).lower()
+    if cmd_type not in RESPONSE_TYPES:
+        raise ValueError("`type` must be text, embed or image")
+    content = record.get("content")
+    if not isinstance(content, str) or not content.strip() or len(content) > 2000:
+        raise ValueError("`content` must be a non-empty string of at most 2000 characters")
+    return name.lower(), {"type": cmd_type, "content": content}
+
+class ImportReport:
+    __slots__ = ("valid", "written", "skipped", "errors", "error_samples")
+
+    def __init__(self):
+        self.valid = 0
+        self.written = 0
+        self.skipped = 0 # Already existed and --replace wasn't given
+        self.errors = 0
+        self.error_samples = [] # [(record number, message)]
+
+async def import_records(store, guild_id, attachment, validate, dry_run=False, replace=False):
+    """
+    Streams an attachment into a TriggerStore. Records are validated as they arrive and buffered, then
+    written in one go through a BulkWriter (batched inserts, one transaction, one matcher rebuild).
+    The write never spans an await, so other cogs committing on the shared connection mid-download
+    can't commit half an import. With `dry_run` nothing is written, so the store's version (and every
+    cache keyed on it) is left alone. A format error part-way through keeps the valid records before it.
+    """
+    report = ImportReport()
+    number = 0
+    pending = {} # {name: data}, at most MAX_IMPORT_RECORDS entries
+    try:
+        async for record in iter_json_records(iter_attachment_chunks(attachment)):
+            number += 1
+            if number > MAX_IMPORT_RECORDS:
+                raise ImportFormatError(f"Imports are limited to {MAX_IMPORT_RECORDS} records.")
+            try:
+                name, data = validate(record)
+            except ValueError as e:
+                report.errors += 1
+                if len(report.error_samples) < MAX_REPORTED_ERRORS:
+                    report.error_samples.append((number, str(e)))
+                continue
+            if not replace and (name in pending or store.get(guild_id, name) is not None):
+                report.skipped += 1
+                continue
+            report.valid += 1
+            pending[name] = data
+    finally:
+        if pending and not dry_run:
+            report.written = store.bulk_set(guild_id, pending.items())
+    return report
+
+def export_records(store, guild_id, key_name, size_limit):
+    """
+    Writes a guild's triggers to a temporary NDJSON file, one row at a time, gzipping it if it would exceed
+    `size_limit`. Returns (path, filename, count); the caller deletes the file after sending it.
+    """
+    handle, path = tempfile.mkstemp(suffix=".ndjson")
+    count = 0
+    with os.fdopen(handle, "w", encoding="utf-8") as f:
+        for name, data in store.iter_rows(guild_id):
+            f.write(json.dumps({key_name: name, **data}) + "\n")
+            count += 1
+    filename = f"{store.kind}s-{guild_id}.ndjson"
+    if os.path.getsize(path) > size_limit:
+        gz_path = f"{path}.gz"
+        with open(path, "rb") as source, gzip.open(gz_path, "wb") as target:
+            while True:
+                block = source.read(DOWNLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                target.write(block)
+        os.remove(path)
+        path, filename = gz_path, f"{filename}.gz"
+    return path, filename, count
+
+def format_import_report(report, kind, dry_run):
+    """Builds the chat reply summarizing an import or dry run."""
+    if dry_run:
+        lines = [f"🔎 Dry run: {report.valid} {kind}s would be imported, {report.skipped} already exist, {report.errors} invalid."]
+    else:
+        lines = [f"✅ Imported {report.written} {kind}s ({report.skipped} already existed, {report.errors} invalid)."]
+    if report.skipped and not dry_run:
+        lines.append("Use `--replace` to overwrite existing entries.")
+    for number, message in report.error_samples:
+        lines.append(f"• Record {number}: {message}")
+    if report.errors > len(report.error_samples):
+        lines.append(f"• ...and {report.errors - len(report.error_samples)} more invalid records.")
+    return "\n".join(lines)[:2000]
@@ -0,0 +1,163 @@
+# cogs/trigger_store.py
+import json
+
+from cogs.records import TriggerRecord
+
+EMPTY = {} # Shared read-only result for guilds with no triggers
+
+class TriggerStore:
+    """
+    Guild-keyed store of trigger definitions (autoresponders or custom commands), persisted in SQLite.
+    Lookups only ever touch the current guild's triggers, so adding guilds doesn't slow down matching.
+
+    Each row keeps a creation sequence number, so triggers reload in the order they were created
+    (matchers rely on it: the trigger created first wins) and replacing a trigger keeps its place.
+
+    Records are immutable TriggerRecords, interned: guilds with identical definitions (e.g. everyone
+    importing the same starter pack) share one record object, so memory stays flat as guilds are added.
+    `set` accepts a TriggerRecord or a plain dict of its fields.
+    """
+
+    def __init__(self, db, kind, snapshot=None):
+        self.db = db
+        self.kind = kind # "autoresponder" or "customcmd"
+        self.guilds = {} # {guild_id: {name: record}}
+        self.interned = {} # {record: record}, records are hashable so they are their own key
+        self.refcounts = {} # {record: number of (guild, name) entries using the record}
+        self.versions = {} # {guild_id: int}, bumped on every change to that guild's triggers
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS triggers ("
+            "kind TEXT NOT NULL, guild_id INTEGER NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, seq INTEGER NOT NULL, "
+            "PRIMARY KEY (kind, guild_id, name)) WITHOUT ROWID"
+        )
+        self.next_seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM triggers").fetchone()[0]
+        if snapshot is not None:
+            # Warm restart: the pickle keeps interned records shared, so there's nothing to rebuild
+            self.guilds, self.interned, self.refcounts, self.versions = snapshot
+            return
+        for row in self.db.execute("SELECT guild_id, name, data FROM triggers WHERE kind = ? ORDER BY seq", (kind,)):
+            self._put(row["guild_id"], row["name"], json.loads(row["data"]))
+
+    def _intern(self, data):
+        record = data if isinstance(data, TriggerRecord) else TriggerRecord.from_dict(data)
+        record = self.interned.setdefault(record, record)
+        self.refcounts[record] = self.refcounts.get(record, 0) + 1
+        return record
+
+    def _release(self, record):
+        self.refcounts[record] -= 1
+        if not self.refcounts[record]:
+            del self.refcounts[record]
+            del self.interned[record]
+
+    def _put(self, guild_id, name, data, bump=True):
+        """Stores a trigger in memory and returns its interned record."""
+        triggers = self.guilds.setdefault(guild_id, {})
+        old = triggers.get(name)
+        record = triggers[name] = self._intern(data)
+        if old is not None:
+            self._release(old)
+        if bump:
+            self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+        return record
+
+    def guild(self, guild_id):
+        """Returns the guild's {name: TriggerRecord} mapping. Treat it as read-only."""
+        return self.guilds.get(guild_id, EMPTY)
+
+    def get(self, guild_id, name):
+        return self.guilds.get(guild_id, EMPTY).get(name)
+
+    def version(self, guild_id):
+        return self.versions.get(guild_id, 0)
+
+    def take_seq(self):
+        """Returns the next creation sequence number. Only the order within a kind and guild matters, so gaps are fine."""
+        seq = self.next_seq
+        self.next_seq += 1
+        return seq
+
+    def set(self, guild_id, name, data):
+        """Creates or replaces a trigger and persists it. A replaced trigger keeps its creation order."""
+        record = self._put(guild_id, name, data)
+        self.db.execute(
+            "INSERT INTO triggers (kind, guild_id, name, data, seq) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (kind, guild_id, name) DO UPDATE SET data = excluded.data",
+            (self.kind, guild_id, name, json.dumps(record.to_dict()), self.take_seq())
+        )
+        self.db.commit()
+
+    def snapshot(self):
+        """Returns the in-memory state for a warm-restart snapshot (see `cogs.snapshot`)."""
+        return (self.guilds, self.interned, self.refcounts, self.versions)
+
+    def bulk_writer(self, guild_id):
+        """
+        Returns a BulkWriter for adding many triggers to a guild. Use it as a context manager.
+        """
+        return BulkWriter(self, guild_id)
+
+    def bulk_set(self, guild_id, items):
+        """Creates or replaces triggers from an iterable of (name, data) pairs. Returns the number written."""
+        with self.bulk_writer(guild_id) as writer:
+            for name, data in items:
+                writer.add(name, data)
+        return writer.written
+
+    def iter_rows(self, guild_id):
+        """Yields (name, data dict) for a guild straight from SQLite, one row at a time, in creation order."""
+        for row in self.db.execute("SELECT name, data FROM triggers WHERE kind = ? AND guild_id = ? ORDER BY seq", (self.kind, guild_id)):
+            yield row["name"], json.loads(row["data"])
+
+    def delete(self, guild_id, name):
+        """Deletes a trigger. Returns False if it didn't exist."""
+        triggers = self.guilds.get(guild_id)
+        if not triggers or name not in triggers:
+            return False
+        self._release(triggers.pop(name))
+        if not triggers:
+            del self.guilds[guild_id]
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+        self.db.execute("DELETE FROM triggers WHERE kind = ? AND guild_id = ? AND name = ?", (self.kind, guild_id, name))
+        self.db.commit()
+        return True
+
+class BulkWriter:
+    """
+    Adds many triggers to one guild in a single transaction, writing rows in batches as they arrive.
+    The connection is shared with every other cog, so don't keep a writer open across an await.
+    The guild's version is only bumped when the writer closes, so messages during an import keep using
+    the previous compiled matcher and the guild is recompiled once at the end rather than once per row.
+    """
+    SQL = ("INSERT INTO triggers (kind, guild_id, name, data, seq) VALUES (?, ?, ?, ?, ?) "
+           "ON CONFLICT (kind, guild_id, name) DO UPDATE SET data = excluded.data")
+
+    def __init__(self, store, guild_id, batch_size=1000):
+        self.store = store
+        self.guild_id = guild_id
+        self.batch_size = batch_size
+        self.batch = []
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def add(self, name, data):
+        record = self.store._put(self.guild_id, name, data, bump=False)
+        self.batch.append((self.store.kind, self.guild_id, name, json.dumps(record.to_dict()), self.store.take_seq()))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.store.db.executemany(self.SQL, self.batch)
+            self.written += len(self.batch)
+            self.batch.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        # Rows added before an error are kept; the caller reports what went wrong
+        self.flush()
+        self.store.db.commit()
+        store = self.store
+        store.versions[self.guild_id] = store.versions.get(self.guild_id, 0) + 1
+        return False
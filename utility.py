@@ -3,14 +3,46 @@ import discord
 from discord.ext import commands
 import asyncio # For AFK auto-response management
 import datetime
+import time
+
+from cogs.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from cogs.cog_state import CogState, get_cog_state
+from cogs.event_scheduler import PRIORITY_LOW, get_event_scheduler
+from cogs.maintenance import MaintenanceModeError, get_maintenance_guilds
+from cogs.paginator import PageSource, Paginator
+from cogs.prefixes import MAX_GUILD_PREFIXES, MAX_PREFIX_LENGTH, get_prefix_resolver
+from cogs.records import AfkEntry, VoiceRoleConfig
+from cogs.storage import get_settings
+from cogs.voice_ledger import get_voice_ledger
+
+VOICETOP_LIMIT = 50 # Members ranked by `voicetop`
+
+def format_voice_time(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes = remainder // 60
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
 
 class Utility(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # self.qualified_name is automatically set by discord.py
-        self.afk_users = {} # In-memory storage for AFK users: {user_id: {"reason": str, "time": datetime.datetime}}
-        self.maintenance_mode = False # In-memory flag for maintenance mode
-        self.voice_role_config = {} # {guild_id: {"role_id": int, "enabled": bool}} - For persistence, use Firestore
+        # Data lives in the bot-level registry so it survives reloads (and in the snapshot across restarts)
+        self.state = get_cog_state(bot, "Utility", self.new_state)
+        self.afk_users = self.state.afk_users # In-memory storage for AFK users: {user_id: AfkEntry}
+        self.maintenance_guilds = get_maintenance_guilds(bot) # Guild IDs in maintenance mode (shared with other cogs)
+        self.scheduler = get_event_scheduler(bot)
+        self.voice_role_breaker = get_circuit_breaker(bot, "voice_role") # Non-critical: skipped while Discord is failing
+        self.voice_role_config = self.state.voice_role_config # {guild_id: VoiceRoleConfig} - For persistence, use Firestore
+        self.voice_ledger = get_voice_ledger(bot) # Voice sessions and activity totals (bot-wide, survives reloads)
+
+    @staticmethod
+    def new_state(snapshot):
+        memory = snapshot.get("memory") or {} # Warm restart state, if any
+        return CogState(afk_users=memory.get("afk_users", {}), voice_role_config=memory.get("voice_role_config", {}))
+
+    def snapshot_state(self):
+        """State saved on shutdown for a warm restart."""
+        return {"memory": {"afk_users": self.afk_users, "voice_role_config": self.voice_role_config}}
 
     @commands.command(name="ping", help="Checks the bot's latency.")
     async def ping(self, ctx):
@@ -53,7 +85,7 @@ class Utility(commands.Cog):
         if ctx.author.id in self.afk_users:
             return await ctx.send("You are already AFK. Send a message to remove your AFK status.")
 
-        self.afk_users[ctx.author.id] = {"reason": reason, "time": datetime.datetime.utcnow()}
+        self.afk_users[ctx.author.id] = AfkEntry(reason, datetime.datetime.utcnow())
         await ctx.send(f"✅ {ctx.author.display_name} is now AFK: {reason}")
         # In a real bot, save this to Firestore for persistence
 
@@ -64,18 +96,31 @@ class Utility(commands.Cog):
         """
         if message.author.bot:
             return
+        if message.guild and message.guild.id in self.maintenance_guilds:
+            return # AFK handling is paused during maintenance
 
         # Check if the author is AFK and remove status
-        if message.author.id in self.afk_users:
-            del self.afk_users[message.author.id]
+        returning = self.afk_users.pop(message.author.id, None) is not None
+        # In a real bot, remove from Firestore here
+        if not returning and not any(member.id in self.afk_users for member in message.mentions):
+            return
+        if message.guild is None:
+            return await self.send_afk_notices(message, returning)
+        # The notices are low priority: under load they're shed before moderation work
+        self.scheduler.submit(message.guild.id, PRIORITY_LOW, self.send_afk_notices, message, returning)
+
+    async def send_afk_notices(self, message, returning):
+        """
+        Welcomes back a returning AFK user and tells the channel about mentioned AFK users. Runs on the event scheduler.
+        """
+        if returning:
             await message.channel.send(f"👋 Welcome back, {message.author.display_name}! Your AFK status has been removed.")
-            # In a real bot, remove from Firestore here
 
         # Check for mentions of AFK users
         for member in message.mentions:
             if member.id in self.afk_users:
                 afk_info = self.afk_users[member.id]
-                afk_time = (datetime.datetime.utcnow() - afk_info["time"]).total_seconds()
+                afk_time = (datetime.datetime.utcnow() - afk_info.since).total_seconds()
                 days, remainder = divmod(afk_time, 86400)
                 hours, remainder = divmod(remainder, 3600)
                 minutes, seconds = divmod(remainder, 60)
@@ -86,25 +131,106 @@ class Utility(commands.Cog):
                 if minutes > 0: time_ago.append(f"{int(minutes)}m")
                 if not time_ago: time_ago.append(f"{int(seconds)}s")
 
-                await message.channel.send(f"😴 {member.display_name} is AFK since {' '.join(time_ago)} ago: {afk_info['reason']}")
+                await message.channel.send(f"😴 {member.display_name} is AFK since {' '.join(time_ago)} ago: {afk_info.reason}")
+
+    async def bot_check(self, ctx):
+        """
+        Global check run before argument conversion for every command: while a guild is in maintenance mode,
+        only administrators can use commands there.
+        """
+        if ctx.guild is None or ctx.guild.id not in self.maintenance_guilds:
+            return True
+        if ctx.author.guild_permissions.administrator:
+            return True
+        raise MaintenanceModeError("This server is in maintenance mode.")
 
     @commands.command(name="maintenance", help="Toggles bot maintenance mode.")
     @commands.has_permissions(administrator=True)
     async def maintenance_mode_toggle(self, ctx):
         """
-        Toggles the bot's maintenance mode.
-        When enabled, only administrators can use bot commands.
+        Toggles the bot's maintenance mode for this server.
+        When enabled, only administrators can use bot commands, and autoresponders, custom commands,
+        reply autoroles and AFK replies are paused.
         Usage: XTRM maintenance
         """
-        self.maintenance_mode = not self.maintenance_mode
-        status = "enabled" if self.maintenance_mode else "disabled"
-        await ctx.send(f"⚙️ Bot maintenance mode has been **{status}**.")
-        # In a real bot, save this status to Firestore
+        if ctx.guild.id in self.maintenance_guilds:
+            self.maintenance_guilds.discard(ctx.guild.id)
+            status = "disabled"
+        else:
+            self.maintenance_guilds.add(ctx.guild.id)
+            status = "enabled"
+        get_settings().set(ctx.guild.id, "maintenance", True if status == "enabled" else None)
+        await ctx.send(f"⚙️ Bot maintenance mode has been **{status}** for this server.")
+
+    @commands.group(name="prefix", invoke_without_command=True, help="Manages this server's extra command prefixes.")
+    @commands.has_permissions(manage_guild=True)
+    async def prefix(self, ctx):
+        """
+        Base command for managing extra command prefixes. The default prefixes always work.
+        Usage: XTRM prefix [subcommand]
+        Example: XTRM prefix add "! "
+        """
+        if ctx.invoked_subcommand is None:
+            await ctx.send("Please specify a Prefix subcommand (e.g., `add`, `remove`, `list`). Use `XTRM advhelp Utility` for more info.")
+
+    @prefix.command(name="add", help="Adds a command prefix for this server.")
+    @commands.has_permissions(manage_guild=True)
+    async def prefix_add(self, ctx, *, new_prefix: str):
+        """
+        Adds a command prefix. Prefixes are case-insensitive; quote the prefix to keep a trailing space.
+        Usage: XTRM prefix add <prefix>
+        Example: XTRM prefix add "! "
+        """
+        new_prefix = new_prefix.strip('"')
+        if not new_prefix.strip() or len(new_prefix) > MAX_PREFIX_LENGTH:
+            return await ctx.send(f"❌ Prefixes must be between 1 and {MAX_PREFIX_LENGTH} characters.")
+        resolver = get_prefix_resolver(self.bot)
+        prefixes = resolver.guild_prefixes(ctx.guild.id)
+        folded = new_prefix.casefold()
+        if any(existing.casefold() == folded for existing in prefixes + list(resolver.defaults)):
+            return await ctx.send(f"❌ `{new_prefix}` is already a prefix here.")
+        if len(prefixes) >= MAX_GUILD_PREFIXES:
+            return await ctx.send(f"❌ This server already has the maximum of {MAX_GUILD_PREFIXES} extra prefixes.")
+        resolver.set_guild_prefixes(ctx.guild.id, prefixes + [new_prefix])
+        await ctx.send(f"✅ Added prefix `{new_prefix}`. Example: `{new_prefix}ping`")
+
+    @prefix.command(name="remove", help="Removes a command prefix from this server.")
+    @commands.has_permissions(manage_guild=True)
+    async def prefix_remove(self, ctx, *, old_prefix: str):
+        """
+        Removes a prefix added with `prefix add`.
+        Usage: XTRM prefix remove <prefix>
+        Example: XTRM prefix remove "! "
+        """
+        old_prefix = old_prefix.strip('"')
+        resolver = get_prefix_resolver(self.bot)
+        prefixes = resolver.guild_prefixes(ctx.guild.id)
+        folded = old_prefix.casefold()
+        remaining = [existing for existing in prefixes if existing.casefold() != folded]
+        if len(remaining) == len(prefixes):
+            if any(default.casefold() == folded for default in resolver.defaults):
+                return await ctx.send("❌ The default prefixes can't be removed.")
+            return await ctx.send(f"❌ `{old_prefix}` is not a prefix here.")
+        resolver.set_guild_prefixes(ctx.guild.id, remaining)
+        await ctx.send(f"✅ Removed prefix `{old_prefix}`.")
+
+    @prefix.command(name="list", help="Lists the command prefixes for this server.")
+    async def prefix_list(self, ctx):
+        """
+        Lists the default prefixes and any extra prefixes added for this server.
+        Usage: XTRM prefix list
+        """
+        resolver = get_prefix_resolver(self.bot)
+        embed = discord.Embed(title="Command Prefixes", color=discord.Color.blue())
+        embed.add_field(name="Default", value=", ".join(f"`{prefix}`" for prefix in resolver.defaults), inline=False)
+        extra = resolver.guild_prefixes(ctx.guild.id)
+        embed.add_field(name="This server", value=", ".join(f"`{prefix}`" for prefix in extra) if extra else "None", inline=False)
+        await ctx.send(embed=embed)
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
         """
-        Global error handler for commands, used to enforce maintenance mode.
+        Global error handler for commands, used to report maintenance mode.
         """
         # Only handle if the error is not already handled by a more specific handler
         if isinstance(error, commands.CommandInvokeError) and isinstance(error.original, discord.Forbidden):
@@ -112,11 +238,8 @@ class Utility(commands.Cog):
             await ctx.send(f"❌ I do not have the necessary permissions to perform this action. Please check my role permissions. Error: `{error.original}`")
             return
         
-        if self.maintenance_mode and not ctx.author.guild_permissions.administrator:
-            # Check if the error is specifically a CheckFailure (e.g., from has_permissions)
-            # to avoid double error messages if the command already has a check.
-            if isinstance(error, commands.CheckFailure): 
-                return
+        if isinstance(error, MaintenanceModeError):
+            # Raised by bot_check before the command's arguments were even parsed
             return await ctx.send("❌ The bot is currently in maintenance mode. Only administrators can use commands.")
         
         # Pass other errors to the default error handler or specific handlers
@@ -157,7 +280,7 @@ class Utility(commands.Cog):
         if role >= ctx.guild.me.top_role:
             return await ctx.send("❌ I cannot manage roles that are equal to or higher than my top role.")
 
-        self.voice_role_config[ctx.guild.id] = {"role_id": role.id, "enabled": False}
+        self.voice_role_config[ctx.guild.id] = VoiceRoleConfig(role.id)
         # In a real bot, save this config to Firestore
         await ctx.send(f"✅ Voice role set to `{role.name}`. Use `XTRM voicerole enable` to activate it.")
 
@@ -168,10 +291,10 @@ class Utility(commands.Cog):
         Enables the automatic assignment/removal of the voice role.
         Usage: XTRM voicerole enable
         """
-        if ctx.guild.id not in self.voice_role_config or not self.voice_role_config[ctx.guild.id]["role_id"]:
+        if ctx.guild.id not in self.voice_role_config or not self.voice_role_config[ctx.guild.id].role_id:
             return await ctx.send("❌ Voice role is not set up. Use `XTRM voicerole setup <role>` first.")
         
-        self.voice_role_config[ctx.guild.id]["enabled"] = True
+        self.voice_role_config[ctx.guild.id].enabled = True
         # In a real bot, update this config in Firestore
         await ctx.send("✅ Automatic voice role feature enabled.")
 
@@ -185,7 +308,7 @@ class Utility(commands.Cog):
         if ctx.guild.id not in self.voice_role_config:
             return await ctx.send("❌ Voice role feature is not configured for this server.")
 
-        self.voice_role_config[ctx.guild.id]["enabled"] = False
+        self.voice_role_config[ctx.guild.id].enabled = False
         # In a real bot, update this config in Firestore
         await ctx.send("✅ Automatic voice role feature disabled.")
 
@@ -198,25 +321,35 @@ class Utility(commands.Cog):
         if member.bot:
             return
 
+        # Session ledger first: it tracks everyone, whether or not the voice role feature is on
+        self.voice_ledger.move(member.guild.id, member.id, self.tracked_channel_id(member.guild, before),
+                               self.tracked_channel_id(member.guild, after), time.time())
+
         guild_id = member.guild.id
-        if guild_id not in self.voice_role_config or not self.voice_role_config[guild_id]["enabled"]:
+        if guild_id not in self.voice_role_config or not self.voice_role_config[guild_id].enabled:
             return # Feature not enabled for this guild
 
-        role_id = self.voice_role_config[guild_id]["role_id"]
+        role_id = self.voice_role_config[guild_id].role_id
         voice_role = member.guild.get_role(role_id)
 
         if not voice_role:
             print(f"Voice role with ID {role_id} not found in guild {member.guild.name}. Disabling feature.")
-            self.voice_role_config[guild_id]["enabled"] = False # Auto-disable if role is missing
+            self.voice_role_config[guild_id].enabled = False # Auto-disable if role is missing
             # In a real bot, update this in Firestore
             return
 
+        if self.voice_role_breaker.is_open():
+            return # Role edits keep failing; skip instead of piling up calls. The role catches up on the next join/leave.
+
         # User joined a voice channel
         if before.channel is None and after.channel is not None:
             if voice_role not in member.roles:
                 try:
-                    await member.add_roles(voice_role, reason="Joined voice channel.")
+                    async with self.voice_role_breaker:
+                        await member.add_roles(voice_role, reason="Joined voice channel.")
                     print(f"Added '{voice_role.name}' to {member.display_name} for joining voice.")
+                except CircuitOpenError:
+                    pass # Another event is probing the circuit
                 except discord.Forbidden:
                     print(f"Bot lacks permissions to add role '{voice_role.name}' to {member.display_name}.")
                 except Exception as e:
@@ -226,13 +359,88 @@ class Utility(commands.Cog):
         elif before.channel is not None and after.channel is None:
             if voice_role in member.roles:
                 try:
-                    await member.remove_roles(voice_role, reason="Left voice channel.")
+                    async with self.voice_role_breaker:
+                        await member.remove_roles(voice_role, reason="Left voice channel.")
                     print(f"Removed '{voice_role.name}' from {member.display_name} for leaving voice.")
+                except CircuitOpenError:
+                    pass # Another event is probing the circuit
                 except discord.Forbidden:
                     print(f"Bot lacks permissions to remove role '{voice_role.name}' from {member.display_name}.")
                 except Exception as e:
                     print(f"Error removing voice role from {member.display_name}: {e}")
 
+    @staticmethod
+    def tracked_channel_id(guild, voice_state):
+        """Returns the channel ID a voice state counts towards, or None when not in voice (or in the AFK channel)."""
+        channel = voice_state.channel
+        if channel is None or channel == guild.afk_channel:
+            return None
+        return channel.id
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """
+        Reconciles the voice ledger with who is actually in voice: runs after startup and after any reconnect
+        that couldn't resume, since voice state changes during the gap were never delivered.
+        """
+        in_voice = {}
+        for guild in self.bot.guilds:
+            if guild.unavailable:
+                continue
+            members = in_voice[guild.id] = {}
+            for channel in guild.voice_channels + guild.stage_channels:
+                if channel == guild.afk_channel:
+                    continue
+                for member in channel.members:
+                    if not member.bot:
+                        members[member.id] = channel.id
+        closed, opened = self.voice_ledger.reconcile(in_voice, time.time())
+        if closed or opened:
+            print(f"Voice ledger reconciled: closed {closed} stale session(s), opened {opened}.")
+
+    @commands.Cog.listener()
+    async def on_disconnect(self):
+        self.voice_ledger.mark_blind(time.time())
+
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        self.voice_ledger.mark_resumed()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.voice_ledger.close_guild(guild.id, time.time())
+
+    @commands.command(name="voicetop", help="Shows the most active voice users.")
+    async def voicetop(self, ctx, period: str = "all"):
+        """
+        Shows this server's most active members in voice, all time or over the last N days.
+        Time in the AFK channel doesn't count; sessions still in progress do.
+        Usage: XTRM voicetop [all|<days>d]
+        Example: XTRM voicetop 7d
+        """
+        period = period.lower()
+        days = None
+        if period != "all":
+            if not period.endswith("d") or not period[:-1].isdigit() or not 1 <= int(period[:-1]) <= 365:
+                return await ctx.send("❌ Invalid period. Use `all` or a number of days like `7d` (up to `365d`).")
+            days = int(period[:-1])
+
+        ranking = self.voice_ledger.top(ctx.guild.id, VOICETOP_LIMIT, days)
+        if not ranking:
+            return await ctx.send("No voice activity recorded for this server yet.")
+        entries = [(rank, user_id, seconds) for rank, (user_id, seconds) in enumerate(ranking, 1)]
+
+        def render(embed, entry):
+            rank, user_id, seconds = entry
+            member = ctx.guild.get_member(user_id)
+            name = member.display_name if member else f"Unknown Member (ID: {user_id})"
+            embed.add_field(name=f"#{rank} {name}", value=format_voice_time(seconds), inline=False)
+
+        label = "All time" if days is None else f"Last {days} day(s)"
+        source = PageSource("🎙️ Voice Leaderboard", label, discord.Color.blue(), lambda: entries, render,
+                            sort_key=lambda entry: entry[0])
+        await Paginator.start(ctx, source)
+
 async def setup(bot):
     """
     Adds the Utility cog to the bot.
@@ -0,0 +1,285 @@
+# cogs/voice_ledger.py
+import asyncio
+import heapq
+import time
+
+from cogs.metrics import metrics
+from cogs.storage import get_db
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS voice_sessions (
+    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_voice_sessions_guild_user ON voice_sessions (guild_id, user_id, started_at);
+CREATE TABLE IF NOT EXISTS voice_totals (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS voice_daily (
+    guild_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (guild_id, day, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS voice_open (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS voice_meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+FLUSH_INTERVAL = 10.0 # Seconds between batched writes
+MAX_PENDING = 500 # Pending changes that trigger an early flush
+MAX_RECONCILE_GAP = 300 # Seconds; after a longer blind spot an ongoing session is split, since the member may have left and rejoined
+DAY = 86400
+
+def split_by_day(started_at, ended_at):
+    """Yields (day number, seconds) for the UTC days a session spans, so daily aggregates stay exact across midnight."""
+    while started_at < ended_at:
+        day = int(started_at // DAY)
+        day_end = min(ended_at, (day + 1) * DAY)
+        yield day, day_end - started_at
+        started_at = day_end
+
+class VoiceLedger:
+    """
+    Voice session ledger: who was in which voice channel, from when until when, per guild.
+
+    Joins, leaves and moves only touch memory; the resulting session rows, open-session changes and
+    aggregate updates are written in one transaction every FLUSH_INTERVAL seconds (or every MAX_PENDING changes).
+    Leaderboards never scan sessions: all-time totals live in memory (loaded once, kept current on every close)
+    and per-day totals in the voice_daily table, so `voicetop 7d` sums at most 7 rows per member.
+
+    Open sessions are persisted too. After a restart or a gateway reconnect, `reconcile` compares them against
+    who is actually in voice: sessions for members who left while the bot wasn't watching are closed at the
+    moment it stopped seeing events (`blind_since`), not at reconnect time.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(SCHEMA)
+        self.open_sessions = {} # {(guild_id, user_id): (channel_id, started_at)}
+        self.totals = {} # {guild_id: {user_id: seconds}}, closed sessions only
+        self.pending_sessions = [] # [(guild_id, user_id, channel_id, started_at, ended_at)]
+        self.pending_open = {} # {(guild_id, user_id): (channel_id, started_at) or None to delete}
+        self.task = None
+        self.wakeup = asyncio.Event()
+        for row in self.db.execute("SELECT guild_id, user_id, seconds FROM voice_totals"):
+            self.totals.setdefault(row["guild_id"], {})[row["user_id"]] = row["seconds"]
+        for row in self.db.execute("SELECT guild_id, user_id, channel_id, started_at FROM voice_open"):
+            self.open_sessions[(row["guild_id"], row["user_id"])] = (row["channel_id"], row["started_at"])
+        last_seen = self.db.execute("SELECT value FROM voice_meta WHERE key = 'last_seen'").fetchone()
+        # Sessions left open by the previous run are only known to be accurate up to its last flush
+        self.blind_since = last_seen["value"] if last_seen and self.open_sessions else None
+        metrics.register_gauge("voice_sessions_open", lambda: len(self.open_sessions))
+        metrics.register_gauge("voice_ledger_pending", lambda: len(self.pending_sessions) + len(self.pending_open))
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing the voice ledger on shutdown: {e}")
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing the voice ledger: {e}")
+
+    def _changed(self):
+        if len(self.pending_sessions) + len(self.pending_open) >= MAX_PENDING:
+            self.wakeup.set()
+        self.start()
+
+    def open(self, guild_id, user_id, channel_id, at):
+        """Starts a session, closing any session the member still has open in this guild first."""
+        key = (guild_id, user_id)
+        if key in self.open_sessions:
+            self.close(guild_id, user_id, at)
+        self.open_sessions[key] = self.pending_open[key] = (channel_id, at)
+        self._changed()
+
+    def close(self, guild_id, user_id, at):
+        """Ends the member's open session at `at`. Returns its length in seconds, or None if there wasn't one."""
+        key = (guild_id, user_id)
+        session = self.open_sessions.pop(key, None)
+        if session is None:
+            return None
+        channel_id, started_at = session
+        ended_at = max(at, started_at)
+        self.pending_open[key] = None
+        self.pending_sessions.append((guild_id, user_id, channel_id, started_at, ended_at))
+        guild_totals = self.totals.setdefault(guild_id, {})
+        guild_totals[user_id] = guild_totals.get(user_id, 0.0) + (ended_at - started_at)
+        metrics.inc("voice_sessions_closed_total")
+        self._changed()
+        return ended_at - started_at
+
+    def move(self, guild_id, user_id, before_channel_id, after_channel_id, at):
+        """Applies one voice state change. Either channel ID may be None (not in a tracked channel)."""
+        if before_channel_id == after_channel_id:
+            return
+        if after_channel_id is None:
+            self.close(guild_id, user_id, at)
+        else:
+            self.open(guild_id, user_id, after_channel_id, at)
+
+    def mark_blind(self, at):
+        """Records that events may be missed from `at` on (the gateway disconnected)."""
+        if self.blind_since is None:
+            self.blind_since = at
+
+    def mark_resumed(self):
+        """The gateway session resumed: Discord replays everything missed, so nothing needs reconciling."""
+        self.blind_since = None
+
+    def reconcile(self, in_voice, now):
+        """
+        Brings open sessions in line with who is in voice after a restart or reconnect.
+        `in_voice` is {guild_id: {user_id: channel_id}} for every guild the bot can currently see; sessions in
+        guilds not listed are left alone. Returns (closed, opened) counts.
+        """
+        seen_until = self.blind_since if self.blind_since is not None else now
+        gap = now - seen_until
+        closed = opened = 0
+        for (guild_id, user_id), (channel_id, _) in list(self.open_sessions.items()):
+            members = in_voice.get(guild_id)
+            if members is None:
+                continue
+            if members.get(user_id) != channel_id or gap > MAX_RECONCILE_GAP:
+                self.close(guild_id, user_id, seen_until)
+                closed += 1
+        for guild_id, members in in_voice.items():
+            for user_id, channel_id in members.items():
+                if (guild_id, user_id) not in self.open_sessions:
+                    self.open(guild_id, user_id, channel_id, now)
+                    opened += 1
+        self.blind_since = None
+        return closed, opened
+
+    def close_guild(self, guild_id, at):
+        for key in [key for key in self.open_sessions if key[0] == guild_id]:
+            self.close(guild_id, key[1], at)
+
+    def flush(self):
+        """
+        Writes every pending change in one transaction. If any statement fails the changes are rolled back
+        and queued again, so the next flush retries them and the aggregates never drift from voice_sessions.
+        The connection is shared, so the writes go in a savepoint and only those are undone, never
+        another cog's uncommitted work.
+        """
+        sessions, self.pending_sessions = self.pending_sessions, []
+        open_changes, self.pending_open = self.pending_open, {}
+        self.db.execute("SAVEPOINT voice_flush")
+        try:
+            self._write(sessions, open_changes)
+        except Exception:
+            self.db.execute("ROLLBACK TO voice_flush")
+            self.db.execute("RELEASE voice_flush")
+            self.pending_sessions[:0] = sessions
+            open_changes.update(self.pending_open) # Anything queued since is newer
+            self.pending_open = open_changes
+            metrics.inc("voice_ledger_flush_errors_total")
+            raise
+        self.db.execute("RELEASE voice_flush")
+        self.db.commit()
+        if sessions or open_changes:
+            metrics.inc("voice_ledger_flushes_total")
+            metrics.inc("voice_ledger_rows_written_total", len(sessions) + len(open_changes))
+
+    def _write(self, sessions, open_changes):
+        totals, daily = {}, {}
+        for guild_id, user_id, _, started_at, ended_at in sessions:
+            seconds, count = totals.get((guild_id, user_id), (0.0, 0))
+            totals[(guild_id, user_id)] = (seconds + ended_at - started_at, count + 1)
+            for day, day_seconds in split_by_day(started_at, ended_at):
+                daily[(guild_id, day, user_id)] = daily.get((guild_id, day, user_id), 0.0) + day_seconds
+
+        if sessions:
+            self.db.executemany(
+                "INSERT INTO voice_sessions (guild_id, user_id, channel_id, started_at, ended_at) VALUES (?, ?, ?, ?, ?)", sessions
+            )
+            self.db.executemany(
+                "INSERT INTO voice_totals (guild_id, user_id, seconds, sessions) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET seconds = seconds + excluded.seconds, sessions = sessions + excluded.sessions",
+                [(guild_id, user_id, seconds, count) for (guild_id, user_id), (seconds, count) in totals.items()]
+            )
+            self.db.executemany(
+                "INSERT INTO voice_daily (guild_id, day, user_id, seconds) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, day, user_id) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [(guild_id, day, user_id, seconds) for (guild_id, day, user_id), seconds in daily.items()]
+            )
+        deletes = [key for key, session in open_changes.items() if session is None]
+        upserts = [key + session for key, session in open_changes.items() if session is not None]
+        if deletes:
+            self.db.executemany("DELETE FROM voice_open WHERE guild_id = ? AND user_id = ?", deletes)
+        if upserts:
+            self.db.executemany(
+                "INSERT INTO voice_open (guild_id, user_id, channel_id, started_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET channel_id = excluded.channel_id, started_at = excluded.started_at",
+                upserts
+            )
+        if self.blind_since is None:
+            # Open sessions are accurate up to now; reconcile closes them no earlier than this after a crash
+            self.db.execute(
+                "INSERT INTO voice_meta (key, value) VALUES ('last_seen', ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (time.time(),)
+            )
+
+    def top(self, guild_id, limit=10, days=None, now=None):
+        """
+        Returns [(user_id, seconds)] for the guild's most active voice users, most first.
+        All time: in-memory totals plus time in sessions still open. Last N days: summed from voice_daily.
+        """
+        now = time.time() if now is None else now
+        if days is None:
+            scores = dict(self.totals.get(guild_id, {}))
+        else:
+            self.flush() # Daily rows must include sessions closed since the last flush
+            first_day = int(now // DAY) - days + 1
+            scores = {row["user_id"]: row["seconds"] for row in self.db.execute(
+                "SELECT user_id, SUM(seconds) AS seconds FROM voice_daily WHERE guild_id = ? AND day >= ? GROUP BY user_id",
+                (guild_id, first_day)
+            )}
+        window_start = 0 if days is None else first_day * DAY
+        for (session_guild_id, user_id), (_, started_at) in self.open_sessions.items():
+            if session_guild_id == guild_id:
+                scores[user_id] = scores.get(user_id, 0.0) + max(0.0, now - max(started_at, window_start))
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+def get_voice_ledger(bot):
+    """
+    Returns the bot-wide VoiceLedger, creating it on first use.
+    """
+    ledger = getattr(bot, "voice_ledger", None)
+    if ledger is None:
+        ledger = VoiceLedger(get_db())
+        bot.voice_ledger = ledger
+    return ledger